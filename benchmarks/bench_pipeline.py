@@ -0,0 +1,256 @@
+"""
+Benchmark of the red list report pipeline on synthetic data.
+
+Generates GeoPackage point layers with N observations of a pool of species
+names and a synthetic red list, then times and memory-profiles every stage
+of redListFauna separately.
+
+    python benchmarks/bench_pipeline.py --sizes 10000 100000 1000000 \
+        --output bench_results.json --check benchmarks/thresholds.json
+
+Names are read through QGIS (layer_source) if --qgis is given and QGIS can
+be imported, otherwise through the sqlite reader of the command line.
+Exits with status 1 if a stage exceeds its time threshold.
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from red_list_fauna_table.cli import gpkg_names  # noqa: E402
+from red_list_fauna_table.lut import load_lut  # noqa: E402
+from red_list_fauna_table.tablemaker import redListFauna  # noqa: E402
+from red_list_fauna_table.template import load_template  # noqa: E402
+
+CATEGORIES = ["0", "1", "2", "3", "G", "R", "V", "D", "*", "♦", "nb", "kN"]
+SITUATIONS = ["ex", "es", "ss", "s", "mh", "h", "sh", "?"]
+LONG_TRENDS = ["<<<", "<<", "<", "(<)", "=", ">", "?"]
+SHORT_TRENDS = ["vvv", "vv", "v", "=", "^", "?"]
+
+
+def species_name(i):
+    return "Art {:06d}".format(i)
+
+
+def write_lut(path, rows, seed=0):
+    """Write a synthetic red list with the columns of fauna.csv."""
+    rnd = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(
+            "|Name|Deutscher Name|aktuelle Bestandssituation"
+            "|kurzfristiger Bestandstrend|langfristiger Bestandstrend|RL Kat.\n"
+        )
+        for i in range(rows):
+            f.write(
+                "{}|Species {:06d}|{}|{}|{}|{}|{}\n".format(
+                    i,
+                    i,
+                    species_name(i),
+                    rnd.choice(SITUATIONS),
+                    rnd.choice(SHORT_TRENDS),
+                    rnd.choice(LONG_TRENDS),
+                    rnd.choice(CATEGORIES),
+                )
+            )
+
+
+def write_points(path, features, species, lut_rows, seed=0):
+    """
+    Write a GeoPackage point layer "fauna" with a species field "art".
+
+    Names are drawn from a pool of `species` names, 5 % of them are missing
+    from the red list to exercise the unmatched path.
+    """
+    rnd = random.Random(seed)
+    pool = [species_name(rnd.randrange(lut_rows)) for _ in range(species)]
+    pool[: max(1, species // 20)] = [
+        "Unbekannt {}".format(i) for i in range(max(1, species // 20))
+    ]
+    header = b"GP\x00\x01" + struct.pack("<i", 25832)
+    con = sqlite3.connect(path)
+    con.executescript("""
+        CREATE TABLE gpkg_spatial_ref_sys (srs_name TEXT NOT NULL,
+            srs_id INTEGER PRIMARY KEY, organization TEXT NOT NULL,
+            organization_coordsys_id INTEGER NOT NULL, definition TEXT NOT NULL,
+            description TEXT);
+        INSERT INTO gpkg_spatial_ref_sys VALUES ('ETRS89 / UTM zone 32N', 25832,
+            'EPSG', 25832, 'undefined', NULL);
+        CREATE TABLE gpkg_contents (table_name TEXT NOT NULL PRIMARY KEY,
+            data_type TEXT NOT NULL, identifier TEXT UNIQUE, description TEXT,
+            last_change DATETIME, min_x DOUBLE, min_y DOUBLE, max_x DOUBLE,
+            max_y DOUBLE, srs_id INTEGER);
+        INSERT INTO gpkg_contents VALUES ('fauna', 'features', 'fauna', '',
+            strftime('%Y-%m-%dT%H:%M:%fZ', 'now'), 0, 0, 10000, 10000, 25832);
+        CREATE TABLE gpkg_geometry_columns (table_name TEXT NOT NULL,
+            column_name TEXT NOT NULL, geometry_type_name TEXT NOT NULL,
+            srs_id INTEGER NOT NULL, z TINYINT NOT NULL, m TINYINT NOT NULL);
+        INSERT INTO gpkg_geometry_columns VALUES ('fauna', 'geom', 'POINT',
+            25832, 0, 0);
+        CREATE TABLE fauna (fid INTEGER PRIMARY KEY AUTOINCREMENT, geom POINT,
+            art TEXT);
+        PRAGMA application_id = 1196444487;
+        PRAGMA user_version = 10200;
+        """)
+    con.executemany(
+        "INSERT INTO fauna (geom, art) VALUES (?, ?)",
+        (
+            (
+                header
+                + struct.pack(
+                    "<BIdd", 1, 1, rnd.uniform(0, 10000), rnd.uniform(0, 10000)
+                ),
+                rnd.choice(pool),
+            )
+            for _ in range(features)
+        ),
+    )
+    con.commit()
+    con.close()
+
+
+def qgis_layer(path):
+    """Open the GeoPackage as QgsVectorLayer, None if QGIS is not available."""
+    try:
+        from qgis.core import QgsApplication, QgsVectorLayer
+    except ImportError:
+        return None
+    if QgsApplication.instance() is None:
+        app = QgsApplication([], False)
+        app.initQgis()
+        qgis_layer.app = app
+    return QgsVectorLayer(path + "|layername=fauna", "fauna", "ogr")
+
+
+def measure(func):
+    """Run func, returning wall time in seconds and peak traced memory in bytes."""
+    tracemalloc.reset_peak()
+    start_mem = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] - start_mem
+    return seconds, peak
+
+
+def run(size, species, lut_rows, tmpdir, use_qgis):
+    """Benchmark all stages for one layer size."""
+    gpkg = os.path.join(tmpdir, "fauna_{}.gpkg".format(size))
+    lut = os.path.join(tmpdir, "fauna_{}.csv".format(lut_rows))
+    if not os.path.exists(lut):
+        write_lut(lut, lut_rows)
+    write_points(gpkg, size, species, lut_rows)
+
+    layer = qgis_layer(gpkg) if use_qgis else None
+    load_template()  # built once at plugin start, not part of a run
+    results = {}
+    # Loading the red list with its look-up indexes, cached afterwards like at
+    # plugin start. A new mtime makes every size load it again.
+    os.utime(lut, ns=(time.time_ns(), time.time_ns()))
+    results["load_lut"] = measure(lambda: load_lut(lut))
+    # Normalized and typo tolerant indexes, built on the first name without
+    # an exact match. Timed on their own, so match_names only times matching.
+    results["name_indexes"] = measure(load_lut(lut).matcher.indexes)
+    if layer is None:
+        # Headless: read the names the way the command line does
+        names = []
+        results["get_arten_list"] = measure(
+            lambda: names.extend(gpkg_names(gpkg, "art"))
+        )
+        report = redListFauna(
+            None, None, os.path.join(tmpdir, "out.docx"), names=names, lut_path=lut
+        )
+    else:
+        report = redListFauna(
+            layer, "art", os.path.join(tmpdir, "out.docx"), lut_path=lut
+        )
+    for name, stage in report.stages():
+        if name == "get_arten_list" and layer is None:
+            stage()  # already timed above, only copies the names
+            continue
+        results[name] = measure(stage)
+    results["save"] = measure(report.save)
+
+    return {
+        "features": size,
+        "species": len(report.list),
+        "lut_rows": lut_rows,
+        "reader": "qgis" if layer is not None else "sqlite",
+        "output_bytes": os.path.getsize(report.outpath),
+        "stages": {
+            name: {"seconds": round(seconds, 6), "peak_bytes": peak}
+            for name, (seconds, peak) in results.items()
+        },
+    }
+
+
+def check(results, thresholds):
+    """Return the stages slower than their threshold as messages."""
+    failures = []
+    for result in results:
+        limits = thresholds.get(str(result["features"]), {})
+        for name, limit in limits.items():
+            seconds = result["stages"].get(name, {}).get("seconds")
+            if seconds is not None and seconds > limit:
+                failures.append(
+                    "{} features: {} took {:.3f} s, threshold {:.3f} s".format(
+                        result["features"], name, seconds, limit
+                    )
+                )
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10000, 100000, 1000000]
+    )
+    parser.add_argument("--species", type=int, default=2000)
+    parser.add_argument("--lut-rows", type=int, default=50000)
+    parser.add_argument("--qgis", action="store_true", help="read names with QGIS")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--check", help="JSON file of per-size stage thresholds")
+    args = parser.parse_args(argv)
+
+    tracemalloc.start()
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for size in args.sizes:
+            result = run(size, args.species, args.lut_rows, tmpdir, args.qgis)
+            results.append(result)
+            print(
+                "{:>9} features, {} species ({})".format(
+                    size, result["species"], result["reader"]
+                )
+            )
+            for name, stage in result["stages"].items():
+                print(
+                    "  {:<16} {:>9.3f} s {:>10.1f} MiB".format(
+                        name, stage["seconds"], stage["peak_bytes"] / 2**20
+                    )
+                )
+    tracemalloc.stop()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version, "results": results}, f, indent=2)
+
+    if args.check:
+        with open(args.check, encoding="utf-8") as f:
+            failures = check(results, json.load(f))
+        for failure in failures:
+            print("REGRESSION: " + failure)
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
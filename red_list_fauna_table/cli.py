@@ -0,0 +1,730 @@
+"""
+Command line interface creating red list documents without QGIS.
+
+Usage: python -m red_list_fauna_table dummy_data.gpkg --field name -o out.docx
+"""
+
+import argparse
+import csv
+import datetime
+import os
+import sqlite3
+import sys
+from collections import Counter
+from contextlib import closing
+
+from .instrumentation import summary
+from .occurrences import OccurrenceExtract
+from .render_pool import RenderJob, render_documents, unique_name
+from .result_cache import ResultCache
+from .lut import GROUP_COLUMN, SORT_KEYS
+from .tablemaker import SPLITS, redListFauna
+from .writers import FORMATS
+
+
+def quote(identifier):
+    """
+    Quote an SQL identifier.
+
+    Parameters:
+    - identifier: str, table or column name.
+    """
+    return '"{}"'.format(identifier.replace('"', '""'))
+
+
+def present_fields(fields, available, source):
+    """
+    Return the species fields a data source has, in the given order.
+
+    Parameters:
+    - fields: str or list of str, the fields holding the species names.
+    - available: list of str, the fields of the data source.
+    - source: str, name of the data source used in the error message.
+
+    Raises ValueError if the data source has none of the fields.
+    """
+    if isinstance(fields, str):
+        fields = [fields]
+    present = [field for field in fields if field in available]
+    if not present:
+        raise ValueError("{} has no field {}".format(source, ", ".join(fields)))
+    return present
+
+
+def gpkg_table(con, path, layer=None):
+    """
+    Return the feature table of a GeoPackage and its columns.
+
+    Parameters:
+    - con: sqlite3.Connection, connection to the GeoPackage.
+    - path: str, the GeoPackage file, used in error messages.
+    - layer: str, the feature table, defaults to the first one of the GeoPackage.
+
+    Returns a (table, list of column names) tuple.
+    """
+    if layer is None:
+        row = con.execute(
+            "SELECT table_name FROM gpkg_contents WHERE data_type = 'features'"
+        ).fetchone()
+        if row is None:
+            raise ValueError("{} contains no feature table".format(path))
+        layer = row[0]
+    # sqlite reads unknown double quoted identifiers as string literals
+    columns = [c[1] for c in con.execute("PRAGMA table_info({})".format(quote(layer)))]
+    return layer, columns
+
+
+def gpkg_names(path, field, layer=None):
+    """
+    Read the distinct values of one or more fields from a GeoPackage with sqlite.
+
+    Parameters:
+    - path: str, the GeoPackage file.
+    - field: str or list of str, the fields holding the species names, fields
+      missing in the table are skipped.
+    - layer: str, the feature table, defaults to the first one of the GeoPackage.
+    """
+    with closing(sqlite3.connect("file:{}?mode=ro".format(path), uri=True)) as con:
+        layer, columns = gpkg_table(con, path, layer)
+        fields = present_fields(field, columns, layer)
+        rows = con.execute(
+            "SELECT DISTINCT {} FROM {}".format(
+                ", ".join(quote(f) for f in fields), quote(layer)
+            )
+        )
+        return {name for row in rows for name in row if name is not None}
+
+
+def csv_names(path, field, delimiter=","):
+    """
+    Read the distinct values of one or more columns from a CSV file.
+
+    Parameters:
+    - path: str, the CSV file.
+    - field: str or list of str, the columns holding the species names,
+      columns missing in the file are skipped.
+    - delimiter: str, the column separator.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f, delimiter=delimiter)
+        fields = present_fields(field, reader.fieldnames or [], path)
+        return {row[f] for row in reader for f in fields if row[f]}
+
+
+def ogr_open(path, layer=None):
+    """
+    Open a layer of an OGR data source.
+
+    Parameters:
+    - path: str, the data source.
+    - layer: str, the layer name, defaults to the first layer of the data source.
+
+    Returns a (data source, layer) tuple, the layer is only valid as long as
+    the data source is referenced.
+    """
+    try:
+        from osgeo import ogr
+    except ImportError:
+        raise ValueError(
+            "Reading {} needs the GDAL Python bindings (osgeo)".format(path)
+        )
+    ds = ogr.Open(path)
+    if ds is None:
+        raise ValueError("Cannot open {}".format(path))
+    lyr = ds.GetLayer(0) if layer is None else ds.GetLayerByName(layer)
+    if lyr is None:
+        raise ValueError("{} has no layer {}".format(path, layer))
+    return ds, lyr
+
+
+def ogr_area(path, layer=None):
+    """
+    Merge the polygons of a study area data source into one OGR geometry.
+
+    Parameters:
+    - path: str, the data source of the study area polygons.
+    - layer: str, the layer name, defaults to the first layer of the data source.
+
+    Returns the geometry with the spatial reference of the layer assigned.
+    """
+    ds, lyr = ogr_open(path, layer)  # Reports missing GDAL bindings
+    from osgeo import ogr
+
+    parts = ogr.Geometry(ogr.wkbMultiPolygon)
+    for feature in lyr:
+        geometry = feature.GetGeometryRef()
+        if geometry is not None and not geometry.IsEmpty():
+            parts.AddGeometry(geometry)
+    if parts.IsEmpty():
+        raise ValueError("{} has no polygons to filter by".format(path))
+    area = parts.UnionCascaded()
+    area.AssignSpatialReference(lyr.GetSpatialRef())
+    return area
+
+
+def ogr_names(path, field, layer=None, area=None):
+    """
+    Read the distinct values of one or more fields from any other OGR data source.
+
+    Parameters:
+    - path: str, the data source.
+    - field: str or list of str, the fields holding the species names, fields
+      missing in the layer are skipped.
+    - layer: str, the layer name, defaults to the first layer of the data source.
+    - area: ogr.Geometry, only use features intersecting this study area (see ogr_area).
+    """
+    ds, lyr = ogr_open(path, layer)
+    defn = lyr.GetLayerDefn()
+    columns = [defn.GetFieldDefn(i).GetName() for i in range(defn.GetFieldCount())]
+    fields = present_fields(field, columns, lyr.GetName())
+    if area is not None:
+        # The driver filters by the spatial index of the layer, then tests
+        # the remaining features exactly against the prepared study area
+        area = area.Clone()
+        if area.GetSpatialReference() is not None and lyr.GetSpatialRef() is not None:
+            area.TransformTo(lyr.GetSpatialRef())
+        lyr.SetSpatialFilter(area)
+        indexes = [defn.GetFieldIndex(f) for f in fields]
+        lyr.SetIgnoredFields(
+            [name for name in columns if name not in fields] + ["OGR_STYLE"]
+        )
+        return {
+            feature.GetField(i)
+            for feature in lyr
+            for i in indexes
+            if feature.GetField(i) is not None
+        }
+    result = ds.ExecuteSQL(
+        "SELECT DISTINCT {} FROM {}".format(
+            ", ".join(quote(f) for f in fields), quote(lyr.GetName())
+        )
+    )
+    try:
+        return {
+            feature.GetField(i)
+            for feature in result
+            for i in range(len(fields))
+            if feature.GetField(i) is not None
+        }
+    finally:
+        ds.ReleaseResultSet(result)
+
+
+def add_records(extract, rows, fields, date_field=None, site_field=None):
+    """
+    Add the occurrence records of data source rows to an extract.
+
+    Parameters:
+    - extract: OccurrenceExtract, receives the records.
+    - rows: iterable of dicts, field name -> value.
+    - fields: list of str, the fields holding the species names, each one
+      holding a name gives a record.
+    - date_field, site_field: str, fields holding the observation date and
+      site, missing fields give records without date or site (optional).
+    """
+    for row in rows:
+        date = row.get(date_field) if date_field else None
+        site = row.get(site_field) if site_field else None
+        for field in fields:
+            extract.add(row[field], date or None, site if site != "" else None)
+
+
+def gpkg_occurrences(
+    path, field, extract, date_field=None, site_field=None, layer=None
+):
+    """
+    Stream the occurrence records of a GeoPackage into an extract with sqlite.
+
+    Parameters:
+    - path: str, the GeoPackage file.
+    - field: str or list of str, the fields holding the species names.
+    - extract, date_field, site_field: see add_records.
+    - layer: str, the feature table, defaults to the first one of the GeoPackage.
+    """
+    with closing(sqlite3.connect("file:{}?mode=ro".format(path), uri=True)) as con:
+        layer, columns = gpkg_table(con, path, layer)
+        fields = present_fields(field, columns, layer)
+        select = list(
+            dict.fromkeys(
+                fields + [f for f in (date_field, site_field) if f in columns]
+            )
+        )
+        cursor = con.execute(
+            "SELECT {} FROM {}".format(
+                ", ".join(quote(f) for f in select), quote(layer)
+            )
+        )
+        rows = (dict(zip(select, row)) for row in cursor)
+        add_records(extract, rows, fields, date_field, site_field)
+
+
+def csv_occurrences(
+    path, field, extract, date_field=None, site_field=None, delimiter=","
+):
+    """
+    Stream the occurrence records of a CSV file into an extract.
+
+    Parameters:
+    - path: str, the CSV file.
+    - field: str or list of str, the columns holding the species names.
+    - extract, date_field, site_field: see add_records.
+    - delimiter: str, the column separator.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f, delimiter=delimiter)
+        fields = present_fields(field, reader.fieldnames or [], path)
+        add_records(extract, reader, fields, date_field, site_field)
+
+
+def ogr_occurrences(
+    path, field, extract, date_field=None, site_field=None, layer=None, area=None
+):
+    """
+    Stream the occurrence records of any other OGR data source into an extract.
+
+    Parameters:
+    - path: str, the data source.
+    - field: str or list of str, the fields holding the species names.
+    - extract, date_field, site_field: see add_records.
+    - layer: str, the layer name, defaults to the first layer of the data source.
+    - area: ogr.Geometry, only use features intersecting this study area (see ogr_area).
+    """
+    ds, lyr = ogr_open(path, layer)  # Reports missing GDAL bindings
+    from osgeo import ogr
+
+    defn = lyr.GetLayerDefn()
+    columns = [defn.GetFieldDefn(i).GetName() for i in range(defn.GetFieldCount())]
+    fields = present_fields(field, columns, lyr.GetName())
+    select = list(
+        dict.fromkeys(fields + [f for f in (date_field, site_field) if f in columns])
+    )
+    if area is not None:
+        area = area.Clone()
+        if area.GetSpatialReference() is not None and lyr.GetSpatialRef() is not None:
+            area.TransformTo(lyr.GetSpatialRef())
+        lyr.SetSpatialFilter(area)
+    lyr.SetIgnoredFields(
+        [name for name in columns if name not in select] + ["OGR_STYLE"]
+    )
+    indexes = {name: defn.GetFieldIndex(name) for name in select}
+    dates = {
+        name
+        for name, i in indexes.items()
+        if defn.GetFieldDefn(i).GetType() in (ogr.OFTDate, ogr.OFTDateTime)
+    }
+
+    def value(feature, name):
+        i = indexes[name]
+        if not feature.IsFieldSetAndNotNull(i):
+            return None
+        if name in dates:
+            # GetField returns dates as "YYYY/MM/DD" strings
+            y, m, d, hour, minute, second, _ = feature.GetFieldAsDateTime(i)
+            return datetime.datetime(y, m, d, hour, minute, int(second))
+        return feature.GetField(i)
+
+    rows = ({name: value(feature, name) for name in select} for feature in lyr)
+    add_records(extract, rows, fields, date_field, site_field)
+
+
+def read_occurrences(
+    path,
+    field,
+    extract,
+    date_field=None,
+    site_field=None,
+    layer=None,
+    delimiter=",",
+    area=None,
+):
+    """
+    Stream the occurrence records of a GeoPackage, CSV or OGR data source into an extract.
+
+    Parameters:
+    - path: str, the input file.
+    - field: str or list of str, the fields holding the species names.
+    - extract, date_field, site_field: see add_records.
+    - layer, delimiter, area: see read_names.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if area is None and ext == ".gpkg":
+        gpkg_occurrences(path, field, extract, date_field, site_field, layer)
+    elif area is None and ext in (".csv", ".txt"):
+        csv_occurrences(path, field, extract, date_field, site_field, delimiter)
+    else:
+        ogr_occurrences(path, field, extract, date_field, site_field, layer, area)
+
+
+def read_names(path, field, layer=None, delimiter=",", area=None):
+    """
+    Read the distinct species names from a GeoPackage, CSV or OGR data source.
+
+    Parameters:
+    - path: str, the input file.
+    - field: str or list of str, the fields holding the species names.
+    - layer: str, the layer to read (GeoPackage and OGR only).
+    - delimiter: str, the column separator (CSV only).
+    - area: ogr.Geometry, only use features intersecting this study area,
+      always read with OGR (see ogr_area).
+    """
+    if area is not None:
+        return ogr_names(path, field, layer, area)
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".gpkg":
+        return gpkg_names(path, field, layer)
+    if ext in (".csv", ".txt"):
+        return csv_names(path, field, delimiter)
+    return ogr_names(path, field, layer)
+
+
+def batch_names(paths):
+    """
+    Return a unique document name for each input of a batch run.
+
+    Documents are named after their input. Inputs with the same name in
+    different folders get the name of their folder as prefix, a counter is
+    added if that is not enough.
+
+    Parameters:
+    - paths: list of str, the input files.
+    """
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    counts = Counter(stem.casefold() for stem in stems)
+    taken = set()
+    names = []
+    for path, stem in zip(paths, stems):
+        if counts[stem.casefold()] > 1:
+            folder = os.path.basename(os.path.dirname(os.path.realpath(path)))
+            stem = "{}_{}".format(folder, stem)
+        names.append(unique_name(stem, taken))
+    return names
+
+
+def batch_jobs(args, area=None, fingerprint=None):
+    """
+    Read the species of every input for a batch run, one document per input.
+
+    Parameters:
+    - args: argparse.Namespace, the parsed command line.
+    - area: ogr.Geometry, only use features intersecting this study area (optional).
+    - fingerprint: dict, the options the names are read with, see main. Each
+      job gets it for its own input, for the result cache (optional).
+
+    Returns a list of RenderJob, the documents are named after the inputs,
+    see batch_names.
+    """
+    jobs = []
+    for path, name in zip(args.input, batch_names(args.input)):
+        outpath = os.path.join(args.batch, name + ".docx")
+        job_fingerprint = None
+        if fingerprint is not None:
+            stat = os.stat(path)
+            job_fingerprint = dict(
+                fingerprint,
+                input=[os.path.realpath(path)],
+                files=[(stat.st_mtime_ns, stat.st_size)],
+            )
+        if not args.occurrences:
+            names = read_names(path, args.field, args.layer, args.delimiter, area)
+            jobs.append(RenderJob(outpath, sorted(names), fingerprint=job_fingerprint))
+            continue
+        extract = OccurrenceExtract()
+        read_occurrences(
+            path,
+            args.field,
+            extract,
+            args.date_field,
+            args.site_field,
+            args.layer,
+            args.delimiter,
+            area,
+        )
+        jobs.append(RenderJob(outpath, None, extract, job_fingerprint))
+    return jobs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m red_list_fauna_table",
+        description="Erstellt docx Tabellen über Fauna.",
+    )
+    parser.add_argument(
+        "input", nargs="+", help="GeoPackage, CSV or other OGR data sources"
+    )
+    parser.add_argument(
+        "-f",
+        "--field",
+        action="append",
+        required=True,
+        help="field holding the species names, repeat for several fields; "
+        "each input is read with the fields it has",
+    )
+    parser.add_argument("-l", "--layer", help="layer of the input to read")
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="output file, .docx, .xlsx, .csv, .html or .odt "
+        "(default: input name with .docx)",
+    )
+    parser.add_argument(
+        "--format",
+        dest="formats",
+        action="append",
+        choices=FORMATS,
+        help="also write the table in this format next to the output, "
+        "repeat for several formats",
+    )
+    parser.add_argument(
+        "--delimiter", default=",", help="column separator of CSV input"
+    )
+    parser.add_argument(
+        "--area",
+        help="only use features intersecting the polygons of this data source "
+        "(needs the GDAL Python bindings)",
+    )
+    parser.add_argument("--area-layer", help="layer of the --area data source")
+    parser.add_argument(
+        "--occurrences",
+        action="store_true",
+        help="add the number of records per species to the table",
+    )
+    parser.add_argument(
+        "--date-field",
+        help="with --occurrences, add the first and last date of this field",
+    )
+    parser.add_argument(
+        "--site-field",
+        help="with --occurrences, add the number of distinct values of this field",
+    )
+    parser.add_argument(
+        "--lut", help="red list to be used instead of the fauna.csv of the plugin"
+    )
+    parser.add_argument(
+        "--template",
+        help=".docx template, the table replaces its {{Tabelle}} paragraph",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only update the rows of changed species in an existing output",
+    )
+    parser.add_argument(
+        "--no-scientific",
+        dest="scientific",
+        action="store_false",
+        help="only match German names, not scientific ones",
+    )
+    parser.add_argument(
+        "--no-fuzzy",
+        dest="fuzzy",
+        action="store_false",
+        help="do not tolerate typos in species names",
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="stream the table rows into the .docx instead of building it in memory",
+    )
+    parser.add_argument(
+        "--sort",
+        dest="sort_by",
+        choices=SORT_KEYS,
+        default="name",
+        help="order of the rows: scientific name, German name or red list "
+        "category (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--group-by",
+        nargs="?",
+        const=GROUP_COLUMN,
+        metavar="COLUMN",
+        help="group the rows under a header row per value of this red list "
+        "column (default column: %(const)s)",
+    )
+    parser.add_argument(
+        "--split",
+        choices=SPLITS,
+        help="split the table into parts of --chunk-rows rows, per taxonomic "
+        "group or per red list category",
+    )
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=500,
+        metavar="N",
+        help="rows per part with --split rows (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--separate",
+        action="store_true",
+        help="write each part of the split table to a .docx of its own",
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="DIR",
+        help="write one document per input to this folder, rendered in parallel "
+        "worker processes",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        metavar="N",
+        help="number of worker processes with --batch (default: number of cores)",
+    )
+    parser.add_argument(
+        "--cache",
+        metavar="DIR",
+        help="restore unchanged documents from and store new ones in this folder",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="print the run statistics and write them to <output>.stats.json",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="write a cProfile capture of the run to <output>.prof",
+    )
+    args = parser.parse_args(argv)
+    if args.batch and args.output:
+        parser.error("--batch names the documents after the inputs, drop -o")
+
+    output = args.output or os.path.splitext(args.input[0])[0] + ".docx"
+    try:
+        fingerprint = {
+            "input": [os.path.realpath(path) for path in args.input],
+            "files": [],
+            "field": args.field,
+            "layer": args.layer,
+            "delimiter": args.delimiter,
+        }
+        area = None
+        if args.area:
+            stat = os.stat(args.area)
+            fingerprint["area"] = [
+                os.path.realpath(args.area),
+                args.area_layer,
+                (stat.st_mtime_ns, stat.st_size),
+            ]
+            area = ogr_area(args.area, args.area_layer)
+        if args.batch:
+            os.makedirs(args.batch, exist_ok=True)
+            return run_batch(args, batch_jobs(args, area, fingerprint))
+        names = set()
+        layers = {}
+        extract = OccurrenceExtract() if args.occurrences else None
+        for path in args.input:
+            stat = os.stat(path)
+            fingerprint["files"].append((stat.st_mtime_ns, stat.st_size))
+            if extract is None:
+                found = read_names(path, args.field, args.layer, args.delimiter, area)
+                layers[path] = {"distinct_names": len(found)}
+                names |= found
+                continue
+            start = len(extract)
+            read_occurrences(
+                path,
+                args.field,
+                extract,
+                args.date_field,
+                args.site_field,
+                args.layer,
+                args.delimiter,
+                area,
+            )
+            layers[path] = {"records": len(extract) - start}
+        report = redListFauna(
+            None,
+            None,
+            output,
+            names=names,
+            occurrences=args.occurrences,
+            date_field=args.date_field,
+            site_field=args.site_field,
+            extract=extract,
+            formats=args.formats,
+            streaming=args.streaming,
+            split=args.split,
+            chunk_rows=args.chunk_rows,
+            separate=args.separate,
+            sort_by=args.sort_by,
+            group_by=args.group_by,
+            lut_path=args.lut,
+            template_path=args.template,
+            incremental=args.incremental,
+            scientific=args.scientific,
+            fuzzy=args.fuzzy,
+            cache=ResultCache(args.cache) if args.cache else None,
+            fingerprint=fingerprint,
+        )
+        report.stats["layers"] = layers
+        report.generate(write_stats=args.stats, profile=args.profile)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        parser.exit(1, "{}: error: {}\n".format(parser.prog, e))
+
+    if args.stats:
+        print(summary(report.stats), file=sys.stderr)
+    if report.stats.get("unmatched"):
+        print(
+            "not found in the red list: " + ", ".join(report.stats["unmatched"]),
+            file=sys.stderr,
+        )
+    for path in report.output_paths():
+        print(path)
+    return 0
+
+
+def run_batch(args, jobs):
+    """
+    Render the documents of a batch run in the worker pool and report them.
+
+    Parameters:
+    - args: argparse.Namespace, the parsed command line.
+    - jobs: list of RenderJob, see batch_jobs.
+
+    Returns the exit status, 1 if a document failed.
+    """
+    results = render_documents(
+        jobs,
+        workers=args.workers,
+        occurrences=args.occurrences,
+        date_field=args.date_field,
+        site_field=args.site_field,
+        formats=args.formats,
+        streaming=args.streaming,
+        split=args.split,
+        chunk_rows=args.chunk_rows,
+        separate=args.separate,
+        sort_by=args.sort_by,
+        group_by=args.group_by,
+        lut_path=args.lut,
+        template_path=args.template,
+        incremental=args.incremental,
+        scientific=args.scientific,
+        fuzzy=args.fuzzy,
+        cache=ResultCache(args.cache) if args.cache else None,
+    )
+    status = 0
+    for job, stats in zip(jobs, results):
+        if isinstance(stats, Exception):
+            print("{}: error: {}".format(job.outpath, stats), file=sys.stderr)
+            status = 1
+            continue
+        if args.stats:
+            print(job.outpath, file=sys.stderr)
+            print(summary(stats), file=sys.stderr)
+        if stats.get("unmatched"):
+            print(
+                "{}: not found in the red list: {}".format(
+                    job.outpath, ", ".join(stats["unmatched"])
+                ),
+                file=sys.stderr,
+            )
+        for path in stats["outputs"]:
+            print(path)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
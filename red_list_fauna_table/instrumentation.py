@@ -0,0 +1,84 @@
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def peak_rss():
+    """
+    Return the peak resident set size of the process in bytes, None if unknown.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@contextmanager
+def measure(stats, name):
+    """
+    Record wall time and memory growth of the enclosed block in stats["stages"][name].
+
+    Parameters:
+    - stats: dict, the statistics of a run.
+    - name: str, the stage name.
+
+    The traced memory peak is only recorded while tracemalloc is tracing. Both
+    memory figures are process wide, so parallel runs influence each other.
+    """
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+        start_traced = tracemalloc.get_traced_memory()[0]
+    start_rss = peak_rss()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage = {"seconds": time.perf_counter() - start}
+        if start_rss is not None:
+            stage["peak_rss_growth_bytes"] = peak_rss() - start_rss
+        if tracing:
+            stage["traced_peak_bytes"] = (
+                tracemalloc.get_traced_memory()[1] - start_traced
+            )
+        stats.setdefault("stages", {})[name] = stage
+
+
+def summary(stats):
+    """
+    Format the statistics of a run as a short multi-line text.
+
+    Parameters:
+    - stats: dict, the statistics of a run.
+    """
+    lines = [
+        "{}: {}".format(key, value) for key, value in stats.items() if key != "stages"
+    ]
+    for name, stage in stats.get("stages", {}).items():
+        line = "{:<16} {:8.3f} s".format(name, stage["seconds"])
+        if "peak_rss_growth_bytes" in stage:
+            line += " {:8.1f} MiB RSS".format(stage["peak_rss_growth_bytes"] / 2**20)
+        if "traced_peak_bytes" in stage:
+            line += " {:8.1f} MiB traced".format(stage["traced_peak_bytes"] / 2**20)
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def write_json(stats, path):
+    """
+    Write the statistics of a run as JSON.
+
+    Parameters:
+    - stats: dict, the statistics of a run.
+    - path: str, the JSON file.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(stats, f, indent=2, ensure_ascii=False)
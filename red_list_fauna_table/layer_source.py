@@ -0,0 +1,246 @@
+import hashlib
+import os
+
+from qgis.core import (
+    QgsApplication,
+    QgsFeatureRequest,
+    QgsGeometry,
+    QgsProviderRegistry,
+)
+
+from .result_cache import ResultCache
+
+
+def unique_names(
+    lyr,
+    field,
+    selected_ids=None,
+    area=None,
+    feature_count=None,
+    progress=None,
+    feedback=None,
+    stats=None,
+):
+    """
+    Extract the distinct values of one or more fields from a vector layer.
+
+    Parameters:
+    - lyr: QgsVectorLayer or QgsVectorLayerFeatureSource, source containing fauna data.
+      Layers are only deduplicated by the provider if no selection or area is active.
+    - field: str or list of str, the field(s) holding the species names. All of
+      them are read in the same pass over the features.
+    - selected_ids: list of int, restrict to these feature ids (None uses all features).
+    - area: QgsGeometry, only use features intersecting this study area (in the layer CRS).
+    - feature_count: int, number of features to be read, only used for progress reporting.
+    - progress: callable, called with the share of features read so far (optional).
+    - feedback: QgsFeedback, cancels the feature iteration (optional).
+    - stats: dict, receives the number of features read as "features_read" (optional).
+
+    Returns a set of the distinct values, including NULL if present.
+    """
+    fields = [field] if isinstance(field, str) else list(field)
+    indexes = [lyr.fields().indexOf(name) for name in fields]
+    missing = [name for name, index in zip(fields, indexes) if index < 0]
+    if missing:
+        raise ValueError("Field(s) not found: {}".format(", ".join(missing)))
+    filtered = selected_ids is not None or area is not None
+    if not filtered and hasattr(lyr, "uniqueValues"):
+        # Whole layer: let the provider deduplicate (SELECT DISTINCT)
+        names = set()
+        for index in indexes:
+            names.update(lyr.uniqueValues(index))
+        return names
+
+    # Stream only the species field, deduplicating on the fly
+    request, engine = feature_request(indexes, selected_ids, area, feedback)
+    names = set()
+    i = -1
+    for i, f in enumerate(lyr.getFeatures(request)):
+        if progress is not None and i % 1000 == 0:
+            progress(i / feature_count if feature_count else 0)
+        if engine is not None and not (
+            f.hasGeometry() and engine.intersects(f.geometry().constGet())
+        ):
+            continue
+        for index in indexes:
+            names.add(f[index])
+    if stats is not None:
+        stats["features_read"] = i + 1
+    return names
+
+
+def read_occurrences(
+    lyr,
+    field,
+    extract,
+    date_field=None,
+    site_field=None,
+    selected_ids=None,
+    area=None,
+    feature_count=None,
+    progress=None,
+    feedback=None,
+    stats=None,
+):
+    """
+    Add the occurrence records of a vector layer to a columnar extract.
+
+    Parameters:
+    - lyr: QgsVectorLayer or QgsVectorLayerFeatureSource, source containing fauna data.
+    - field: str or list of str, the field(s) holding the species names. A
+      feature gives one record per species field holding a name.
+    - extract: OccurrenceExtract, receives the records.
+    - date_field: str, field holding the observation date (optional).
+    - site_field: str, field identifying the site of the observation (optional).
+      Missing date and site fields give records without date or site.
+    - selected_ids, area, feature_count, progress, feedback: see unique_names.
+    - stats: dict, receives the number of features read as "features_read" (optional).
+
+    Only the needed fields are fetched, feature objects are not kept.
+    """
+    fields = [field] if isinstance(field, str) else list(field)
+    indexes = [lyr.fields().indexOf(name) for name in fields]
+    missing = [name for name, index in zip(fields, indexes) if index < 0]
+    if missing:
+        raise ValueError("Field(s) not found: {}".format(", ".join(missing)))
+    date_index = lyr.fields().indexOf(date_field) if date_field else -1
+    site_index = lyr.fields().indexOf(site_field) if site_field else -1
+    request, engine = feature_request(
+        indexes + [index for index in (date_index, site_index) if index >= 0],
+        selected_ids,
+        area,
+        feedback,
+    )
+    i = -1
+    for i, f in enumerate(lyr.getFeatures(request)):
+        if progress is not None and i % 1000 == 0:
+            progress(i / feature_count if feature_count else 0)
+        if engine is not None and not (
+            f.hasGeometry() and engine.intersects(f.geometry().constGet())
+        ):
+            continue
+        date = plain(f[date_index]) if date_index >= 0 else None
+        site = plain(f[site_index]) if site_index >= 0 else None
+        for index in indexes:
+            extract.add(plain(f[index]), date, site)
+    if stats is not None:
+        stats["features_read"] = i + 1
+
+
+def feature_request(indexes, selected_ids=None, area=None, feedback=None):
+    """
+    Build the request streaming only the given attributes of the features to be used.
+
+    Parameters:
+    - indexes: list of int, the attributes to be fetched.
+    - selected_ids, area, feedback: see unique_names.
+
+    Returns a (QgsFeatureRequest, engine) tuple. Without an area the engine is
+    None, otherwise features in the filter rectangle still need to be tested
+    with engine.intersects.
+    """
+    request = QgsFeatureRequest()
+    request.setSubsetOfAttributes(indexes)
+    if area is None:
+        request.setFlags(QgsFeatureRequest.NoGeometry)
+        engine = None
+    else:
+        # Coarse filter by bounding box, exact test with a prepared geometry
+        request.setFilterRect(area.boundingBox())
+        engine = QgsGeometry.createGeometryEngine(area.constGet())
+        engine.prepareGeometry()
+    # if only selected features are requested, restrict to their ids
+    if selected_ids is not None:
+        request.setFilterFids(selected_ids)
+    if feedback is not None:
+        request.setFeedback(feedback)
+    return request, engine
+
+
+def plain(value):
+    """
+    Return an attribute value as plain Python value: NULL as None, dates as datetime.
+
+    Parameters:
+    - value: the attribute value of a feature.
+    """
+    if value is None or (hasattr(value, "isNull") and value.isNull()):
+        return None
+    if hasattr(value, "toPyDateTime"):
+        return value.toPyDateTime()
+    if hasattr(value, "toPyDate"):
+        return value.toPyDate()
+    return value
+
+
+def study_area(source, selected_ids=None):
+    """
+    Merge the polygons of a study area layer into one geometry.
+
+    Parameters:
+    - source: QgsVectorLayer or QgsFeatureSource, the layer of study area polygons.
+    - selected_ids: list of int, only merge these features (None merges all features).
+
+    Returns a QgsGeometry in the CRS of the source, None if no feature has a geometry.
+    """
+    request = QgsFeatureRequest()
+    request.setNoAttributes()
+    if selected_ids is not None:
+        request.setFilterFids(selected_ids)
+    geometries = [f.geometry() for f in source.getFeatures(request) if f.hasGeometry()]
+    if not geometries:
+        return None
+    # One geometry keeps the filter down to one bounding box and one
+    # prepared engine, however many polygons the study area consists of
+    return QgsGeometry.unaryUnion(geometries)
+
+
+def fingerprint(layer, field, selected_ids=None, area=None):
+    """
+    Describe the content a report of a layer is built from, must be called from the main thread.
+
+    Parameters:
+    - layer: QgsVectorLayer, the layer containing fauna data.
+    - field: str or list of str, the field(s) holding the species names.
+    - selected_ids: list of int, restrict to these feature ids (None uses all features).
+    - area: QgsGeometry, only use features intersecting this study area (in the layer CRS).
+
+    Returns a dict of JSON serializable values, None if the content cannot be
+    identified: for unsaved edits, memory layers and sources that are not files.
+    """
+    if layer.isModified() or layer.providerType() == "memory":
+        return None
+    uri = QgsProviderRegistry.instance().decodeUri(layer.providerType(), layer.source())
+    path = uri.get("path")
+    if not path or not os.path.isfile(path):
+        return None
+    # Committed GeoPackage and SpatiaLite edits may only be in the WAL file
+    files = [
+        (os.stat(p).st_mtime_ns, os.stat(p).st_size)
+        for p in (path, path + "-wal")
+        if os.path.exists(p)
+    ]
+    if selected_ids is not None:
+        ids = ",".join(str(fid) for fid in sorted(selected_ids))
+        selected_ids = hashlib.sha1(ids.encode("ascii")).hexdigest()
+    return {
+        "source": layer.source(),
+        "provider": layer.providerType(),
+        "files": files,
+        "features": layer.featureCount(),
+        "subset": layer.subsetString(),
+        "field": field,
+        "selected": selected_ids,
+        "area": area.asWkt() if area is not None else None,
+    }
+
+
+def profile_cache():
+    """
+    Return the result cache in the QGIS profile directory.
+    """
+    return ResultCache(
+        os.path.join(
+            QgsApplication.qgisSettingsDirPath(), "red_list_fauna_table", "cache"
+        )
+    )
@@ -0,0 +1,261 @@
+import os
+import threading
+
+import pandas as pd
+
+from .matching import NameMatcher, collation_key
+
+PLUGIN_DIR = os.path.dirname(os.path.realpath(__file__))
+FAUNA_CSV = os.path.join(PLUGIN_DIR, "fauna.csv")
+LEGEND_CSV = os.path.join(PLUGIN_DIR, "legend.csv")
+
+# Columns of the look-up table shown in the report, in table order
+REPORT_COLUMNS = [
+    "Name",
+    "Deutscher Name",
+    "aktuelle Bestandssituation",
+    "kurzfristiger Bestandstrend",
+    "langfristiger Bestandstrend",
+    "RL Kat.",
+]
+
+# Columns with a small set of codes, held as categoricals
+STATUS_COLUMNS = REPORT_COLUMNS[2:]
+
+# Red list categories by severity, as in the legend
+CATEGORIES = ["0", "1", "2", "3", "G", "R", "V", "D", "*", "♦", "nb", "kN"]
+
+# Orders of the table rows: scientific name, German name (German collation)
+# or red list category (by severity, then German name)
+SORT_KEYS = ("name", "german", "category")
+
+# Default column with the taxonomic group of a species, e.g. "Vögel"
+GROUP_COLUMN = "Gruppe"
+
+# Process-wide cache, maps (kind, file path) to (mtime, loaded object)
+_cache = {}
+_lock = threading.Lock()
+
+
+class LookupTable:
+    """
+    Red list look-up table, indexed by German and scientific name.
+    """
+
+    def __init__(self, df):
+        """
+        Constructor for the LookupTable class.
+
+        Parameters:
+        - df: pandas.DataFrame, the red list as read from fauna.csv.
+        """
+        self.df = df
+
+        # German name -> tuple of the report columns. If a name occurs more
+        # than once, the first entry of the red list wins.
+        species = df.dropna(subset=["Deutscher Name"]).drop_duplicates(
+            "Deutscher Name", keep="first"
+        )
+        self.species = dict(zip(species["Deutscher Name"], report_rows(species)))
+        # Same for scientific names, including species without a German name
+        scientific = df.dropna(subset=["Name"]).drop_duplicates("Name", keep="first")
+        self.scientific = dict(zip(scientific["Name"], report_rows(scientific)))
+        # Normalized and typo tolerant indexes, built on the first name
+        # without an exact match and kept with the loaded table
+        self.matcher = NameMatcher(self.species, self.scientific)
+        # Sort key -> report row -> rank, computed on first use
+        self.ranks = {}
+
+    def lookup(self, names):
+        """
+        Resolve German names to their report rows.
+
+        Parameters:
+        - names: iterable of str, the German species names.
+
+        Returns a list with one tuple of REPORT_COLUMNS values per name, names
+        missing from the red list get a tuple of None.
+        """
+        missing = (None,) * len(REPORT_COLUMNS)
+        return [self.species.get(name, missing) for name in names]
+
+    def resolve(self, names, scientific=True, fuzzy=True):
+        """
+        Resolve species names to their report rows, tolerating spelling variants.
+
+        Parameters:
+        - names: iterable of str, the species names as found in the layer.
+        - scientific: bool, also match scientific names.
+        - fuzzy: bool, tolerate typos.
+
+        Returns a list with one (row, method) tuple per name, see NameMatcher.resolve.
+        """
+        return [self.matcher.resolve(name, scientific, fuzzy) for name in names]
+
+    def sort_ranks(self, key):
+        """
+        Return the integer sort key of every report row of the red list.
+
+        The rows are ordered once per loaded table, so sorting a report only
+        compares integers instead of collating strings again.
+
+        Parameters:
+        - key: str, one of SORT_KEYS.
+
+        Returns a dict, report row tuple -> rank.
+        """
+        ranks = self.ranks.get(key)
+        if ranks is not None:
+            return ranks
+        rows = list(
+            dict.fromkeys(list(self.species.values()) + list(self.scientific.values()))
+        )
+        if key == "name":
+            keys = [(row[0] or "", collation_key(row[1] or "")) for row in rows]
+        elif key == "german":
+            keys = [(collation_key(row[1] or ""), row[0] or "") for row in rows]
+        elif key == "category":
+            keys = [
+                (category_rank(row[5]), collation_key(row[1] or ""), row[0] or "")
+                for row in rows
+            ]
+        else:
+            raise ValueError("Unknown sort key: {}".format(key))
+        order = sorted(range(len(rows)), key=keys.__getitem__)
+        ranks = {rows[i]: rank for rank, i in enumerate(order)}
+        self.ranks[key] = ranks
+        return ranks
+
+
+def category_rank(category):
+    """
+    Return the severity rank of a red list category, unknown categories last.
+
+    Parameters:
+    - category: str, the category code, None if missing.
+    """
+    try:
+        return CATEGORIES.index(category)
+    except ValueError:
+        return len(CATEGORIES)
+
+
+def report_rows(df):
+    """
+    Return the report columns of a red list as tuples of str, None for missing values.
+
+    Parameters:
+    - df: pandas.DataFrame, (part of) the red list.
+    """
+    values = df[REPORT_COLUMNS].astype(object)
+    values = values.where(values.notna(), None)
+    return list(values.itertuples(index=False, name=None))
+
+
+def string_dtype():
+    """
+    Return the dtype of the name columns: pyarrow-backed strings if pyarrow is installed.
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return object
+    return "string[pyarrow]"
+
+
+def read_lut(path):
+    """
+    Read a red list file with compact dtypes.
+
+    Parameters:
+    - path: str, the pipe separated red list file.
+
+    Only the report columns are read, the status columns as categoricals of
+    their codes (also numeric codes such as "2" stay strings), the names as
+    pyarrow-backed strings where available.
+    """
+    dtype = dict.fromkeys(STATUS_COLUMNS, "category")
+    dtype.update(dict.fromkeys(["Name", "Deutscher Name"], string_dtype()))
+    return pd.read_csv(path, sep="|", usecols=REPORT_COLUMNS, dtype=dtype)
+
+
+def read_groups(path, column=GROUP_COLUMN):
+    """
+    Read the taxonomic group of each species from a red list file.
+
+    Parameters:
+    - path: str, the pipe separated red list file.
+    - column: str, the column holding the groups, e.g. a class or order.
+
+    Returns a dict, scientific name -> group. It is empty if the red list has
+    no such column.
+    """
+    if column not in pd.read_csv(path, sep="|", nrows=0).columns:
+        return {}
+    df = pd.read_csv(path, sep="|", usecols=["Name", column], dtype=str)
+    df = df.dropna().drop_duplicates("Name", keep="first")
+    return dict(zip(df["Name"], df[column]))
+
+
+def cached(path, loader, kind=None):
+    """
+    Load a file once per process, reloading it when its mtime changes.
+
+    Parameters:
+    - path: str, the file to be loaded.
+    - loader: callable, creates the cached object from the path.
+    - kind: str, separates different objects loaded from the same file.
+
+    The returned objects are shared, callers must not modify them.
+    """
+    path = os.path.realpath(path)
+    mtime = os.stat(path).st_mtime_ns
+    key = (kind, path)
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] == mtime:
+            return entry[1]
+    value = loader(path)
+    with _lock:
+        _cache[key] = (mtime, value)
+    return value
+
+
+def load_lut(path=FAUNA_CSV):
+    """
+    Return the cached look-up table for fauna data.
+
+    Parameters:
+    - path: str, the pipe separated red list file.
+    """
+    return cached(path, lambda p: LookupTable(read_lut(p)))
+
+
+def load_groups(path=FAUNA_CSV, column=GROUP_COLUMN):
+    """
+    Return the cached taxonomic groups of a red list, see read_groups.
+
+    Parameters:
+    - path: str, the pipe separated red list file.
+    - column: str, the column holding the groups.
+    """
+    return cached(path, lambda p: read_groups(p, column), ("groups", column))
+
+
+def load_legend(path=LEGEND_CSV):
+    """
+    Return the cached legend for table colors.
+
+    Parameters:
+    - path: str, the pipe separated legend file.
+    """
+    return cached(path, lambda p: pd.read_csv(p, sep="|"))
+
+
+def warm_up():
+    """
+    Load the look-up table and legend into the cache if they exist.
+    """
+    for path, loader in ((FAUNA_CSV, load_lut), (LEGEND_CSV, load_legend)):
+        if os.path.exists(path):
+            loader(path)
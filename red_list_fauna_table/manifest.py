@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+
+from .lut import cached
+
+# Bump when the table layout changes, older documents are then rebuilt
+VERSION = 3
+
+
+def manifest_path(outpath):
+    """
+    Return the path of the manifest stored next to a document.
+
+    Parameters:
+    - outpath: str, the .docx file.
+    """
+    return os.path.splitext(outpath)[0] + ".manifest.json"
+
+
+def file_hash(path):
+    """
+    Return the cached SHA-1 of a file, recomputed when its mtime changes.
+
+    Parameters:
+    - path: str, the file to be hashed.
+    """
+
+    def digest(p):
+        sha1 = hashlib.sha1()
+        with open(p, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                sha1.update(chunk)
+        return sha1.hexdigest()
+
+    return cached(path, digest, "sha1")
+
+
+def read_manifest(outpath):
+    """
+    Read the manifest of a document.
+
+    Parameters:
+    - outpath: str, the .docx file.
+
+    Returns the manifest as dict, None if the document or its manifest is
+    missing, unreadable or written by another manifest version.
+    """
+    path = manifest_path(outpath)
+    if not os.path.exists(outpath) or not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("version") != VERSION:
+        return None
+    return manifest
+
+
+def write_manifest(outpath, names, lut_hash, template_hash, table, options, layout):
+    """
+    Write the manifest of a document.
+
+    Parameters:
+    - outpath: str, the .docx file.
+    - names: iterable of str, the species names the table was built from.
+    - lut_hash: str, hash of the red list the table was built from.
+    - template_hash: str, hash of the template the document was opened from.
+    - table: int, index of the species table among the document tables.
+    - options: dict, the name matching options the table was built with.
+    - layout: dict, the options shaping the table, such as its columns and
+      row order. A document is only updated with the same layout.
+    """
+    manifest = {
+        "version": VERSION,
+        "lut": lut_hash,
+        "template": template_hash,
+        "table": table,
+        "options": options,
+        "layout": layout,
+        "names": sorted(names),
+    }
+    with open(manifest_path(outpath), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(",", ":"))
+
+
+def remove_manifest(outpath):
+    """
+    Remove the manifest of a document, if there is one.
+
+    Called whenever a document is written without a manifest, so a later
+    incremental run does not trust the manifest of the previous document.
+
+    Parameters:
+    - outpath: str, the .docx file.
+    """
+    try:
+        os.remove(manifest_path(outpath))
+    except FileNotFoundError:
+        pass
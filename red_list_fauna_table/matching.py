@@ -0,0 +1,279 @@
+import functools
+import re
+import threading
+import unicodedata
+
+import numpy as np
+
+# Transliteration of German special characters, applied after casefold()
+# (which already turns ß into ss)
+UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue"})
+
+PARENTHESES = re.compile(r"\(([^)]*)\)|\[([^\]]*)\]")
+
+# Ways a name can be resolved, in the order they are tried
+EXACT = "exact"
+NORMALIZED = "normalized"
+SCIENTIFIC = "scientific"
+FUZZY = "fuzzy"
+
+
+def normalize(name):
+    """
+    Return the normalized form of a species name used for matching.
+
+    Case is folded, umlauts are transliterated, other accents removed,
+    parenthetical remarks dropped, hyphens and runs of whitespace collapsed
+    to a single space.
+
+    Parameters:
+    - name: str, the species name.
+    """
+    name = PARENTHESES.sub(" ", name).casefold().translate(UMLAUTS)
+    if not name.isascii():
+        name = "".join(
+            c
+            for c in unicodedata.normalize("NFKD", name)
+            if not unicodedata.combining(c)
+        )
+    return " ".join(name.replace("-", " ").replace("_", " ").split())
+
+
+@functools.lru_cache(maxsize=None)
+def german_collator():
+    """
+    Return the German ICU collator, None if PyICU is not installed.
+    """
+    try:
+        import icu
+    except ImportError:
+        return None
+    return icu.Collator.createInstance(icu.Locale("de_DE"))
+
+
+def collation_key(text):
+    """
+    Return a key sorting German text as in a dictionary (DIN 5007-1).
+
+    Umlauts sort as their base letter and ß as ss, case and accents only
+    break ties. The German collation of ICU is used if PyICU is installed.
+
+    Parameters:
+    - text: str, the text to be sorted.
+    """
+    collator = german_collator()
+    if collator is not None:
+        return collator.getSortKey(text)
+    folded = text.casefold()
+    base = "".join(
+        c for c in unicodedata.normalize("NFKD", folded) if not unicodedata.combining(c)
+    )
+    return base, folded, text
+
+
+def parenthetical(name):
+    """
+    Return the texts in parentheses or brackets of a name, e.g. a scientific name.
+
+    Parameters:
+    - name: str, the species name.
+    """
+    return [a or b for a, b in PARENTHESES.findall(name) if (a or b).strip()]
+
+
+def trigrams(key):
+    """
+    Return the set of trigrams of a normalized name, padded at both ends.
+
+    Parameters:
+    - key: str, the normalized name.
+    """
+    padded = "  {} ".format(key)
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """
+    Return the Levenshtein distance of two strings, or limit + 1 if it exceeds limit.
+
+    Parameters:
+    - a, b: str, the strings to be compared.
+    - limit: int, the largest distance of interest.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(
+                min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            )
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def max_distance(key):
+    """
+    Return the number of typos tolerated in a normalized name of this length.
+
+    Parameters:
+    - key: str, the normalized name.
+    """
+    if len(key) < 5:
+        return 0
+    return 1 if len(key) < 10 else 2
+
+
+class TrigramIndex:
+    """
+    Candidate index for typo tolerant look-up of normalized names.
+
+    Each trigram maps to a compact run of the indexes of the names holding
+    it, the trigrams of the names themselves are not kept. Counting the
+    postings of a query gives the trigrams shared with every name at once.
+    """
+
+    # Number of best trigram candidates compared by edit distance
+    CANDIDATES = 8
+
+    def __init__(self, keys):
+        """
+        Constructor for the TrigramIndex class.
+
+        Parameters:
+        - keys: iterable of str, the normalized names.
+        """
+        self.keys = list(dict.fromkeys(keys))
+        self.lengths = np.fromiter(map(len, self.keys), np.int32, len(self.keys))
+        # Postings of all trigrams in one array, those of a trigram slot are
+        # ids[offsets[slot] : offsets[slot + 1]]
+        self.slots = {}  # trigram -> slot
+        slots, ids = [], []
+        for i, key in enumerate(self.keys):
+            grams = trigrams(key)
+            slots.extend(self.slots.setdefault(gram, len(self.slots)) for gram in grams)
+            ids.extend([i] * len(grams))
+        slots = np.array(slots, dtype=np.int32)
+        self.ids = np.array(ids, dtype=np.int32)[np.argsort(slots, kind="stable")]
+        self.offsets = np.zeros(len(self.slots) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(slots, minlength=len(self.slots)), out=self.offsets[1:])
+
+    def search(self, key):
+        """
+        Return the closest indexed name within max_distance of key, None if there is none.
+
+        Parameters:
+        - key: str, the normalized name.
+
+        Ties are resolved in favour of the name indexed first.
+        """
+        limit = max_distance(key)
+        if limit == 0:
+            return None
+        grams = trigrams(key)
+        hits = [
+            self.ids[self.offsets[slot] : self.offsets[slot + 1]]
+            for slot in (self.slots.get(gram) for gram in grams)
+            if slot is not None
+        ]
+        if not hits:
+            return None
+        # Each edit destroys at most three trigrams, so a match shares at
+        # least `required` of them
+        required = max(1, len(grams) - 3 * limit)
+        shared = np.bincount(np.concatenate(hits))
+        candidates = np.flatnonzero(shared >= required)
+        candidates = candidates[np.abs(self.lengths[candidates] - len(key)) <= limit]
+        # Most shared trigrams first, then the name indexed first
+        candidates = candidates[np.lexsort((candidates, -shared[candidates]))]
+        best, best_distance = None, limit + 1
+        for i in sorted(candidates[: self.CANDIDATES].tolist()):
+            distance = edit_distance(key, self.keys[i], limit)
+            if distance < best_distance:
+                best, best_distance = self.keys[i], distance
+        return best
+
+
+class NameMatcher:
+    """
+    Resolves species names to red list rows, tolerating spelling variants.
+    """
+
+    def __init__(self, species, scientific):
+        """
+        Constructor for the NameMatcher class.
+
+        Parameters:
+        - species: dict, German name -> row.
+        - scientific: dict, scientific name -> row.
+
+        The normalized and typo tolerant indexes are built on the first name
+        without an exact match, most layers never need them. If normalized
+        names collide, the first one wins.
+        """
+        self.species = species
+        self.scientific = scientific
+        self._indexes = None
+        self._lock = threading.Lock()
+
+    def indexes(self):
+        """
+        Return the normalized and typo tolerant indexes, built on first use.
+
+        Returns a (by_german, by_scientific, fuzzy_german, fuzzy_scientific)
+        tuple, the first two map normalized names to rows.
+        """
+        with self._lock:
+            if self._indexes is None:
+                by_german = {}
+                for name, row in self.species.items():
+                    by_german.setdefault(normalize(name), row)
+                by_scientific = {}
+                for name, row in self.scientific.items():
+                    by_scientific.setdefault(normalize(name), row)
+                self._indexes = (
+                    by_german,
+                    by_scientific,
+                    TrigramIndex(by_german),
+                    TrigramIndex(by_scientific),
+                )
+            return self._indexes
+
+    def resolve(self, name, scientific=True, fuzzy=True):
+        """
+        Resolve a species name to its red list row.
+
+        Parameters:
+        - name: str, the name as found in the layer.
+        - scientific: bool, also match scientific names.
+        - fuzzy: bool, tolerate typos.
+
+        Returns a (row, method) tuple, method is one of EXACT, NORMALIZED,
+        SCIENTIFIC and FUZZY. Unmatched names give (None, None).
+        """
+        row = self.species.get(name)
+        if row is not None:
+            return row, EXACT
+        by_german, by_scientific, fuzzy_german, fuzzy_scientific = self.indexes()
+        key = normalize(name)
+        row = by_german.get(key)
+        if row is not None:
+            return row, NORMALIZED
+        if scientific:
+            # The whole name or a remark like "Kiebitz (Vanellus vanellus)"
+            for candidate in [key] + [normalize(p) for p in parenthetical(name)]:
+                row = by_scientific.get(candidate)
+                if row is not None:
+                    return row, SCIENTIFIC
+        if fuzzy:
+            match = fuzzy_german.search(key)
+            if match is not None:
+                return by_german[match], FUZZY
+            if scientific:
+                match = fuzzy_scientific.search(key)
+                if match is not None:
+                    return by_scientific[match], FUZZY
+        return None, None
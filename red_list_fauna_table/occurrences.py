@@ -0,0 +1,198 @@
+from array import array
+import datetime
+
+import numpy as np
+import pandas as pd
+
+# Code of a missing value in the code columns
+MISSING = -1
+
+# Table columns of the occurrence statistics, in table order
+RECORDS_COLUMN = "Nachweise"
+FIRST_COLUMN = "Erster Nachweis"
+LAST_COLUMN = "Letzter Nachweis"
+SITES_COLUMN = "Fundorte"
+
+DATE_FORMAT = "%d.%m.%Y"
+
+
+class OccurrenceExtract:
+    """
+    Columnar extract of occurrence records: species name, date and site.
+
+    Each column is stored as an array of 64 bit codes plus the distinct
+    values they refer to, so millions of records take a few bytes each and
+    no feature objects are kept.
+    """
+
+    COLUMNS = ("name", "date", "site")
+
+    def __init__(self):
+        """
+        Constructor for the OccurrenceExtract class.
+        """
+        self.values = {column: {} for column in self.COLUMNS}  # value -> code
+        self.codes = {column: array("q") for column in self.COLUMNS}
+
+    def __len__(self):
+        return len(self.codes["name"])
+
+    def code(self, column, value):
+        """
+        Return the code of a value, adding it to the distinct values if new.
+
+        Parameters:
+        - column: str, one of COLUMNS.
+        - value: the value, None for a missing value.
+        """
+        if value is None:
+            return MISSING
+        values = self.values[column]
+        code = values.get(value)
+        if code is None:
+            code = values[value] = len(values)
+        return code
+
+    def add(self, name, date=None, site=None):
+        """
+        Add a record, records without a species name are ignored.
+
+        Parameters:
+        - name: str, the species name, other values are added as text.
+        - date: datetime.date, datetime.datetime or str, the observation date (optional).
+        - site: hashable, identifies the site of the observation (optional).
+        """
+        if not name:
+            return
+        if not isinstance(name, str):
+            name = str(name)
+        self.codes["name"].append(self.code("name", name))
+        self.codes["date"].append(self.code("date", date))
+        self.codes["site"].append(self.code("site", site))
+
+    def names(self):
+        """
+        Return the set of distinct species names.
+        """
+        return set(self.values["name"])
+
+    def column(self, column):
+        """
+        Return the codes of a column as numpy array, without copying.
+
+        Parameters:
+        - column: str, one of COLUMNS.
+        """
+        return np.frombuffer(self.codes[column], dtype=np.int64)
+
+
+def parse_dates(values):
+    """
+    Convert distinct date values to a datetime64 array, NaT where unparsable.
+
+    Parameters:
+    - values: list of datetime.date, datetime.datetime or str. Strings are
+      read day first, as in "31.12.2023", or as ISO dates.
+    """
+    values = [
+        (
+            datetime.datetime.combine(v, datetime.time())
+            if isinstance(v, datetime.date) and not isinstance(v, datetime.datetime)
+            else v
+        )
+        for v in values
+    ]
+    series = pd.Series(values, dtype=object)
+    parsed = pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns]")
+    # ISO dates first ("ISO8601" needs pandas 2, older versions only find
+    # plain dates), everything else such as German dates is read day first
+    for iso in ("ISO8601", "%Y-%m-%d"):
+        rest = parsed.isna() & series.notna()
+        if rest.any():
+            parsed[rest] = pd.to_datetime(series[rest], errors="coerce", format=iso)
+    rest = parsed.isna() & series.notna()
+    if rest.any():
+        try:
+            parsed[rest] = pd.to_datetime(
+                series[rest], errors="coerce", dayfirst=True, format="mixed"
+            )
+        except (TypeError, ValueError):  # pandas < 2 has no mixed format
+            parsed[rest] = pd.to_datetime(series[rest], errors="coerce", dayfirst=True)
+    return parsed.to_numpy(dtype="datetime64[ns]")
+
+
+def summarize(extract, rows):
+    """
+    Aggregate the records per table row in a single vectorized groupby.
+
+    Parameters:
+    - extract: OccurrenceExtract, the records.
+    - rows: dict, species name -> index of its table row. Spelling variants
+      of one species share a row, their records are counted together.
+
+    Returns a DataFrame indexed by row index with the columns records,
+    first and last (datetime64, NaT without dates) and sites.
+    """
+    name_rows = np.array(
+        [rows[name] for name in extract.values["name"]], dtype=np.int64
+    )
+    # A trailing NaT is picked by the MISSING (-1) codes
+    dates = np.append(parse_dates(list(extract.values["date"])), np.datetime64("NaT"))
+    sites = extract.column("site")
+    frame = pd.DataFrame(
+        {
+            "row": name_rows[extract.column("name")],
+            "date": dates[extract.column("date")],
+            "site": np.where(sites == MISSING, np.nan, sites),
+        }
+    )
+    return frame.groupby("row", sort=False).agg(
+        records=("row", "size"),
+        first=("date", "min"),
+        last=("date", "max"),
+        sites=("site", "nunique"),
+    )
+
+
+def occurrence_columns(dates=False, sites=False):
+    """
+    Return the titles of the occurrence columns shown in the table.
+
+    Parameters:
+    - dates: bool, show the first and last observation date.
+    - sites: bool, show the number of distinct sites.
+    """
+    columns = [RECORDS_COLUMN]
+    if dates:
+        columns += [FIRST_COLUMN, LAST_COLUMN]
+    if sites:
+        columns.append(SITES_COLUMN)
+    return columns
+
+
+def occurrence_frame(summary, count, dates=False, sites=False):
+    """
+    Format aggregated occurrence statistics as table columns.
+
+    Parameters:
+    - summary: DataFrame, see summarize.
+    - count: int, number of table rows, rows without records show "-".
+    - dates, sites: bool, see occurrence_columns.
+
+    Returns a DataFrame of str with one row per table row, in row index order.
+    """
+    summary = summary.reindex(range(count))
+    frame = pd.DataFrame(index=summary.index)
+    frame[RECORDS_COLUMN] = summary["records"]
+    if dates:
+        frame[FIRST_COLUMN] = summary["first"].dt.strftime(DATE_FORMAT)
+        frame[LAST_COLUMN] = summary["last"].dt.strftime(DATE_FORMAT)
+    if sites:
+        frame[SITES_COLUMN] = summary["sites"]
+    frame = frame.astype(object)
+    frame = frame.where(frame.notna(), "-")
+    # Counts are floats after reindexing
+    for column in (RECORDS_COLUMN, SITES_COLUMN):
+        if column in frame:
+            frame[column] = [v if v == "-" else str(int(v)) for v in frame[column]]
+    return frame
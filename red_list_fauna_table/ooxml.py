@@ -0,0 +1,356 @@
+import bisect
+from collections import namedtuple
+from xml.sax.saxutils import escape
+
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.table import Table
+
+# Header row of a taxonomic group among the body rows of a table
+GroupRow = namedtuple("GroupRow", ["title"])
+
+
+def run_xml(text, rpr=""):
+    """
+    Build the run markup for a cell text, line breaks become <w:br/>.
+
+    Parameters:
+    - text: str, the text of the run.
+    - rpr: str, run properties markup (<w:rPr>) applied to the text.
+    """
+    # Empty texts are self-closing, as lxml writes them
+    lines = [
+        (
+            '<w:t xml:space="preserve">{}</w:t>'.format(escape(line))
+            if line
+            else '<w:t xml:space="preserve"/>'
+        )
+        for line in text.split("\n")
+    ]
+    return "<w:r>{}{}</w:r>".format(rpr, "<w:br/>".join(lines))
+
+
+def rpr_xml(bold=False, size=None):
+    """
+    Build run properties markup, empty if nothing is set.
+
+    Parameters:
+    - bold: bool, bold text.
+    - size: docx.shared.Length, font size.
+    """
+    props = "<w:b/>" if bold else ""
+    if size is not None:
+        props += '<w:sz w:val="{}"/>'.format(int(round(size.pt * 2)))
+    return "<w:rPr>{}</w:rPr>".format(props) if props else ""
+
+
+def cell_xml(text, width, fill=None, jc="center", rpr=""):
+    """
+    Build the markup of a single table cell.
+
+    Parameters:
+    - text: str, the cell text.
+    - width: int, cell width in twips.
+    - fill: str, background color of the cell (None for no shading).
+    - jc: str, paragraph alignment of the cell text.
+    - rpr: str, run properties markup of the cell text.
+    """
+    shd = '<w:shd w:fill="{}"/>'.format(fill) if fill is not None else ""
+    return (
+        '<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{}"/>{}</w:tcPr>'
+        '<w:p><w:pPr><w:jc w:val="{}"/></w:pPr>{}</w:p></w:tc>'
+    ).format(width, shd, jc, run_xml(text, rpr))
+
+
+def row_xml(row, twips, fills=None, rpr="", standalone=False, repeat=False):
+    """
+    Build the markup of a table row.
+
+    Parameters:
+    - row: list of str, the cell texts.
+    - twips: list of int, the column widths in twips.
+    - fills: dict, maps a column index to a dict of cell value -> fill color (optional).
+    - rpr: str, run properties markup of the cell texts.
+    - standalone: bool, declare the namespace to parse the row on its own.
+    - repeat: bool, repeat the row at the top of every page the table spans.
+    """
+    fills = fills or {}
+    parts = ["<w:tr {}>".format(nsdecls("w")) if standalone else "<w:tr>"]
+    if repeat:
+        parts.append("<w:trPr><w:tblHeader/></w:trPr>")
+    for j, (text, w) in enumerate(zip(row, twips)):
+        fill = fills[j].get(text) if j in fills else None
+        parts.append(cell_xml(text, w, fill, rpr=rpr))
+    parts.append("</w:tr>")
+    return "".join(parts)
+
+
+def group_row_xml(title, twips, rpr=""):
+    """
+    Build the markup of a group header row, a single cell spanning all columns.
+
+    Parameters:
+    - title: str, the group name.
+    - twips: list of int, the column widths in twips.
+    - rpr: str, run properties markup of the title.
+    """
+    return (
+        '<w:tr><w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{}"/><w:gridSpan w:val="{}"/>'
+        '</w:tcPr><w:p><w:pPr><w:keepNext/><w:jc w:val="left"/></w:pPr>{}</w:p>'
+        "</w:tc></w:tr>"
+    ).format(sum(twips), len(twips), run_xml(title, rpr))
+
+
+def iter_table_xml(
+    header,
+    rows,
+    widths,
+    fills=None,
+    style="TableGrid",
+    progress=None,
+    header_bold=False,
+    header_size=None,
+    standalone=True,
+    repeat_header=False,
+):
+    """
+    Generate the markup of a whole <w:tbl> element piece by piece, one row at a time.
+
+    Parameters:
+    - header: list of str, the column headers.
+    - rows: list of lists of str, the body rows. A GroupRow among them is
+      written as group header row, kept on the page of the next row.
+    - widths: list of docx.shared.Length, the column widths.
+    - fills: dict, maps a column index to a dict of cell value -> fill color (optional).
+    - style: str, id of the table style.
+    - progress: callable, called with the share of rows written so far (optional).
+    - header_bold: bool, bold header text.
+    - header_size: docx.shared.Length, font size of the header text (optional).
+    - standalone: bool, declare the namespace to parse the table on its own.
+    - repeat_header: bool, repeat the header row on every page.
+    """
+    header_rpr = rpr_xml(header_bold, header_size)
+    twips = [w.twips for w in widths]
+    parts = [
+        "<w:tbl {}>".format(nsdecls("w")) if standalone else "<w:tbl>",
+        '<w:tblPr><w:tblStyle w:val="{}"/><w:tblW w:type="auto" w:w="0"/>'
+        '<w:jc w:val="center"/><w:tblLayout w:type="fixed"/>'
+        '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" '
+        'w:lastRow="0" w:noHBand="0" w:noVBand="1" w:val="04A0"/>'
+        "</w:tblPr>".format(style),
+        "<w:tblGrid>",
+    ]
+    parts.extend('<w:gridCol w:w="{}"/>'.format(w) for w in twips)
+    parts.append("</w:tblGrid>")
+    parts.append(row_xml(header, twips, rpr=header_rpr, repeat=repeat_header))
+    yield "".join(parts)
+
+    group_rpr = rpr_xml(bold=True)
+    for i, row in enumerate(rows):
+        if progress is not None and i % 100 == 0:
+            progress(i / len(rows))
+        if isinstance(row, GroupRow):
+            yield group_row_xml(row.title, twips, group_rpr)
+        else:
+            yield row_xml(row, twips, fills)
+    yield "</w:tbl>"
+
+
+def table_xml(*args, **kwargs):
+    """
+    Build the markup of a whole <w:tbl> element in one pass.
+
+    Parameters: see iter_table_xml.
+    """
+    return "".join(iter_table_xml(*args, **kwargs))
+
+
+def caption_xml(title, page_break=False, standalone=False):
+    """
+    Build the markup of the heading paragraph above a part of a split table.
+
+    Parameters:
+    - title: str, the heading text.
+    - page_break: bool, start the part on a new page.
+    - standalone: bool, declare the namespace to parse the paragraph on its own.
+    """
+    return (
+        '<w:p{}><w:pPr><w:pStyle w:val="Heading2"/><w:keepNext/>{}</w:pPr>{}</w:p>'
+    ).format(
+        " " + nsdecls("w") if standalone else "",
+        "<w:pageBreakBefore/>" if page_break else "",
+        run_xml(title),
+    )
+
+
+def chunk_progress(progress, chunks):
+    """
+    Return one progress callable per chunk, scaled to the share of its rows.
+
+    Parameters:
+    - progress: callable, called with the share of all rows written so far (optional).
+    - chunks: list of (title, rows) tuples, see iter_body_xml.
+    """
+    total = sum(len(rows) for _, rows in chunks) or 1
+    callables = []
+    done = 0
+    for _, rows in chunks:
+        callables.append(
+            None
+            if progress is None
+            else lambda f, done=done, n=len(rows): progress((done + f * n) / total)
+        )
+        done += len(rows)
+    return callables
+
+
+def iter_body_xml(header, chunks, widths, progress=None, standalone=True, **kwargs):
+    """
+    Generate the markup of the species table, split into parts with headings.
+
+    Parameters:
+    - header, widths, kwargs: see iter_table_xml.
+    - chunks: list of (title, rows) tuples, one table per part. A part with
+      title None is a plain table, the others get a heading, repeated header
+      rows and start on a new page after the first part.
+    - progress: callable, called with the share of all rows written so far (optional).
+    - standalone: bool, declare the namespace in every paragraph and table.
+    """
+    for k, ((title, rows), part_progress) in enumerate(
+        zip(chunks, chunk_progress(progress, chunks))
+    ):
+        if title is not None:
+            yield caption_xml(title, k > 0, standalone)
+        yield from iter_table_xml(
+            header,
+            rows,
+            widths,
+            progress=part_progress,
+            standalone=standalone,
+            repeat_header=title is not None,
+            **kwargs
+        )
+
+
+def add_tables(doc, header, chunks, widths, progress=None, anchor=None, **kwargs):
+    """
+    Add the parts of a split table, with their headings, to the document body.
+
+    Parameters:
+    - doc: docx.Document, the target document.
+    - header, chunks, widths, progress, kwargs: see iter_body_xml.
+    - anchor: body element replaced by the tables, None to append them to the end.
+
+    Returns the list of docx.table.Table wrapping the new tables.
+    """
+    elements = []
+    for k, ((title, rows), part_progress) in enumerate(
+        zip(chunks, chunk_progress(progress, chunks))
+    ):
+        if title is not None:
+            elements.append(parse_xml(caption_xml(title, k > 0, standalone=True)))
+        elements.append(
+            parse_xml(
+                table_xml(
+                    header,
+                    rows,
+                    widths,
+                    progress=part_progress,
+                    repeat_header=title is not None,
+                    **kwargs
+                )
+            )
+        )
+    for element in elements:
+        if anchor is None:
+            doc.element.body._insert_tbl(element)
+        else:
+            anchor.addprevious(element)
+    if anchor is not None:
+        anchor.getparent().remove(anchor)
+    return [Table(tbl, doc._body) for tbl in elements if tbl.tag == qn("w:tbl")]
+
+
+def add_table(
+    doc, header, rows, widths, fills=None, progress=None, anchor=None, **kwargs
+):
+    """
+    Add a table built by table_xml to the document body.
+
+    Parameters:
+    - doc: docx.Document, the target document.
+    - header, rows, widths, fills, progress, kwargs: see table_xml.
+    - anchor: body element replaced by the table, None to append it to the end.
+
+    Returns the docx.table.Table wrapping the new element.
+    """
+    return add_tables(
+        doc, header, [(None, rows)], widths, progress, anchor, fills=fills, **kwargs
+    )[0]
+
+
+def row_texts(tr):
+    """
+    Return the cell texts of a table row, line breaks as "\n".
+
+    Parameters:
+    - tr: the <w:tr> element.
+    """
+    texts = []
+    for tc in tr.tc_lst:
+        text = ""
+        for el in tc.iter(qn("w:t"), qn("w:br")):
+            text += "\n" if el.tag == qn("w:br") else el.text or ""
+        texts.append(text)
+    return texts
+
+
+def insert_rows(table, rows, key, fills=None):
+    """
+    Insert body rows into a sorted table, keeping the order.
+
+    Parameters:
+    - table: docx.table.Table, built by add_table, its body rows sorted by key.
+    - rows: list of lists of str, the rows to be inserted.
+    - key: callable, returns the sort key of a row given its cell texts.
+    - fills: dict, maps a column index to a dict of cell value -> fill color (optional).
+    """
+    tbl = table._tbl
+    twips = [
+        int(col.get(qn("w:w"))) for col in tbl.tblGrid.iterchildren(qn("w:gridCol"))
+    ]
+    body = tbl.tr_lst[1:]
+    keys = [key(row_texts(tr)) for tr in body]
+    # Insert from the end so earlier positions stay valid
+    for row in sorted(rows, key=key, reverse=True):
+        tr = parse_xml(row_xml(row, twips, fills, standalone=True))
+        i = bisect.bisect_right(keys, key(row))
+        if i < len(body):
+            body[i].addprevious(tr)
+        else:
+            tbl.append(tr)
+        body.insert(i, tr)
+        keys.insert(i, key(row))
+
+
+def remove_rows(table, rows):
+    """
+    Remove one body row per given row of cell texts.
+
+    Parameters:
+    - table: docx.table.Table, built by add_table.
+    - rows: list of lists of str, the rows to be removed.
+
+    Returns the number of rows removed, rows not found in the table are ignored.
+    """
+    remaining = {}
+    for row in rows:
+        remaining[tuple(row)] = remaining.get(tuple(row), 0) + 1
+    removed = 0
+    for tr in table._tbl.tr_lst[1:]:
+        texts = tuple(row_texts(tr))
+        if remaining.get(texts):
+            remaining[texts] -= 1
+            tr.getparent().remove(tr)
+            removed += 1
+    return removed
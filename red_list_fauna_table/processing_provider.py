@@ -0,0 +1,418 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ RedListFaunaProvider
+                                 A QGIS plugin
+ Erstellt docx Tabellen über Fauna.
+                              -------------------
+        begin                : 2023-12-15
+        copyright            : (C) 2023 by Till Frankenbach
+        email                : till.frankenbach@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import os
+
+from qgis.PyQt.QtCore import QCoreApplication
+from qgis.PyQt.QtGui import QIcon
+from qgis.core import (
+    QgsCoordinateTransform,
+    QgsGeometry,
+    QgsProcessing,
+    QgsProcessingAlgorithm,
+    QgsProcessingException,
+    QgsProcessingParameterBoolean,
+    QgsProcessingParameterEnum,
+    QgsProcessingParameterFeatureSource,
+    QgsProcessingParameterField,
+    QgsProcessingParameterFile,
+    QgsProcessingParameterFileDestination,
+    QgsProcessingParameterMultipleLayers,
+    QgsProcessingParameterNumber,
+    QgsProcessingParameterString,
+    QgsProcessingParameterVectorLayer,
+    QgsProcessingProvider,
+    QgsVectorLayer,
+    QgsVectorLayerFeatureSource,
+)
+
+from .instrumentation import summary
+from .layer_source import fingerprint, profile_cache, study_area
+from .lut import SORT_KEYS
+from .tablemaker import SPLITS, GenerationCanceled, LayerInput, redListFauna
+from .writers import FILE_FILTERS
+from .writers import FORMATS as OUTPUT_FORMATS
+
+
+class RedListFaunaAlgorithm(QgsProcessingAlgorithm):
+    """Processing algorithm writing the red list table of one or more layers."""
+
+    INPUT = "INPUT"
+    FIELD = "FIELD"
+    MORE_FIELDS = "MORE_FIELDS"
+    MORE_INPUTS = "MORE_INPUTS"
+    SELECTED_ONLY = "SELECTED_ONLY"
+    AREA = "AREA"
+    TEMPLATE = "TEMPLATE"
+    INCREMENTAL = "INCREMENTAL"
+    SCIENTIFIC = "SCIENTIFIC"
+    FUZZY = "FUZZY"
+    OCCURRENCES = "OCCURRENCES"
+    DATE_FIELD = "DATE_FIELD"
+    SITE_FIELD = "SITE_FIELD"
+    FORMATS = "FORMATS"
+    STREAMING = "STREAMING"
+    SORT_BY = "SORT_BY"
+    GROUP_BY = "GROUP_BY"
+    SPLIT = "SPLIT"
+    CHUNK_ROWS = "CHUNK_ROWS"
+    SEPARATE = "SEPARATE"
+    OUTPUT = "OUTPUT"
+
+    def tr(self, string):
+        return QCoreApplication.translate("RedListFaunaAlgorithm", string)
+
+    def createInstance(self):
+        return RedListFaunaAlgorithm()
+
+    def name(self):
+        return "redlistfaunatable"
+
+    def displayName(self):
+        return self.tr("Rote Liste Fauna Tabelle")
+
+    def shortHelpString(self):
+        return self.tr(
+            "Creates a .docx table with the red list status of all species "
+            "named in a field of the input layer. Further fields and layers "
+            "are added to the same table, each further layer is read with "
+            "the species fields it has. With a study area only features "
+            "intersecting its polygons are used."
+        )
+
+    def initAlgorithm(self, config=None):
+        self.addParameter(
+            QgsProcessingParameterVectorLayer(
+                self.INPUT,
+                self.tr("Fauna layer"),
+                [QgsProcessing.TypeVectorAnyGeometry],
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterField(
+                self.FIELD,
+                self.tr("Species field"),
+                parentLayerParameterName=self.INPUT,
+                type=QgsProcessingParameterField.String,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterField(
+                self.MORE_FIELDS,
+                self.tr("Further species fields"),
+                parentLayerParameterName=self.INPUT,
+                type=QgsProcessingParameterField.String,
+                allowMultiple=True,
+                optional=True,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterMultipleLayers(
+                self.MORE_INPUTS,
+                self.tr("Further fauna layers"),
+                QgsProcessing.TypeVectorAnyGeometry,
+                optional=True,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.SELECTED_ONLY,
+                self.tr("Use features selected only"),
+                defaultValue=False,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFeatureSource(
+                self.AREA,
+                self.tr("Study area"),
+                [QgsProcessing.TypeVectorPolygon],
+                optional=True,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFile(
+                self.TEMPLATE,
+                self.tr("Document template"),
+                extension="docx",
+                optional=True,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.INCREMENTAL,
+                self.tr("Only update changed species of an existing document"),
+                defaultValue=False,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.SCIENTIFIC,
+                self.tr("Match scientific names as well"),
+                defaultValue=True,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.FUZZY,
+                self.tr("Tolerate typos in species names"),
+                defaultValue=True,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.OCCURRENCES,
+                self.tr("Add the number of records per species"),
+                defaultValue=False,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterField(
+                self.DATE_FIELD,
+                self.tr("Date field (first and last observation)"),
+                parentLayerParameterName=self.INPUT,
+                optional=True,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterField(
+                self.SITE_FIELD,
+                self.tr("Site field (number of distinct sites)"),
+                parentLayerParameterName=self.INPUT,
+                optional=True,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.FORMATS,
+                self.tr("Further output formats"),
+                options=OUTPUT_FORMATS,
+                allowMultiple=True,
+                optional=True,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.STREAMING,
+                self.tr("Stream the table into the document (very large tables)"),
+                defaultValue=False,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.SORT_BY,
+                self.tr("Sort the species by"),
+                options=list(SORT_KEYS),
+                defaultValue=0,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterString(
+                self.GROUP_BY,
+                self.tr("Group the species by this red list column (e.g. Gruppe)"),
+                optional=True,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterEnum(
+                self.SPLIT,
+                self.tr("Split the table by"),
+                options=list(SPLITS),
+                optional=True,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterNumber(
+                self.CHUNK_ROWS,
+                self.tr("Rows per part"),
+                minValue=1,
+                defaultValue=500,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterBoolean(
+                self.SEPARATE,
+                self.tr("Write each part to a document of its own"),
+                defaultValue=False,
+            )
+        )
+        self.addParameter(
+            QgsProcessingParameterFileDestination(
+                self.OUTPUT,
+                self.tr("Output document"),
+                ";;".join(self.tr(f) for f in FILE_FILTERS),
+            )
+        )
+
+    def prepareAlgorithm(self, parameters, context, feedback):
+        """
+        Read the layers, runs in the main thread before processAlgorithm.
+
+        Project layers must not be touched from the worker thread, so the
+        selection, feature counts and fingerprints are read here and every
+        layer is handed on as a QgsVectorLayerFeatureSource. Unfiltered layers
+        without unsaved edits are reopened in the worker thread instead, see
+        processAlgorithm.
+        """
+        layer = self.parameterAsVectorLayer(parameters, self.INPUT, context)
+        if layer is None:
+            raise QgsProcessingException(
+                self.invalidSourceError(parameters, self.INPUT)
+            )
+        field = self.parameterAsString(parameters, self.FIELD, context)
+        fields = [field] + [
+            name
+            for name in self.parameterAsFields(parameters, self.MORE_FIELDS, context)
+            if name != field
+        ]
+        layers = [layer] + [
+            other
+            for other in self.parameterAsLayerList(
+                parameters, self.MORE_INPUTS, context
+            )
+            if other.id() != layer.id()
+        ]
+
+        selected_only = self.parameterAsBoolean(parameters, self.SELECTED_ONLY, context)
+        area_source = self.parameterAsSource(parameters, self.AREA, context)
+        area = None
+        if area_source is not None:
+            area = study_area(area_source)
+            if area is None:
+                raise QgsProcessingException(
+                    self.tr("The study area has no polygons to filter by")
+                )
+        self.inputs = []
+        self.uris = []  # Source and provider of the layers to be reopened
+        fingerprints = []
+        for lyr in layers:
+            present = [name for name in fields if lyr.fields().indexOf(name) >= 0]
+            if not present:
+                raise QgsProcessingException(
+                    self.tr("{} has none of the species fields").format(lyr.name())
+                )
+            layer_area = None
+            if area is not None:
+                layer_area = QgsGeometry(area)
+                layer_area.transform(
+                    QgsCoordinateTransform(
+                        area_source.sourceCrs(), lyr.crs(), context.transformContext()
+                    )
+                )
+            uri = None
+            if selected_only:
+                selected_ids = lyr.selectedFeatureIds()
+                feature_count = len(selected_ids)
+            else:
+                selected_ids = None
+                feature_count = lyr.featureCount() if area is None else None
+                if (
+                    area is None
+                    and lyr.providerType() != "memory"
+                    and not lyr.isModified()
+                ):
+                    uri = (lyr.source(), lyr.providerType())
+            self.uris.append(uri)
+            self.inputs.append(
+                LayerInput(
+                    lyr.name(),
+                    QgsVectorLayerFeatureSource(lyr),
+                    present,
+                    selected_ids,
+                    feature_count,
+                    layer_area,
+                )
+            )
+            fingerprints.append(fingerprint(lyr, present, selected_ids, layer_area))
+        self.fingerprint = None if None in fingerprints else fingerprints
+        return True
+
+    def processAlgorithm(self, parameters, context, feedback):
+        outpath = self.parameterAsFileOutput(parameters, self.OUTPUT, context)
+        template_path = self.parameterAsFile(parameters, self.TEMPLATE, context)
+        # Without a selection or area the provider can return the distinct
+        # names itself (uniqueValues), from a private layer of this thread
+        inputs = []
+        for layer_input, uri in zip(self.inputs, self.uris):
+            if uri is not None:
+                worker_layer = QgsVectorLayer(uri[0], "fauna", uri[1])
+                if worker_layer.isValid():
+                    layer_input = layer_input._replace(source=worker_layer)
+            inputs.append(layer_input)
+
+        split = None
+        if parameters.get(self.SPLIT) is not None:
+            split = SPLITS[self.parameterAsEnum(parameters, self.SPLIT, context)]
+        report = redListFauna(
+            None,
+            None,
+            outpath,
+            inputs=inputs,
+            template_path=template_path or None,
+            incremental=self.parameterAsBoolean(parameters, self.INCREMENTAL, context),
+            scientific=self.parameterAsBoolean(parameters, self.SCIENTIFIC, context),
+            fuzzy=self.parameterAsBoolean(parameters, self.FUZZY, context),
+            occurrences=self.parameterAsBoolean(parameters, self.OCCURRENCES, context),
+            date_field=self.parameterAsString(parameters, self.DATE_FIELD, context)
+            or None,
+            site_field=self.parameterAsString(parameters, self.SITE_FIELD, context)
+            or None,
+            formats=[
+                OUTPUT_FORMATS[i]
+                for i in self.parameterAsEnums(parameters, self.FORMATS, context)
+            ],
+            streaming=self.parameterAsBoolean(parameters, self.STREAMING, context),
+            sort_by=SORT_KEYS[self.parameterAsEnum(parameters, self.SORT_BY, context)],
+            group_by=self.parameterAsString(parameters, self.GROUP_BY, context) or None,
+            split=split,
+            chunk_rows=self.parameterAsInt(parameters, self.CHUNK_ROWS, context),
+            separate=self.parameterAsBoolean(parameters, self.SEPARATE, context),
+            cache=profile_cache(),
+            fingerprint=self.fingerprint,
+        )
+        try:
+            report.generate(feedback)
+        except GenerationCanceled:
+            return {}
+        feedback.pushInfo(summary(report.stats))
+        if report.stats.get("unmatched"):
+            feedback.pushWarning(
+                self.tr("Not found in the red list: {}").format(
+                    ", ".join(report.stats["unmatched"])
+                )
+            )
+        return {self.OUTPUT: outpath}
+
+
+class RedListFaunaProvider(QgsProcessingProvider):
+    """Processing provider of the Red List Fauna Table plugin."""
+
+    def loadAlgorithms(self):
+        self.addAlgorithm(RedListFaunaAlgorithm())
+
+    def id(self):
+        return "redlistfauna"
+
+    def name(self):
+        return "Red List Fauna Table"
+
+    def icon(self):
+        return QIcon(os.path.join(os.path.dirname(__file__), "icon.png"))
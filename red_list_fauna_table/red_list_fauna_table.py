@@ -22,10 +22,17 @@
  ***************************************************************************/
 """
 from PyQt5.QtWidgets import QFileDialog
-from qgis.PyQt.QtCore import QSettings, QTranslator, QCoreApplication
+from qgis.PyQt.QtCore import QSettings, QTranslator, QCoreApplication, Qt
 from qgis.PyQt.QtGui import QIcon
-from qgis.PyQt.QtWidgets import QAction
-from qgis._core import Qgis, QgsFieldProxyModel, QgsMapLayerProxyModel
+from qgis.PyQt.QtWidgets import QAction, QListWidgetItem
+from qgis._core import (
+    Qgis,
+    QgsApplication,
+    QgsFieldProxyModel,
+    QgsMapLayerProxyModel,
+    QgsProject,
+    QgsVectorLayer,
+)
 
 # Initialize Qt resources from file resources.py
 from .resources import *  # noqa: F403
@@ -33,7 +40,14 @@ from .resources import *  # noqa: F403
 # Import the code for the dialog
 from .red_list_fauna_table_dialog import RedListFaunaTableDialog
 import os.path
-from .tablemaker import redListFauna
+from .red_list_fauna_batch_dialog import RedListFaunaBatchDialog
+from .red_list_fauna_task import RedListFaunaBatchTask, RedListFaunaTask, batch_jobs
+from .layer_source import study_area
+from .lut import GROUP_COLUMN, SORT_KEYS, warm_up
+from .tablemaker import SPLITS
+from .template import load_template
+from .writers import FILE_FILTERS, FORMATS
+from .processing_provider import RedListFaunaProvider
 
 
 class RedListFaunaTable:
@@ -70,6 +84,10 @@ class RedListFaunaTable:
         # Must be set in initGui() to survive plugin reloads
         self.first_start = None
 
+        # Keep a reference to the running task, otherwise it gets garbage collected
+        self.task = None
+        self.provider = None
+
     # noinspection PyMethodMayBeStatic
     def tr(self, message):
         """Get the translation for a string using Qt translation API.
@@ -158,8 +176,14 @@ class RedListFaunaTable:
 
         return action
 
+    def initProcessing(self):
+        """Register the processing provider of the plugin."""
+        self.provider = RedListFaunaProvider()
+        QgsApplication.processingRegistry().addProvider(self.provider)
+
     def initGui(self):
         """Create the menu entries and toolbar icons inside the QGIS GUI."""
+        self.initProcessing()
 
         icon_path = ":/plugins/red_list_fauna_table/icon.png"
         self.add_action(
@@ -168,19 +192,33 @@ class RedListFaunaTable:
             callback=self.run,
             parent=self.iface.mainWindow(),
         )
+        self.add_action(
+            icon_path,
+            text=self.tr("Rote Liste Fauna Tabellen (Stapel)"),
+            callback=self.run_batch,
+            add_to_toolbar=False,
+            parent=self.iface.mainWindow(),
+        )
 
         # will be set False in run()
         self.first_start = True
+        self.batch_dlg = None
+
+        # Parse the look-up tables and build the default template now
+        # instead of on the first run
+        warm_up()
+        load_template()
 
     def unload(self):
         """Removes the plugin menu item and icon from QGIS GUI."""
         for action in self.actions:
             self.iface.removePluginMenu(self.tr("&Red List Fauna Table"), action)
             self.iface.removeToolBarIcon(action)
+        QgsApplication.processingRegistry().removeProvider(self.provider)
 
     def select_output_file(self):
         filename, _filter = QFileDialog.getSaveFileName(
-            self.dlg, "Select   output file ", "", "*.docx"
+            self.dlg, "Select   output file ", "", ";;".join(FILE_FILTERS)
         )
         self.dlg.lineEdit.setText(filename)
 
@@ -189,6 +227,26 @@ class RedListFaunaTable:
         if selectedLayer:
             self.dlg.mFieldComboBox.setLayer(selectedLayer)
             self.dlg.mFieldComboBox.setFilters(QgsFieldProxyModel.AllTypes)
+            # Offer the string fields for further species columns
+            checked = self.dlg.mComboBox_fields.checkedItems()
+            self.dlg.mComboBox_fields.clear()
+            self.dlg.mComboBox_fields.addItems(
+                [f.name() for f in selectedLayer.fields() if f.typeName() == "String"]
+            )
+            self.dlg.mComboBox_fields.setCheckedItems(checked)
+            # Optional fields of the occurrence columns
+            for combo in (self.dlg.mFieldComboBox_date, self.dlg.mFieldComboBox_site):
+                combo.setAllowEmptyFieldName(True)
+                combo.setLayer(selectedLayer)
+
+    def further_layers(self):
+        """Return the layers checked as further layers in the dialog."""
+        layers = []
+        for i in range(self.dlg.listWidget_layers.count()):
+            item = self.dlg.listWidget_layers.item(i)
+            if item.checkState() == Qt.Checked:
+                layers.append(QgsProject.instance().mapLayer(item.data(Qt.UserRole)))
+        return [layer for layer in layers if layer is not None]
 
     def run(self):
         """Run method that performs all the real work"""
@@ -199,11 +257,35 @@ class RedListFaunaTable:
             self.first_start = False
             self.dlg = RedListFaunaTableDialog()
             self.select_field()
-            self.dlg.mMapLayerComboBox.setFilters(QgsMapLayerProxyModel.PointLayer)
+            self.dlg.mMapLayerComboBox.setFilters(QgsMapLayerProxyModel.VectorLayer)
             self.dlg.mMapLayerComboBox.layerChanged.connect(self.select_field)
+            self.dlg.mMapLayerComboBox_area.setFilters(
+                QgsMapLayerProxyModel.PolygonLayer
+            )
+            self.dlg.mMapLayerComboBox_area.setAllowEmptyLayer(True)
+            self.dlg.mMapLayerComboBox_area.setLayer(None)
+            self.dlg.mComboBox_formats.addItems(FORMATS)
+            self.dlg.comboBox_split.addItem(self.tr("One table"), None)
+            for split in SPLITS:
+                self.dlg.comboBox_split.addItem(split, split)
+            self.dlg.comboBox_sort.addItems(list(SORT_KEYS))
 
         self.dlg.pushButton.clicked.connect(self.select_output_file)
 
+        # Offer all vector layers of the project as further layers, keeping
+        # the ones checked before
+        checked = {layer.id() for layer in self.further_layers()}
+        self.dlg.listWidget_layers.clear()
+        for layer in QgsProject.instance().mapLayers().values():
+            if isinstance(layer, QgsVectorLayer):
+                item = QListWidgetItem(layer.name())
+                item.setData(Qt.UserRole, layer.id())
+                item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                item.setCheckState(
+                    Qt.Checked if layer.id() in checked else Qt.Unchecked
+                )
+                self.dlg.listWidget_layers.addItem(item)
+
         # show the dialog
         self.dlg.show()
         # Run the dialog event loop
@@ -215,19 +297,77 @@ class RedListFaunaTable:
             outpath = self.dlg.lineEdit.text()
             layer = self.dlg.mMapLayerComboBox.currentLayer()
             field = self.dlg.mFieldComboBox.currentField()
-            for i in layer.fields():
-                if i.name() == field and i.typeName() == "String":
-                    string = True
-                else:
-                    string = False
-            if string:
-                redListFauna(layer, field, outpath, self.dlg)
+            index = layer.fields().indexOf(field)
+            string = index >= 0 and layer.fields()[index].typeName() == "String"
+            fields = [field] + [
+                name
+                for name in self.dlg.mComboBox_fields.checkedItems()
+                if name != field
+            ]
+            layers = [layer] + [
+                other for other in self.further_layers() if other.id() != layer.id()
+            ]
+            unusable = [
+                other.name()
+                for other in layers
+                if not any(other.fields().indexOf(name) >= 0 for name in fields)
+            ]
+            area_layer = self.dlg.mMapLayerComboBox_area.currentLayer()
+            area = None
+            if area_layer is not None:
+                area = study_area(
+                    area_layer,
+                    (
+                        area_layer.selectedFeatureIds()
+                        if self.dlg.checkBox_area_selected.isChecked()
+                        else None
+                    ),
+                )
+            if string and unusable:
                 self.iface.messageBar().pushMessage(
-                    "Success",
-                    "Output file written at " + outpath,
-                    level=Qgis.Success,
+                    "Warning",
+                    "Layers without any of the species fields: {}".format(
+                        ", ".join(unusable)
+                    ),
+                    level=Qgis.Warning,
+                    duration=3,
+                )
+            elif string and area_layer is not None and area is None:
+                self.iface.messageBar().pushMessage(
+                    "Warning",
+                    "The study area layer has no polygons to filter by.",
+                    level=Qgis.Warning,
                     duration=3,
                 )
+            elif string:
+                self.task = RedListFaunaTask(
+                    self.iface,
+                    layers,
+                    fields,
+                    outpath,
+                    selected_only=self.dlg.checkBox_selection.isChecked(),
+                    area=area,
+                    area_crs=area_layer.crs() if area_layer is not None else None,
+                    template_path=self.dlg.mQgsFileWidget_template.filePath() or None,
+                    incremental=self.dlg.checkBox_incremental.isChecked(),
+                    scientific=self.dlg.checkBox_scientific.isChecked(),
+                    fuzzy=self.dlg.checkBox_fuzzy.isChecked(),
+                    occurrences=self.dlg.checkBox_occurrences.isChecked(),
+                    date_field=self.dlg.mFieldComboBox_date.currentField() or None,
+                    site_field=self.dlg.mFieldComboBox_site.currentField() or None,
+                    formats=self.dlg.mComboBox_formats.checkedItems(),
+                    streaming=self.dlg.checkBox_streaming.isChecked(),
+                    split=self.dlg.comboBox_split.currentData(),
+                    chunk_rows=self.dlg.spinBox_chunk_rows.value(),
+                    separate=self.dlg.checkBox_separate.isChecked(),
+                    sort_by=self.dlg.comboBox_sort.currentText(),
+                    group_by=(
+                        GROUP_COLUMN if self.dlg.checkBox_group.isChecked() else None
+                    ),
+                    write_stats=self.dlg.checkBox_stats.isChecked(),
+                    profile=self.dlg.checkBox_profile.isChecked(),
+                )
+                QgsApplication.taskManager().addTask(self.task)
             else:
                 self.iface.messageBar().pushMessage(
                     "Warning",
@@ -235,3 +375,84 @@ class RedListFaunaTable:
                     level=Qgis.Warning,
                     duration=3,
                 )
+
+    def batch_layers(self):
+        """Return the fauna layers checked in the batch dialog."""
+        layers = []
+        for i in range(self.batch_dlg.listWidget_layers.count()):
+            item = self.batch_dlg.listWidget_layers.item(i)
+            if item.checkState() == Qt.Checked:
+                layers.append(QgsProject.instance().mapLayer(item.data(Qt.UserRole)))
+        return [layer for layer in layers if layer is not None]
+
+    def update_batch_fields(self):
+        """Offer the string fields present in all checked batch layers."""
+        names = None
+        for layer in self.batch_layers():
+            fields = {f.name() for f in layer.fields() if f.typeName() == "String"}
+            names = fields if names is None else names & fields
+        current = self.batch_dlg.comboBox_field.currentText()
+        self.batch_dlg.comboBox_field.clear()
+        self.batch_dlg.comboBox_field.addItems(sorted(names or []))
+        self.batch_dlg.comboBox_field.setCurrentText(current)
+
+    def select_area_field(self):
+        area_layer = self.batch_dlg.mMapLayerComboBox_area.currentLayer()
+        self.batch_dlg.mFieldComboBox_area.setLayer(area_layer)
+
+    def run_batch(self):
+        """Create one document per layer or study area in the background."""
+        if self.batch_dlg is None:
+            self.batch_dlg = RedListFaunaBatchDialog()
+            self.batch_dlg.mMapLayerComboBox_area.setFilters(
+                QgsMapLayerProxyModel.PolygonLayer
+            )
+            self.batch_dlg.mMapLayerComboBox_area.setAllowEmptyLayer(True)
+            self.batch_dlg.mMapLayerComboBox_area.setLayer(None)
+            self.batch_dlg.mMapLayerComboBox_area.layerChanged.connect(
+                self.select_area_field
+            )
+            self.batch_dlg.listWidget_layers.itemChanged.connect(
+                self.update_batch_fields
+            )
+
+        # Offer all point, line and polygon layers of the project, checking
+        # the ones selected in the layer panel
+        selected = {layer.id() for layer in self.iface.layerTreeView().selectedLayers()}
+        self.batch_dlg.listWidget_layers.clear()
+        for layer in QgsProject.instance().mapLayers().values():
+            if isinstance(layer, QgsVectorLayer) and layer.isSpatial():
+                item = QListWidgetItem(layer.name())
+                item.setData(Qt.UserRole, layer.id())
+                item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+                item.setCheckState(
+                    Qt.Checked if layer.id() in selected else Qt.Unchecked
+                )
+                self.batch_dlg.listWidget_layers.addItem(item)
+        self.update_batch_fields()
+
+        self.batch_dlg.show()
+        if not self.batch_dlg.exec_():
+            return
+
+        layers = self.batch_layers()
+        field = self.batch_dlg.comboBox_field.currentText()
+        outdir = self.batch_dlg.mQgsFileWidget_outdir.filePath()
+        if not layers or not field or not outdir:
+            self.iface.messageBar().pushMessage(
+                "Warning",
+                "Please choose layers, a string field and an output folder.",
+                level=Qgis.Warning,
+                duration=3,
+            )
+            return
+        area_layer = self.batch_dlg.mMapLayerComboBox_area.currentLayer()
+        area_field = self.batch_dlg.mFieldComboBox_area.currentField()
+        jobs = batch_jobs(layers, outdir, area_layer, area_field or None)
+        self.task = RedListFaunaBatchTask(
+            self.iface,
+            jobs,
+            field,
+            incremental=self.batch_dlg.checkBox_incremental.isChecked(),
+        )
+        QgsApplication.taskManager().addTask(self.task)
@@ -0,0 +1,449 @@
+# -*- coding: utf-8 -*-
+"""
+/***************************************************************************
+ RedListFaunaTask
+                                 A QGIS plugin
+ Erstellt docx Tabellen über Fauna.
+                              -------------------
+        begin                : 2023-12-15
+        copyright            : (C) 2023 by Till Frankenbach
+        email                : till.frankenbach@gmail.com
+ ***************************************************************************/
+
+/***************************************************************************
+ *                                                                         *
+ *   This program is free software; you can redistribute it and/or modify  *
+ *   it under the terms of the GNU General Public License as published by  *
+ *   the Free Software Foundation; either version 2 of the License, or     *
+ *   (at your option) any later version.                                   *
+ *                                                                         *
+ ***************************************************************************/
+"""
+
+import os
+import re
+
+from qgis.core import (
+    Qgis,
+    QgsCoordinateTransform,
+    QgsFeedback,
+    QgsGeometry,
+    QgsMessageLog,
+    QgsProject,
+    QgsTask,
+    QgsVectorLayer,
+    QgsVectorLayerFeatureSource,
+)
+
+from .instrumentation import summary
+from .layer_source import fingerprint, profile_cache
+from .render_pool import unique_name
+from .tablemaker import GenerationCanceled, LayerInput, redListFauna
+
+
+class RedListFaunaTask(QgsTask):
+    """Background task generating a red list document for one or more layers."""
+
+    def __init__(
+        self,
+        iface,
+        layer,
+        field,
+        outpath,
+        selected_only=False,
+        area=None,
+        area_crs=None,
+        template_path=None,
+        incremental=False,
+        scientific=True,
+        fuzzy=True,
+        occurrences=False,
+        date_field=None,
+        site_field=None,
+        formats=None,
+        streaming=False,
+        split=None,
+        chunk_rows=500,
+        separate=False,
+        sort_by="name",
+        group_by=None,
+        write_stats=False,
+        profile=False,
+    ):
+        """Constructor, must be called from the main thread.
+
+        Everything needed from the layers is captured here, so the task never
+        touches the layers themselves while running in the background.
+
+        :param iface: QGIS interface used to report the result, None to only
+            log failures (used for batch sub tasks).
+        :type iface: QgsInterface
+
+        :param layer: Vector layer(s) containing the fauna observations, of
+            any geometry type. The species of all layers end up in one table.
+        :type layer: QgsVectorLayer or list of QgsVectorLayer
+
+        :param field: Name(s) of the field(s) holding the species names. Each
+            layer is read with those of the fields it has.
+        :type field: str or list of str
+
+        :param outpath: Path of the .docx file to be written.
+        :type outpath: str
+
+        :param selected_only: Only use the currently selected features.
+        :type selected_only: bool
+
+        :param area: Only use features intersecting this study area, given
+            in the CRS of the layer(s) unless area_crs is set.
+        :type area: QgsGeometry
+
+        :param area_crs: CRS of the study area, it is transformed to the CRS
+            of each layer. None if it is given in the layer CRS.
+        :type area_crs: QgsCoordinateReferenceSystem
+
+        :param template_path: .docx template to be used instead of the
+            default one, None for the default template.
+        :type template_path: str
+
+        :param incremental: Only update the rows of changed species if the
+            document already exists.
+        :type incremental: bool
+
+        :param scientific: Also match scientific species names.
+        :type scientific: bool
+
+        :param fuzzy: Tolerate typos in species names.
+        :type fuzzy: bool
+
+        :param occurrences: Add the number of records per species.
+        :type occurrences: bool
+
+        :param date_field: With occurrences, add the first and last date of
+            this field, None to leave the dates out.
+        :type date_field: str
+
+        :param site_field: With occurrences, add the number of distinct
+            values of this field, None to leave the sites out.
+        :type site_field: str
+
+        :param formats: Further output formats (xlsx, csv, html, odt) written
+            next to outpath, the format of outpath follows its extension.
+        :type formats: list of str
+
+        :param streaming: Stream the table rows into the document instead
+            of building it in memory.
+        :type streaming: bool
+
+        :param split: Split the table into parts: "rows", "group" or
+            "category", None for a single table.
+        :type split: str
+
+        :param chunk_rows: Number of rows per part when splitting by rows.
+        :type chunk_rows: int
+
+        :param separate: Write each part to a document of its own.
+        :type separate: bool
+
+        :param sort_by: Order of the rows: "name", "german" or "category".
+        :type sort_by: str
+
+        :param group_by: Red list column to group the rows by, None for
+            no group header rows.
+        :type group_by: str
+
+        :param write_stats: Write the run statistics next to the document.
+        :type write_stats: bool
+
+        :param profile: Write a cProfile capture of the run next to the document.
+        :type profile: bool
+        """
+        layers = list(layer) if isinstance(layer, (list, tuple)) else [layer]
+        fields = [field] if isinstance(field, str) else list(field)
+        title = layers[0].name()
+        if len(layers) > 1:
+            title += " (+{})".format(len(layers) - 1)
+        super().__init__(
+            "Rote Liste Fauna Tabelle: {}".format(title), QgsTask.CanCancel
+        )
+        self.iface = iface
+        self.outpath = outpath
+        self.template_path = template_path
+        self.incremental = incremental
+        self.scientific = scientific
+        self.fuzzy = fuzzy
+        self.occurrences = occurrences
+        self.date_field = date_field
+        self.site_field = site_field
+        self.formats = formats
+        self.streaming = streaming
+        self.split = split
+        self.chunk_rows = chunk_rows
+        self.separate = separate
+        self.sort_by = sort_by
+        self.group_by = group_by
+        self.write_stats = write_stats
+        self.profile = profile
+        self.stats = None
+        # One (input, uri) tuple per layer
+        self.inputs = []
+        fingerprints = []
+        for lyr in layers:
+            present = [name for name in fields if lyr.fields().indexOf(name) >= 0]
+            layer_area = area
+            if area is not None and area_crs is not None and area_crs != lyr.crs():
+                layer_area = QgsGeometry(area)
+                layer_area.transform(
+                    QgsCoordinateTransform(area_crs, lyr.crs(), QgsProject.instance())
+                )
+            # Without a selection the provider can return the distinct names
+            # itself, as long as there are no unsaved edits it would not see.
+            # A private layer is opened for that in the worker thread.
+            uri = None
+            if selected_only:
+                selected_ids = lyr.selectedFeatureIds()
+                feature_count = len(selected_ids)
+            else:
+                selected_ids = None
+                feature_count = lyr.featureCount() if area is None else None
+                if (
+                    area is None
+                    and lyr.providerType() != "memory"
+                    and not lyr.isModified()
+                ):
+                    uri = (lyr.source(), lyr.providerType())
+            source = QgsVectorLayerFeatureSource(lyr)
+            self.inputs.append(
+                (
+                    LayerInput(
+                        lyr.name(),
+                        source,
+                        present,
+                        selected_ids,
+                        feature_count,
+                        layer_area,
+                    ),
+                    uri,
+                )
+            )
+            fingerprints.append(fingerprint(lyr, present, selected_ids, layer_area))
+        # Documents of unchanged layers are restored from the result cache
+        self.fingerprint = None if None in fingerprints else fingerprints
+        self.feedback = QgsFeedback()
+        self.feedback.progressChanged.connect(self.setProgress)
+        self.exception = None
+
+    def run(self):
+        """Generate the document, runs in a worker thread."""
+        inputs = []
+        for layer_input, uri in self.inputs:
+            if uri is not None:
+                worker_layer = QgsVectorLayer(uri[0], "fauna", uri[1])
+                if worker_layer.isValid():
+                    layer_input = layer_input._replace(source=worker_layer)
+            inputs.append(layer_input)
+        try:
+            report = redListFauna(
+                None,
+                None,
+                self.outpath,
+                inputs=inputs,
+                template_path=self.template_path,
+                incremental=self.incremental,
+                scientific=self.scientific,
+                fuzzy=self.fuzzy,
+                occurrences=self.occurrences,
+                date_field=self.date_field,
+                site_field=self.site_field,
+                formats=self.formats,
+                streaming=self.streaming,
+                split=self.split,
+                chunk_rows=self.chunk_rows,
+                separate=self.separate,
+                sort_by=self.sort_by,
+                group_by=self.group_by,
+                cache=profile_cache(),
+                fingerprint=self.fingerprint,
+            )
+            self.stats = report.stats
+            report.generate(
+                self.feedback, write_stats=self.write_stats, profile=self.profile
+            )
+        except GenerationCanceled:
+            return False
+        except Exception as e:
+            self.exception = e
+            return False
+        return True
+
+    def cancel(self):
+        """Cancel the task and the running generation."""
+        self.feedback.cancel()
+        super().cancel()
+
+    def finished(self, result):
+        """Report the outcome, called from the main thread."""
+        if result and self.stats is not None:
+            QgsMessageLog.logMessage(
+                "{}\n{}".format(self.outpath, summary(self.stats)),
+                "Red List Fauna Table",
+                Qgis.Info,
+            )
+            if self.stats.get("unmatched"):
+                QgsMessageLog.logMessage(
+                    "{}: not found in the red list: {}".format(
+                        self.outpath, ", ".join(self.stats["unmatched"])
+                    ),
+                    "Red List Fauna Table",
+                    Qgis.Warning,
+                )
+        if self.iface is None:
+            if self.exception is not None:
+                QgsMessageLog.logMessage(
+                    "{}: {!r}".format(self.outpath, self.exception),
+                    "Red List Fauna Table",
+                    Qgis.Critical,
+                )
+            return
+        if result:
+            if self.stats.get("unchanged"):
+                message = "Output file at {} is up to date".format(self.outpath)
+            elif self.stats.get("cached"):
+                message = "Output file restored from cache at " + self.outpath
+            else:
+                message = "Output file written at " + self.outpath
+            self.iface.messageBar().pushMessage(
+                "Success",
+                message,
+                level=Qgis.Success,
+                duration=3,
+            )
+        elif self.exception is not None:
+            QgsMessageLog.logMessage(
+                repr(self.exception), "Red List Fauna Table", Qgis.Critical
+            )
+            self.iface.messageBar().pushMessage(
+                "Error",
+                "Creating the table failed: {}".format(self.exception),
+                level=Qgis.Critical,
+            )
+        else:
+            self.iface.messageBar().pushMessage(
+                "Warning",
+                "Creating the table was canceled.",
+                level=Qgis.Warning,
+                duration=3,
+            )
+
+
+class RedListFaunaBatchTask(QgsTask):
+    """Background task generating one document per layer or study area.
+
+    Every document is generated by its own RedListFaunaTask sub task, so the
+    task manager runs them in parallel. All of them share the process wide
+    look-up table and color caches.
+    """
+
+    def __init__(self, iface, jobs, field, incremental=False):
+        """Constructor, must be called from the main thread.
+
+        :param iface: QGIS interface used to report the result.
+        :type iface: QgsInterface
+
+        :param jobs: One (layer, outpath, area) tuple per document, area may
+            be None to use the whole layer.
+        :type jobs: list
+
+        :param field: Name of the field holding the species names.
+        :type field: str
+
+        :param incremental: Only update the rows of changed species in
+            documents that already exist.
+        :type incremental: bool
+        """
+        super().__init__(
+            "Rote Liste Fauna Tabellen: {} Dokumente".format(len(jobs)),
+            QgsTask.CanCancel,
+        )
+        self.iface = iface
+        self.sub_tasks = []
+        for layer, outpath, area in jobs:
+            task = RedListFaunaTask(
+                None, layer, field, outpath, area=area, incremental=incremental
+            )
+            self.sub_tasks.append(task)
+            self.addSubTask(task, [], QgsTask.ParentDependsOnSubTask)
+
+    def run(self):
+        """Nothing left to do once all sub tasks are done."""
+        return True
+
+    def finished(self, result):
+        """Report how many documents were written, called from the main thread."""
+        written = sum(task.status() == QgsTask.Complete for task in self.sub_tasks)
+        self.iface.messageBar().pushMessage(
+            "Success" if result else "Warning",
+            "{} of {} documents written".format(written, len(self.sub_tasks)),
+            level=Qgis.Success if result else Qgis.Warning,
+            duration=3,
+        )
+
+
+def batch_jobs(layers, outdir, area_layer=None, area_field=None):
+    """Build the jobs of a batch run, must be called from the main thread.
+
+    :param layers: Vector layers containing fauna observations.
+    :type layers: list of QgsVectorLayer
+
+    :param outdir: Directory the documents are written to.
+    :type outdir: str
+
+    :param area_layer: Polygon layer of study areas, each area of each layer
+        gets its own document. None to write one document per layer.
+    :type area_layer: QgsVectorLayer
+
+    :param area_field: Field naming the study areas, feature ids are used if
+        not given.
+    :type area_field: str
+
+    :returns: (layer, outpath, area) tuples for RedListFaunaBatchTask.
+    :rtype: list
+    """
+    jobs = []
+    taken = set()  # Document names, layers and areas may share a name
+    for layer in layers:
+        if area_layer is None:
+            jobs.append((layer, output_path(outdir, layer.name(), taken), None))
+            continue
+        transform = QgsCoordinateTransform(
+            area_layer.crs(), layer.crs(), QgsProject.instance()
+        )
+        for feature in area_layer.getFeatures():
+            if not feature.hasGeometry():
+                continue
+            area = QgsGeometry(feature.geometry())
+            area.transform(transform)
+            name = feature[area_field] if area_field else feature.id()
+            outpath = output_path(outdir, "{}_{}".format(layer.name(), name), taken)
+            jobs.append((layer, outpath, area))
+    return jobs
+
+
+def output_path(outdir, name, taken=None):
+    """Return a .docx path in outdir for name, replacing unsafe characters.
+
+    :param outdir: Directory the document is written to.
+    :type outdir: str
+
+    :param name: Name of the document without extension.
+    :type name: str
+
+    :param taken: Casefolded names of the documents of the same batch, a
+        counter is added to a name already taken. Receives the new name.
+    :type taken: set
+
+    :rtype: str
+    """
+    name = re.sub(r'[\\/:*?"<>|]+', "_", str(name)).strip() or "unnamed"
+    if taken is not None:
+        name = unique_name(name, taken)
+    return os.path.join(outdir, name + ".docx")
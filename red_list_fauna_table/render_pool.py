@@ -0,0 +1,119 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .lut import FAUNA_CSV, GROUP_COLUMN, load_groups, load_lut
+from .tablemaker import GenerationCanceled, redListFauna
+from .template import load_template
+
+# One document rendered by the pool: the output path, the species names and
+# optionally the occurrence records (an OccurrenceExtract) and the fingerprint
+# of the input for the result cache. Plain picklable data only, layers and
+# other QGIS objects stay in the main process.
+RenderJob = namedtuple(
+    "RenderJob", ["outpath", "names", "extract", "fingerprint"], defaults=[None, None]
+)
+
+# Options of redListFauna shared by all documents of a worker, see init_worker
+_options = {}
+
+
+def init_worker(options):
+    """
+    Prepare a worker process, called once when the pool starts it.
+
+    The red list, the template and, if the table is grouped, the taxonomic
+    groups are loaded into the process-wide cache here, so every document
+    rendered by the worker reuses them.
+
+    Parameters:
+    - options: dict, keyword arguments of redListFauna such as lut_path,
+      template_path, formats or cache.
+    """
+    _options.clear()
+    _options.update(options)
+    lut_path = options.get("lut_path") or FAUNA_CSV
+    load_lut(lut_path)
+    load_template(options.get("template_path"))
+    if options.get("group_by") is not None or options.get("split") == "group":
+        load_groups(lut_path, options.get("group_by") or GROUP_COLUMN)
+
+
+def unique_name(name, taken):
+    """
+    Return a document name not taken yet, adding a counter on collision.
+
+    Names are compared case-insensitively, as on Windows and macOS file
+    systems.
+
+    Parameters:
+    - name: str, the wanted name without extension.
+    - taken: set of str, the casefolded names taken so far, receives the result.
+    """
+    unique = name
+    counter = 1
+    while unique.casefold() in taken:
+        counter += 1
+        unique = "{}_{}".format(name, counter)
+    taken.add(unique.casefold())
+    return unique
+
+
+def render(job):
+    """
+    Render and save one document in a worker process.
+
+    Parameters:
+    - job: RenderJob, the document to be rendered.
+
+    Returns the run statistics of the document.
+    """
+    report = redListFauna(
+        None,
+        None,
+        job.outpath,
+        names=job.names,
+        extract=job.extract,
+        fingerprint=job.fingerprint,
+        **_options
+    )
+    report.generate()
+    return dict(report.stats, outputs=report.output_paths())
+
+
+def render_documents(jobs, workers=None, feedback=None, **options):
+    """
+    Render documents in parallel, one worker process per core.
+
+    Building a document is pure Python and holds the GIL, so batches only
+    scale across processes. The jobs are sent to the workers as plain data,
+    each worker loads the red list and the template once, see init_worker.
+
+    Parameters:
+    - jobs: list of RenderJob, the documents to be rendered.
+    - workers: int, number of worker processes, the number of cores if None.
+    - feedback: object with setProgress() and isCanceled(), see redListFauna.build (optional).
+    - options: keyword arguments of redListFauna applied to every document.
+
+    Returns one entry per job, in the order of jobs: the run statistics of
+    the document, or the exception that failed it.
+
+    Raises GenerationCanceled if the feedback was canceled, documents not
+    started yet are not rendered.
+    """
+    results = {}
+    with ProcessPoolExecutor(
+        workers, initializer=init_worker, initargs=(options,)
+    ) as executor:
+        futures = {executor.submit(render, job): i for i, job in enumerate(jobs)}
+        for done, future in enumerate(as_completed(futures)):
+            try:
+                results[futures[future]] = future.result()
+            except Exception as e:
+                results[futures[future]] = e
+            if feedback is None:
+                continue
+            if feedback.isCanceled():
+                executor.shutdown(cancel_futures=True)
+                raise GenerationCanceled()
+            feedback.setProgress((done + 1) / len(futures) * 100)
+    return [results[i] for i in range(len(jobs))]
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+# Default size limit of the store
+DEFAULT_MAX_BYTES = 100 * 2**20
+
+
+class ResultCache:
+    """
+    Size-bounded on-disk store of generated documents.
+
+    Entries are files named by their key. Restoring an entry marks it as
+    recently used, the least recently used entries are evicted first.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Constructor for the ResultCache class.
+
+        Parameters:
+        - directory: str, the folder holding the entries, created on first store.
+        - max_bytes: int, the total size the entries are evicted down to.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(*parts):
+        """
+        Return the key of a result.
+
+        Parameters:
+        - parts: JSON serializable values the result depends on.
+        """
+        data = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+    def entry(self, key):
+        """
+        Return the path of the entry of a key.
+
+        Parameters:
+        - key: str, see key.
+        """
+        return os.path.join(self.directory, key + ".docx")
+
+    def restore(self, key, outpath):
+        """
+        Copy a cached document to outpath.
+
+        Parameters:
+        - key: str, see key.
+        - outpath: str, the document to be written.
+
+        Returns True if the document was cached, False if nothing was written.
+        """
+        path = self.entry(key)
+        try:
+            shutil.copyfile(path, outpath)
+            os.utime(path)  # Mark as recently used
+        except FileNotFoundError:
+            return False
+        return True
+
+    def store(self, key, path):
+        """
+        Add a document to the store and evict the least recently used entries.
+
+        Parameters:
+        - key: str, see key.
+        - path: str, the generated document.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        entry = self.entry(key)
+        # Write under a private name first, readers never see partial files
+        tmp = "{}.{}-{}.tmp".format(entry, os.getpid(), threading.get_ident())
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, entry)
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the store fits max_bytes.
+        """
+        entries = []
+        with os.scandir(self.directory) as it:
+            for e in it:
+                if e.name.endswith(".docx"):
+                    try:
+                        stat = e.stat()
+                    except OSError:
+                        continue  # Removed meanwhile
+                    entries.append((stat.st_mtime_ns, stat.st_size, e.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue  # Removed meanwhile or still open on Windows
+            total -= size
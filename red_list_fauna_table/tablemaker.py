@@ -1,321 +1,964 @@
+import cProfile
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
 import pandas as pd
 import docx
-import qgis
-from PyQt5.QtWidgets import QProgressBar
-from docx.oxml import parse_xml
-from docx.oxml.ns import nsdecls
-from docx.enum.table import WD_TABLE_ALIGNMENT
 from docx.shared import Pt, Cm
 import os
+import re
+
+from .instrumentation import measure, write_json
+from .lut import (
+    GROUP_COLUMN,
+    LEGEND_CSV,
+    REPORT_COLUMNS,
+    SORT_KEYS,
+    category_rank,
+    load_groups,
+    load_lut,
+)
+from .manifest import file_hash, read_manifest, remove_manifest, write_manifest
+from .matching import EXACT, FUZZY, NORMALIZED, SCIENTIFIC, collation_key
+from .occurrences import OccurrenceExtract, occurrence_frame, summarize
+from .ooxml import GroupRow, add_tables, insert_rows, remove_rows, row_texts
+from .template import COLORS, open_template, placeholder, write_document
+from .writers import FORMATS, write_table
+
+# One layer the species names are read from: a display name, the layer or
+# feature source, the list of species fields, and optionally the selected
+# feature ids, the number of features (for progress) and a study area in the
+# layer CRS
+LayerInput = namedtuple(
+    "LayerInput",
+    ["name", "source", "fields", "selected_ids", "feature_count", "area"],
+    defaults=[None, None, None],
+)
+
+
+# Ways to split the species table: into parts of a number of rows, per
+# taxonomic group of the red list, or per red list category
+SPLITS = ("rows", "group", "category")
+
+# Group of the species without a taxonomic group, it comes last
+OTHER_GROUP = "Sonstige"
+
+# Heading of a part of the table split per red list category
+CATEGORY_TITLE = "RL Kat. {}"
+
+# File name parts of categories that are no word characters, "-" marks
+# species missing from the red list
+CATEGORY_SLUGS = {"*": "ungefaehrdet", "♦": "nicht_bewertet", "-": "nicht_gelistet"}
+
+
+def group_order(titles):
+    """
+    Return the distinct group titles in table order, OTHER_GROUP last.
+
+    Parameters:
+    - titles: iterable of str, the group titles.
+    """
+    return sorted(
+        set(titles), key=lambda title: (title == OTHER_GROUP, collation_key(title))
+    )
+
+
+class GenerationCanceled(Exception):
+    """
+    Raised when the feedback object requests cancellation of a running generation.
+    """
+
+
+def create_document(names, feedback=None, lut_path=None, template_path=None):
+    """
+    Build the red list document for the given species names, without QGIS.
+
+    Parameters:
+    - names: iterable of str, German species names.
+    - feedback: object with setProgress() and isCanceled(), see redListFauna.build (optional).
+    - lut_path: str, red list to be used instead of the fauna.csv of the plugin.
+    - template_path: str, .docx template to be used instead of the default one.
+
+    Returns the docx.Document, the caller decides where to save it.
+    """
+    report = redListFauna(
+        None, None, None, names=names, lut_path=lut_path, template_path=template_path
+    )
+    report.build(feedback)
+    return report.doc
 
 
 class redListFauna:
-    def __init__(self, fauna_layer, field, outpath, dlg):
+    def __init__(
+        self,
+        fauna_layer,
+        field,
+        outpath,
+        selected_ids=None,
+        feature_count=None,
+        area=None,
+        names=None,
+        inputs=None,
+        lut_path=None,
+        template_path=None,
+        incremental=False,
+        scientific=True,
+        fuzzy=True,
+        cache=None,
+        fingerprint=None,
+        occurrences=False,
+        date_field=None,
+        site_field=None,
+        extract=None,
+        formats=None,
+        streaming=False,
+        split=None,
+        chunk_rows=500,
+        separate=False,
+        sort_by="name",
+        group_by=None,
+    ):
         """
         Constructor for the redListFauna class.
 
         Parameters:
-        - fauna_layer: QgsVectorLayer, the vector layer containing fauna data.
+        - fauna_layer: QgsVectorLayer or QgsVectorLayerFeatureSource, the source containing fauna data.
         - field: str, the field name to be used in the table.
         - outpath: str, the output path for the generated Word document.
+        - selected_ids: list of int, restrict the table to these feature ids (None uses all features).
+        - feature_count: int, number of features to be read, only used for progress reporting.
+        - area: QgsGeometry, only use features intersecting this study area (in the layer CRS).
+        - names: iterable of str, species names to be used instead of reading fauna_layer.
+        - inputs: list of LayerInput, layers to be read instead of fauna_layer. The
+          species of all layers and fields end up in one table.
+        - lut_path: str, red list to be used instead of the fauna.csv of the plugin.
+        - template_path: str, .docx template to be used instead of the default one. The
+          species table replaces its {{Tabelle}} paragraph or is appended to its end.
+        - incremental: bool, update the rows of the existing document at outpath instead of
+          rebuilding it, see update_table. A manifest is written next to the document.
+        - scientific: bool, also match the names against the scientific names of the red list.
+        - fuzzy: bool, tolerate typos in the names.
+        - cache: ResultCache, restores the document if it was generated before (optional).
+        - fingerprint: dict, identifies the names read from fauna_layer, see
+          layer_source.fingerprint. The cache is only used if given, and not in
+          incremental mode.
+        - occurrences: bool, add the number of records per species to the table.
+          The records are then streamed from the layers instead of letting the
+          provider deduplicate the names, and the document is always rebuilt.
+        - date_field: str, with occurrences also add the first and last
+          observation date read from this field (optional).
+        - site_field: str, with occurrences also add the number of distinct
+          sites read from this field (optional).
+        - extract: OccurrenceExtract, records to be used instead of reading fauna_layer.
+        - formats: list of str, further output formats of FORMATS, written next to
+          outpath with their extension. outpath itself is written in the format of
+          its extension, .docx if it has none of FORMATS. The result cache and
+          incremental updates are only used for a single .docx output.
+        - streaming: bool, stream the table rows into the saved document instead
+          of building it in memory, see write_document. The document is then
+          only available as file, build leaves doc at None.
+        - split: str, one of SPLITS to split the Word table into parts, each
+          with a heading and its header row repeated on every page. None
+          keeps a single table. Splitting by group needs the Gruppe column in
+          the red list. The other formats always get the whole table.
+        - chunk_rows: int, number of rows per part when splitting by rows.
+        - separate: bool, write each part to a document of its own next to
+          outpath instead of all parts into outpath. The documents are
+          written in parallel.
+        - sort_by: str, one of SORT_KEYS, the order of the table rows: by
+          scientific name, German name (German collation) or red list
+          category (by severity). Species missing from the red list come last,
+          except when sorting by scientific name without groups.
+        - group_by: str, a red list column with the taxonomic group of the
+          species, e.g. "Gruppe" or an order. The rows are then grouped,
+          each group under a header row. No groups if the red list has no
+          such column. Splitting by group uses this column, Gruppe if None.
         """
         self.fauna_layer = fauna_layer
         self.outpath = outpath
         self.field = field
-        self.dlg = dlg
+        self.selected_ids = selected_ids
+        self.feature_count = feature_count
+        self.area = area
+        self.names = names
+        self.inputs = inputs
+        self.feedback = None
+        self.stage = 0
+        # Number of stages of the run, progress is spread evenly across them
+        self.stage_count = 1
+        self.stats = {}  # Timings and counts of the last run
         self.basepath = os.path.dirname(os.path.realpath(__file__))
-        self.LUT = pd.read_csv(
-            f"{self.basepath}/fauna.csv", sep="|"
-        )  # Look-up table for fauna data
-        self.legend = pd.read_csv(
-            f"{self.basepath}/legend.csv", sep="|"
-        )  # Legend for table colors
-        self.doc = docx.Document()
-
-        self.progressMessageBar = qgis.utils.iface.messageBar()
-        progress = QProgressBar()
-        progress.setMaximum(9)
-
-        self.progressMessageBar.pushWidget(progress)
-
-        self.get_arten_list(
-            self.fauna_layer
-        )  # Retrieve unique fauna names from the layer
-        progress.setValue(1)
-        self.create_df()  # Create a DataFrame with relevant fauna data
-        progress.setValue(2)
-        self.add_header()  # Add document header
-        progress.setValue(3)
-        self.df_to_word()  # Convert DataFrame to Word table
-        progress.setValue(4)
-        self.color_cells(
-            self.doc.tables[0], 5
-        )  # Apply color to cells based on values in main table
-        progress.setValue(5)
-        self.center_text()  # Center-align text in the table
-        progress.setValue(6)
-        self.create_legend()  # Add legend to the document
-        progress.setValue(7)
-        self.color_cells(
-            self.doc.tables[1], 0
-        )  # Apply color to cells based on values in Legend
-        progress.setValue(8)
-        self.save()  # Save the document
-        progress.setValue(9)
-        qgis.utils.iface.messageBar().clearWidgets()
-
-    def add_header(self):
-        """
-        Add header to the document.
-        """
-        header = self.doc.sections[0].header
-        header.paragraphs[0].text = "Rote-Liste Fauna im Untersuchungsgebiet\n"
-        header.paragraphs[0].paragraph_format.alignment = WD_TABLE_ALIGNMENT.CENTER
-
-        style = self.doc.styles["Heading 1"]
-        font = style.font
-        font.size = Pt(16)
-
-        header.paragraphs[0].style = self.doc.styles["Heading 1"]
+        self.lut_path = lut_path or f"{self.basepath}/fauna.csv"
+        # Look-up table for fauna data, shared between runs
+        self.lut = load_lut(self.lut_path)
+        self.LUT = self.lut.df
+        self.template_path = template_path
+        self.incremental = incremental
+        self.scientific = scientific
+        self.fuzzy = fuzzy
+        self.cache = cache
+        self.fingerprint = fingerprint
+        self.occurrences = occurrences
+        self.date_field = date_field
+        self.site_field = site_field
+        self.extract = extract
+        self.streaming = streaming
+        if split not in (None,) + SPLITS:
+            raise ValueError("Unknown split: {}".format(split))
+        if split == "rows" and chunk_rows < 1:
+            raise ValueError("Parts need at least one row")
+        if sort_by not in SORT_KEYS:
+            raise ValueError("Unknown sort key: {}".format(sort_by))
+        self.sort_by = sort_by
+        self.group_by = group_by
+        # Scientific name -> taxonomic group, empty if not needed or missing
+        self.groups = {}
+        if group_by is not None or split == "group":
+            self.groups = load_groups(self.lut_path, group_by or GROUP_COLUMN)
+        if split == "group" and not self.groups:
+            raise ValueError("The red list has no taxonomic groups to split by")
+        # Group header rows, unless the table is split into the groups anyway
+        self.grouped = bool(self.groups) and group_by is not None and split != "group"
+        self.split = split
+        self.chunk_rows = chunk_rows
+        self.separate = separate and split is not None
+        self.part_paths = []  # Documents of the parts if written separately
+        ext = os.path.splitext(outpath or "")[1].lower().lstrip(".")
+        self.formats = list(
+            dict.fromkeys([ext if ext in FORMATS else "docx"] + list(formats or []))
+        )
+        unknown = [fmt for fmt in self.formats if fmt not in FORMATS]
+        if unknown:
+            raise ValueError("Unknown output format(s): {}".format(", ".join(unknown)))
+        self.previous = None  # Manifest of the document to be updated
+        self.unchanged = False  # Set if an incremental run found nothing to update
+        self.doc = None
+        self.table = None  # The species table of the document
+
+    def generate(self, feedback=None, write_stats=False, profile=False):
+        """
+        Run the whole pipeline and save the document.
+
+        Parameters:
+        - feedback: QgsFeedback, receives progress and is polled for cancellation (optional).
+        - write_stats: bool, write the run statistics to <output>.stats.json.
+        - profile: bool, write a cProfile capture of the run to <output>.prof.
+
+        Raises GenerationCanceled if the feedback was canceled before the document was saved.
+        """
+        base = os.path.splitext(self.outpath)[0]
+        profiler = cProfile.Profile() if profile else None
+        if profiler is not None:
+            profiler.enable()
+        try:
+            key = self.cache_key()
+            if key is not None:
+                with measure(self.stats, "restore_cached"):
+                    restored = self.cache.restore(key, self.outpath)
+                if restored:
+                    self.stats["cached"] = True
+                    remove_manifest(self.outpath)
+                    self.stage = 1  # Restoring was the only stage
+            if key is None or not restored:
+                self.build(feedback, stages_after=1)
+                self.next_stage()
+                if self.unchanged:
+                    self.stats["unchanged"] = True  # Nothing to write
+                else:
+                    with measure(self.stats, "save"):
+                        self.save()  # Save the document
+                    if key is not None:
+                        self.cache.store(key, self.outpath)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(base + ".prof")
+        self.stats["output_bytes"] = sum(
+            os.path.getsize(path) for path in self.output_paths()
+        )
+        if write_stats:
+            write_json(self.stats, base + ".stats.json")
+        self.report_progress(1)
+
+    def build(self, feedback=None, stages_after=0):
+        """
+        Run the pipeline up to the finished document, without saving it.
+
+        Parameters:
+        - feedback: QgsFeedback or any object with setProgress() and isCanceled() (optional).
+        - stages_after: int, number of stages run after the pipeline, such as
+          saving in generate. Progress is spread over them as well.
+        """
+        self.feedback = feedback
+        if self.incremental:
+            self.previous = self.read_previous()
+        stages = self.stages()
+        self.stage_count = len(stages) + stages_after
+        for name, stage in stages:
+            self.next_stage()
+            with measure(self.stats, name):
+                stage()
+
+    def stages(self):
+        """
+        Return the stages building the document, in pipeline order.
+
+        Returns a list of (name, callable) tuples, generate saves the document afterwards.
+        """
+        if self.formats == ["docx"] and self.previous is not None:
+            return [
+                ("get_arten_list", lambda: self.get_arten_list(self.fauna_layer)),
+                # Insert and remove the rows of added and dropped species
+                ("update_table", self.update_table),
+            ]
+        return [
+            # Retrieve unique fauna names from the layer
+            ("get_arten_list", lambda: self.get_arten_list(self.fauna_layer)),
+            # Resolve the names to red list rows
+            ("match_names", self.match_names),
+            # Create a DataFrame with relevant fauna data
+            ("create_df", self.create_df),
+        ] + (
+            [
+                # Open the document from the cached template with header and legend
+                ("open_template", self.open_template),
+                # Convert DataFrame to colored Word table
+                ("df_to_word", self.df_to_word),
+            ]
+            if "docx" in self.formats and not (self.streaming or self.separate)
+            else []
+        )
+
+    def next_stage(self):
+        """
+        Advance to the next pipeline stage, aborting if cancellation was requested.
+        """
+        if self.stage:
+            self.report_progress(1)
+        self.stage += 1
+        self.report_progress(0)
+
+    def report_progress(self, fraction):
+        """
+        Report progress within the current stage and check for cancellation.
+
+        Parameters:
+        - fraction: float, share of the current stage that is done (0 to 1).
+        """
+        if self.feedback is None:
+            return
+        if self.feedback.isCanceled():
+            raise GenerationCanceled()
+        self.feedback.setProgress((self.stage - 1 + fraction) / self.stage_count * 100)
 
     def get_arten_list(self, lyr):
         """
-        Extract unique fauna names from the provided vector layer.
+        Extract unique fauna names from the provided vector layer(s).
 
         Parameters:
-        - lyr: QgsVectorLayer, vector layer containing fauna data.
+        - lyr: QgsVectorLayer or QgsVectorLayerFeatureSource, source containing fauna data.
+          Ignored if names or inputs were passed to the constructor.
+
+        Each layer is read in a single pass over its features, however many
+        species fields it has. Counts per layer are recorded in stats["layers"].
         """
-        cols = [f.name() for f in lyr.fields()]
-        # if selected only box is checked, only use selected features
-        if self.dlg.checkBox_selection.isChecked():
-            datagen = ([f[col] for col in cols] for f in lyr.selectedFeatures())
+        if self.extract is not None:
+            names = self.extract.names()
+            self.stats["records"] = len(self.extract)
+        elif self.names is not None:
+            names = set(self.names)
         else:
-            datagen = ([f[col] for col in cols] for f in lyr.getFeatures())
+            # QGIS is only needed when the names are read from a layer
+            from .layer_source import read_occurrences, unique_names
+
+            inputs = self.inputs or [
+                LayerInput(
+                    "fauna_layer",
+                    lyr,
+                    [self.field],
+                    self.selected_ids,
+                    self.feature_count,
+                    self.area,
+                )
+            ]
+            names = set()
+            layers = self.stats["layers"] = {}
+            if self.occurrences:
+                self.extract = OccurrenceExtract()
+            for i, layer in enumerate(inputs):
+                layer_stats = {}
+                options = dict(
+                    selected_ids=layer.selected_ids,
+                    area=layer.area,
+                    feature_count=layer.feature_count,
+                    progress=lambda fraction, i=i: self.report_progress(
+                        (i + fraction) / len(inputs)
+                    ),
+                    feedback=self.feedback,
+                    stats=layer_stats,
+                )
+                if self.extract is None:
+                    found = unique_names(layer.source, layer.fields, **options)
+                else:
+                    # Stream the records into the columnar extract
+                    start = len(self.extract)
+                    read_occurrences(
+                        layer.source,
+                        layer.fields,
+                        self.extract,
+                        self.date_field,
+                        self.site_field,
+                        **options,
+                    )
+                    codes = set(pd.unique(self.extract.column("name")[start:]).tolist())
+                    found = {
+                        name
+                        for name, code in self.extract.values["name"].items()
+                        if code in codes
+                    }
+                    layer_stats["records"] = len(self.extract) - start
+                layer_stats["distinct_names"] = sum(1 for name in found if name)
+                key = layer.name if layer.name not in layers else f"{layer.name} ({i})"
+                layers[key] = layer_stats
+                names.update(found)
+            self.stats["features_read"] = sum(
+                layer.get("features_read", 0) for layer in layers.values()
+            )
+            if self.extract is not None:
+                self.stats["records"] = len(self.extract)
+        self.report_progress(1)
+
+        # Drop NULL and empty values, values of numeric fields become text
+        self.list = sorted(
+            {name if isinstance(name, str) else str(name) for name in names if name}
+        )
+        self.stats["distinct_names"] = len(self.list)
+
+    def match_names(self):
+        """
+        Resolve the species names to red list rows, tolerating spelling variants.
+
+        Names missing from the red list are listed in stats["unmatched"], names
+        matched other than exactly in stats["corrected"].
+        """
+        resolved = self.lut.resolve(self.list, self.scientific, self.fuzzy)
+        methods = Counter(method for _, method in resolved)
+        self.stats["matched_names"] = len(self.list) - methods[None]
+        for method in (EXACT, NORMALIZED, SCIENTIFIC, FUZZY):
+            self.stats[method + "_matches"] = methods[method]
+        self.stats["unmatched_names"] = methods[None]
+        self.stats["unmatched"] = [
+            name for name, (row, _) in zip(self.list, resolved) if row is None
+        ]
+        self.stats["corrected"] = {
+            name: row[1] if isinstance(row[1], str) else row[0]
+            for name, (row, method) in zip(self.list, resolved)
+            if method not in (EXACT, None)
+        }
+        name_rows = self.name_rows(self.list, resolved)
+        self.rows = list(dict.fromkeys(name_rows))
+        # Table row index of each name, spelling variants share a row
+        index = {row: i for i, row in enumerate(self.rows)}
+        self.row_index = {name: index[row] for name, row in zip(self.list, name_rows)}
+
+    def name_rows(self, names, resolved):
+        """
+        Return the report row of each resolved name.
+
+        Parameters:
+        - names: list of str, species names sorted alphabetically.
+        - resolved: list of (row, method) tuples, see LookupTable.resolve.
+
+        Unmatched names keep their name in the German name column.
+        """
+        german = REPORT_COLUMNS.index("Deutscher Name")
+        rows = []
+        for name, (row, _) in zip(names, resolved):
+            if row is None:
+                row = tuple(
+                    name if i == german else None for i in range(len(REPORT_COLUMNS))
+                )
+            rows.append(row)
+        return rows
+
+    def table_rows(self, names, resolved):
+        """
+        Return the distinct report rows of resolved names.
 
-        df = pd.DataFrame.from_records(data=datagen, columns=cols)
+        Parameters:
+        - names, resolved: see name_rows.
 
-        list = df[self.field].unique()
-        self.list = list
+        Names resolved to the same species give a single row.
+        """
+        return list(dict.fromkeys(self.name_rows(names, resolved)))
 
     def create_df(self):
         """
         Create DataFrame with relevant fauna data for the specified field.
+
+        With occurrences, the records are aggregated per table row in one
+        vectorized groupby over the extract.
         """
-        df = pd.DataFrame(self.list, columns=[self.field])
-        merge = df.merge(
-            self.LUT, how="left", left_on=self.field, right_on="Deutscher Name"
-        )
-        merge = merge[
-            [
-                "Name",
-                "Deutscher Name",
-                "aktuelle Bestandssituation",
-                "kurzfristiger Bestandstrend",
-                "langfristiger Bestandstrend",
-                "RL Kat.",
-            ]
-        ]
+        extra = None
+        if self.occurrences:
+            summary = summarize(self.extract or OccurrenceExtract(), self.row_index)
+            extra = occurrence_frame(
+                summary,
+                len(self.rows),
+                dates=self.date_field is not None,
+                sites=self.site_field is not None,
+            )
+        self.df = self.table_df(self.rows, extra)
+
+    def table_df(self, rows, extra=None):
+        """
+        Return report rows as DataFrame, sorted by scientific name.
+
+        Parameters:
+        - rows: list of tuples of REPORT_COLUMNS values, see table_rows.
+        - extra: DataFrame, further columns in the order of rows (optional).
+        """
+        # object columns keep numeric categories such as 2 from becoming 2.0
+        # when a missing value adds a None
+        merge = pd.DataFrame(rows, columns=REPORT_COLUMNS, dtype=object)
         merge.columns = [i.title() for i in merge.columns]
         merge = merge.fillna("-")
-        merge = merge.sort_values("Name")
+        if extra is not None:
+            merge = pd.concat([merge, extra.reset_index(drop=True)], axis=1)
+        if self.sort_by == "name" and not self.grouped:
+            return merge.sort_values("Name", kind="stable")
+        return merge.iloc[self.row_order(rows)]
+
+    def row_order(self, rows):
+        """
+        Return the table order of report rows as array of row positions.
+
+        The rows are sorted by the integer ranks precomputed for the red list,
+        see LookupTable.sort_ranks, and by group first if grouped.
+
+        Parameters:
+        - rows: list of tuples of REPORT_COLUMNS values, see table_rows.
+        """
+        ranks = self.lut.sort_ranks(self.sort_by)
+        german = REPORT_COLUMNS.index("Deutscher Name")
+        # Names missing from the red list follow, by German name
+        missing = sorted(
+            (row for row in rows if row not in ranks),
+            key=lambda row: collation_key(row[german] or ""),
+        )
+        missing = {row: len(ranks) + i for i, row in enumerate(missing)}
+        keys = np.array(
+            [ranks.get(row, missing.get(row)) for row in rows], dtype=np.int64
+        )
+        if not self.grouped:
+            return np.argsort(keys, kind="stable")
+        titles = [self.groups.get(row[0], OTHER_GROUP) for row in rows]
+        group_ranks = {title: i for i, title in enumerate(group_order(titles))}
+        groups = np.array([group_ranks[title] for title in titles], dtype=np.int64)
+        return np.lexsort((keys, groups))
+
+    def with_group_rows(self, rows):
+        """
+        Insert a group header row before the first row of every group.
 
-        self.df = merge
+        Parameters:
+        - rows: list of lists of str, table rows in table order, grouped.
+
+        Returns the rows unchanged if not grouped.
+        """
+        if not self.grouped:
+            return rows
+        result = []
+        title = None
+        for row in rows:
+            if not result or self.groups.get(row[0], OTHER_GROUP) != title:
+                title = self.groups.get(row[0], OTHER_GROUP)
+                result.append(GroupRow(title))
+            result.append(row)
+        return result
+
+    def open_template(self):
+        """
+        Open the document from the template.
+
+        Header, styles and the colored legend are part of the cached
+        template, so only the species table is added per run.
+        """
+        self.doc = open_template(self.template_path)
 
     def df_to_word(self):
         """
         Convert DataFrame to Word table.
+
+        The table is built as a single XML element, text is centered, the
+        header is formatted and the red list category cells are colored while
+        building it.
         """
-        t = self.doc.add_table(
-            self.df.shape[0] + 1, self.df.shape[1], style="Table Grid"
+        chunks = self.chunks(self.df.astype(str).values.tolist())
+        tables = add_tables(
+            self.doc,
+            list(self.df.columns),
+            chunks,
+            self.column_widths(),
+            anchor=placeholder(self.doc),
+            **self.table_options(),
         )
+        self.table = tables[0]
+        self.count_table(chunks)
 
-        # Transfer DataFrame content to docx table
-        for j in range(self.df.shape[-1]):
-            t.cell(0, j).text = self.df.columns[j]
+    def chunks(self, rows):
+        """
+        Split the table rows into the parts of the Word table.
 
-        for i in range(self.df.shape[0]):
-            for j in range(self.df.shape[-1]):
-                t.cell(i + 1, j).text = str(self.df.values[i, j])
+        Parameters:
+        - rows: list of lists of str, the table rows in table order.
 
-        # Center table
-        t.alignment = WD_TABLE_ALIGNMENT.CENTER
+        Returns a list of (title, rows) tuples, see ooxml.iter_body_xml. Parts
+        keep the order of the rows, groups are sorted by name and categories
+        in the order of the legend. If grouped, each part gets the header
+        rows of its groups.
+        """
+        if self.split is None:
+            return [(None, self.with_group_rows(rows))]
+        if self.split == "rows":
+            count = max(1, -(-len(rows) // self.chunk_rows))
+            return [
+                (
+                    "Teil {} von {}".format(k + 1, count),
+                    self.with_group_rows(
+                        rows[k * self.chunk_rows : (k + 1) * self.chunk_rows]
+                    ),
+                )
+                for k in range(count)
+            ]
+        parts = {}
+        for row in rows:
+            if self.split == "group":
+                key = self.groups.get(row[0], OTHER_GROUP)
+            else:
+                key = row[5]
+            parts.setdefault(key, []).append(row)
+        if self.split == "group":
+            return [(group, parts[group]) for group in group_order(parts)]
+        order = sorted(parts, key=lambda c: (category_rank(c), c))
+        return [
+            (CATEGORY_TITLE.format(category), self.with_group_rows(parts[category]))
+            for category in order
+        ]
 
-        t.autofit = False
-        t.allow_autofit = False
+    def count_table(self, chunks):
+        """
+        Record the size of the Word table in the stats.
 
-        # Set column widths
-        for cell in t.columns[0].cells:
-            cell.width = Cm(4)
-        for cell in t.columns[1].cells:
-            cell.width = Cm(4)
-        for cell in t.columns[2].cells:
-            cell.width = Cm(2.5)
-        for cell in t.columns[3].cells:
-            cell.width = Cm(2.5)
-        for cell in t.columns[4].cells:
-            cell.width = Cm(2.5)
-        for cell in t.columns[5].cells:
-            cell.width = Cm(2.5)
+        Parameters:
+        - chunks: list of (title, rows) tuples, see chunks.
+        """
+        rows = sum(len(part) + 1 for _, part in chunks)
+        groups = sum(isinstance(row, GroupRow) for _, part in chunks for row in part)
+        self.stats["table_rows"] = rows
+        self.stats["table_cells"] = (rows - groups) * self.df.shape[1] + groups
+        if self.split is not None:
+            self.stats["table_parts"] = len(chunks)
+        if self.grouped:
+            self.stats["group_rows"] = groups
+
+    def table_options(self):
+        """
+        Return the formatting options of the Word table, see ooxml.iter_table_xml.
+        """
+        return {
+            "fills": {5: COLORS},  # Color cells based on the red list category
+            "progress": self.report_progress,
+            "header_bold": True,
+            "header_size": Pt(12),
+        }
+
+    def column_widths(self):
+        """
+        Return the widths of the table columns.
+        """
+        widths = [Cm(4), Cm(4), Cm(2.5), Cm(2.5), Cm(2.5), Cm(2.5)]
+        return widths + [Cm(2.5)] * (self.df.shape[1] - len(widths))  # Occurrences
 
-    def color_cells(self, table, col):
+    def output_path(self, fmt):
         """
-        Apply color to cells based on values in the table.
+        Return the file an output format is written to.
 
         Parameters:
-        - table: docx.table.Table, the table to be colored.
-        """
-        num = 0
-        elems = []
-        for cell in table.columns[col].cells:
-            # Define cell colors based on cell values
-            if "0" == cell.text:
-                elems.append(
-                    parse_xml(r'<w:shd {} w:fill="#3ec902"/>'.format(nsdecls("w")))
-                )
-                cell._tc.get_or_add_tcPr().append(elems[num])
-                num += 1
-            if "1" == cell.text:
-                elems.append(
-                    parse_xml(r'<w:shd {} w:fill="#80c902"/>'.format(nsdecls("w")))
-                )
-                cell._tc.get_or_add_tcPr().append(elems[num])
-                num += 1
-            if "2" == cell.text:
-                elems.append(
-                    parse_xml(r'<w:shd {} w:fill="#c9b202"/>'.format(nsdecls("w")))
-                )
-                cell._tc.get_or_add_tcPr().append(elems[num])
-                num += 1
-            if "3" == cell.text:
-                elems.append(
-                    parse_xml(r'<w:shd {} w:fill="#a30202"/>'.format(nsdecls("w")))
-                )
-                cell._tc.get_or_add_tcPr().append(elems[num])
-                num += 1
-            if "G" == cell.text:
-                elems.append(
-                    parse_xml(r'<w:shd {} w:fill="#fa7000"/>'.format(nsdecls("w")))
-                )
-                cell._tc.get_or_add_tcPr().append(elems[num])
-                num += 1
-            if "R" == cell.text:
-                elems.append(
-                    parse_xml(r'<w:shd {} w:fill="#b300fa"/>'.format(nsdecls("w")))
-                )
-                cell._tc.get_or_add_tcPr().append(elems[num])
-                num += 1
-            if "V" == cell.text:
-                elems.append(
-                    parse_xml(r'<w:shd {} w:fill="#2302c9"/>'.format(nsdecls("w")))
-                )
-                cell._tc.get_or_add_tcPr().append(elems[num])
-                num += 1
-            if "D" == cell.text:
-                elems.append(
-                    parse_xml(r'<w:shd {} w:fill="#acacad"/>'.format(nsdecls("w")))
-                )
-                cell._tc.get_or_add_tcPr().append(elems[num])
-                num += 1
-            if "*" == cell.text:
-                elems.append(
-                    parse_xml(r'<w:shd {} w:fill="#acadad"/>'.format(nsdecls("w")))
-                )
-                cell._tc.get_or_add_tcPr().append(elems[num])
-                num += 1
-            if "♦" == cell.text:
-                elems.append(
-                    parse_xml(r'<w:shd {} w:fill="9edd23"/>'.format(nsdecls("w")))
-                )
-                cell._tc.get_or_add_tcPr().append(elems[num])
-                num += 1
-            if "nb" == cell.text:
-                elems.append(
-                    parse_xml(r'<w:shd {} w:fill="B6D6CC"/>'.format(nsdecls("w")))
-                )
-                cell._tc.get_or_add_tcPr().append(elems[num])
-                num += 1
-            if "kN" == cell.text:
-                elems.append(
-                    parse_xml(r'<w:shd {} w:fill="F1FEC6"/>'.format(nsdecls("w")))
-                )
-                cell._tc.get_or_add_tcPr().append(elems[num])
-                num += 1
+        - fmt: str, one of FORMATS. The first format is written to outpath.
+        """
+        if fmt == self.formats[0]:
+            return self.outpath
+        return os.path.splitext(self.outpath)[0] + "." + fmt
+
+    def part_path(self, k, title):
+        """
+        Return the document a part of the table is written to with separate.
 
-    def create_legend(self):
+        Parameters:
+        - k: int, index of the part.
+        - title: str, title of the part, groups and categories become part
+          of the file name, categories by CATEGORY_SLUGS.
+        """
+        base = "{}_{:02d}".format(os.path.splitext(self.output_path("docx"))[0], k + 1)
+        if self.split == "rows":
+            return base + ".docx"
+        if self.split == "category":
+            category = title[len(CATEGORY_TITLE.format("")) :]
+            title = "RL_Kat_" + CATEGORY_SLUGS.get(category, category)
+        return "{}_{}.docx".format(base, re.sub(r"\W+", "_", title).strip("_"))
+
+    def output_paths(self):
+        """
+        Return all files written by the last run, in the order of formats.
+        """
+        paths = []
+        for fmt in self.formats:
+            if fmt == "docx" and self.separate:
+                paths.extend(self.part_paths)
+            else:
+                paths.append(self.output_path(fmt))
+        return paths
+
+    def cache_key(self):
         """
-        Add legend to the document.
+        Return the key of the document in the result cache, None if it cannot be cached.
         """
+        if self.cache is None or self.fingerprint is None or self.incremental:
+            return None
+        if self.formats != ["docx"] or self.separate:
+            return None
+        return self.cache.key(
+            self.fingerprint,
+            file_hash(self.lut_path),
+            file_hash(self.template_path or LEGEND_CSV),
+            self.matching_options(),
+            self.occurrence_options(),
+            self.split_options(),
+            self.order_options(),
+        )
 
-        self.doc.add_page_break()
+    def order_options(self):
+        """
+        Return the options ordering and grouping the rows, documents depend on them.
+        """
+        if self.sort_by == "name" and self.group_by is None:
+            return None
+        return {"sort_by": self.sort_by, "group_by": self.group_by}
 
-        self.doc.add_paragraph("")
-        self.legend.fillna("", inplace=True)
-        t = self.doc.add_table(
-            self.legend.shape[0] + 1, self.legend.shape[1], style="Table Grid"
+    def split_options(self):
+        """
+        Return the options splitting the table, documents depend on them.
+        """
+        if self.split is None:
+            return None
+        return {
+            "split": self.split,
+            "chunk_rows": self.chunk_rows,
+            "separate": self.separate,
+        }
+
+    def occurrence_options(self):
+        """
+        Return the options of the occurrence columns, documents depend on them.
+        """
+        if not self.occurrences:
+            return None
+        return {"date_field": self.date_field, "site_field": self.site_field}
+
+    def layout_options(self):
+        """
+        Return the options shaping the species table, stored in the manifest.
+
+        Every option changing the columns, rows or order of the table belongs
+        here, an existing document is only updated if they are unchanged.
+        """
+        return {
+            "occurrences": self.occurrence_options(),
+            "order": self.order_options(),
+            "split": self.split_options(),
+        }
+
+    def matching_options(self):
+        """
+        Return the options of match_names, documents depend on them.
+        """
+        return {"scientific": self.scientific, "fuzzy": self.fuzzy}
+
+    def updatable(self):
+        """
+        Return whether the document of this run can be updated by a later run.
+
+        Only documents of a single Word table without occurrence columns,
+        sorted by scientific name, are updated, see update_table.
+        """
+        return (
+            not self.occurrences
+            and self.formats == ["docx"]
+            and self.split is None
+            and self.order_options() is None
         )
 
-        # Transfer DataFra,e content to docx table
-        for j in range(self.legend.shape[-1]):
-            t.cell(0, j).text = self.legend.columns[j]
-
-        for i in range(self.legend.shape[0]):
-            for j in range(self.legend.shape[-1]):
-                if "-" not in str(self.legend.values[i, j]):
-                    t.cell(i + 1, j).text = str(self.legend.values[i, j])
-
-        # Center table
-        t.alignment = WD_TABLE_ALIGNMENT.CENTER
-
-        t.autofit = False
-        t.allow_autofit = False
-        for col in t.columns:
-            col.width = Cm(1.75)
-
-        for i, row in enumerate(t.rows):
-            if i == 0:
-                # Merge cells and set legend labels
-                row.cells[0].merge(row.cells[1])
-                row.cells[0].text = "Rote Liste Status"
-                row.cells[2].merge(row.cells[3])
-                row.cells[3].text = "Aktuelle Bestandssituation"
-                row.cells[4].merge(row.cells[5])
-                row.cells[5].text = "Bestandstrend langfristig"
-                row.cells[6].merge(row.cells[7])
-                row.cells[7].text = "Bestandstrend kurzfristig"
-            # Format legend text
-            for cell in row.cells:
-                if "-" in cell.text:
-                    cell.text = ""
-                paragraphs = cell.paragraphs
-                for paragraph in paragraphs:
-                    for run in paragraph.runs:
-                        font = run.font
-                        if row.cells[0].text == "Rote Liste Status":
-                            font.bold = True
-                        font.size = Pt(6)
-                    paragraph.paragraph_format.alignment = WD_TABLE_ALIGNMENT.CENTER
-
-    def center_text(self):
-        """
-        Center-align text in the main table.
-        """
-        for row in self.doc.tables[0].rows:
-            if row.cells[1].text == "Deutscher Name":
-                # Format header row
-                for cell in row.cells:
-                    paragraphs = cell.paragraphs
-                    for paragraph in paragraphs:
-                        for run in paragraph.runs:
-                            font = run.font
-                            font.size = Pt(12)
-                            font.bold = True
-            for cell in row.cells:
-                paragraphs = cell.paragraphs
-                for paragraph in paragraphs:
-                    paragraph.paragraph_format.alignment = WD_TABLE_ALIGNMENT.CENTER
+    def read_previous(self):
+        """
+        Return the manifest of the existing document if it can be updated, else None.
+
+        Documents built from another red list or template are rebuilt, as are
+        documents with occurrence columns, whose counts change with every record,
+        split tables and tables in another order than by scientific name.
+        """
+        if not self.updatable():
+            return None
+        manifest = read_manifest(self.outpath)
+        if manifest is None:
+            return None
+        if manifest["lut"] != file_hash(self.lut_path):
+            return None
+        if manifest["template"] != file_hash(self.template_path or LEGEND_CSV):
+            return None
+        if manifest["options"] != self.matching_options():
+            return None
+        if manifest.get("layout") != self.layout_options():
+            return None
+        return manifest
+
+    def update_table(self):
+        """
+        Update the species table of the existing document.
+
+        Rows of species missing from the manifest are inserted at their sorted
+        position, rows of species no longer found are removed. If the names
+        did not change, the document is left untouched. Documents whose table
+        cannot be found are rebuilt.
+        """
+        current = set(self.list)
+        previous = set(self.previous["names"])
+        added = sorted(current - previous)
+        removed = sorted(previous - current)
+        self.stats["added_names"] = len(added)
+        self.stats["removed_names"] = len(removed)
+        if not added and not removed:
+            self.unchanged = True
+            return
+
+        # Spelling variants of one species share a row, so compare rows
+        self.match_names()
+        previous_names = sorted(previous)
+        previous_rows = self.table_rows(
+            previous_names,
+            self.lut.resolve(previous_names, self.scientific, self.fuzzy),
+        )
+        old_rows, new_rows = set(previous_rows), set(self.rows)
+        added_rows = [row for row in self.rows if row not in old_rows]
+        removed_rows = [row for row in previous_rows if row not in new_rows]
+
+        self.doc = docx.Document(self.outpath)
+        columns = [column.title() for column in REPORT_COLUMNS]
+        tables = self.doc.tables
+        index = self.previous["table"]
+        if index >= len(tables) or row_texts(tables[index]._tbl.tr_lst[0]) != columns:
+            # The document was edited, start over
+            self.create_df()
+            self.open_template()
+            self.df_to_word()
+            return
+
+        self.table = tables[index]
+        remove_rows(self.table, self.table_df(removed_rows).astype(str).values.tolist())
+        insert_rows(
+            self.table,
+            self.table_df(added_rows).astype(str).values.tolist(),
+            key=lambda row: (row[0], row[1]),  # Name, then German name
+            fills={5: COLORS},
+        )
+        self.stats["table_rows"] = len(self.table.rows)
 
     def save(self):
         """
-        Save document.
+        Save document, and its manifest in incremental mode, and the other formats.
+
+        The other formats are written from the same table rows as the
+        document, with the same category colors.
         """
-        self.doc.save(self.outpath)
+        rows = None
+        for fmt in self.formats:
+            if fmt == "docx":
+                continue
+            if rows is None:
+                rows = self.df.astype(str).values.tolist()
+            with measure(self.stats, "write_" + fmt):
+                write_table(
+                    fmt,
+                    self.output_path(fmt),
+                    list(self.df.columns),
+                    rows,
+                    fills={5: COLORS},
+                    widths=self.column_widths(),
+                )
+        if "docx" not in self.formats:
+            return
+        if self.doc is None:  # Streaming
+            if rows is None:
+                rows = self.df.astype(str).values.tolist()
+            chunks = self.chunks(rows)
+            self.count_table(chunks)
+            if self.separate:
+                self.write_parts(chunks)
+                return
+            index = write_document(
+                self.output_path("docx"),
+                list(self.df.columns),
+                chunks,
+                self.column_widths(),
+                template_path=self.template_path,
+                **self.table_options(),
+            )
+        else:
+            self.doc.save(self.output_path("docx"))
+            tables = [table._tbl for table in self.doc.tables]
+            index = tables.index(self.table._tbl)
+        if self.incremental and self.updatable():
+            write_manifest(
+                self.outpath,
+                self.list,
+                file_hash(self.lut_path),
+                file_hash(self.template_path or LEGEND_CSV),
+                index,
+                self.matching_options(),
+                self.layout_options(),
+            )
+        else:
+            # The manifest of a previous document no longer describes it
+            remove_manifest(self.outpath)
+
+    def write_parts(self, chunks):
+        """
+        Write each part of the table to a document of its own, in parallel.
+
+        The rows are streamed into the documents, see write_document. Most of
+        the time goes into compressing the zip entries, which runs outside of
+        the GIL, so threads are enough.
+
+        Parameters:
+        - chunks: list of (title, rows) tuples, see chunks.
+        """
+        self.part_paths = [
+            self.part_path(k, title) for k, (title, _) in enumerate(chunks)
+        ]
+        options = dict(self.table_options(), progress=None)
+        with ThreadPoolExecutor(min(len(chunks), os.cpu_count() or 1)) as executor:
+            futures = [
+                executor.submit(
+                    write_document,
+                    path,
+                    list(self.df.columns),
+                    [(title, part)],
+                    self.column_widths(),
+                    template_path=self.template_path,
+                    **options,
+                )
+                for path, (title, part) in zip(self.part_paths, chunks)
+            ]
+            for done, future in enumerate(as_completed(futures)):
+                future.result()
+                self.report_progress((done + 1) / len(futures))
@@ -0,0 +1,275 @@
+import copy
+import io
+import zipfile
+
+import docx
+from docx.enum.table import WD_TABLE_ALIGNMENT
+from docx.opc.oxml import serialize_part_xml
+from docx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI
+from docx.opc.pkgwriter import _ContentTypesItem
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.shared import Cm, Pt
+from lxml import etree
+
+from .lut import LEGEND_CSV, cached, load_legend
+from .ooxml import iter_body_xml
+
+# Cell fill colors of the red list categories
+COLORS = {
+    "0": "#3ec902",
+    "1": "#80c902",
+    "2": "#c9b202",
+    "3": "#a30202",
+    "G": "#fa7000",
+    "R": "#b300fa",
+    "V": "#2302c9",
+    "D": "#acacad",
+    "*": "#acadad",
+    "♦": "9edd23",
+    "nb": "B6D6CC",
+    "kN": "F1FEC6",
+}
+
+# Shading elements of the categories, deep-copied into the colored cells
+SHADING = {
+    value: parse_xml(r'<w:shd {} w:fill="{}"/>'.format(nsdecls("w"), fill))
+    for value, fill in COLORS.items()
+}
+
+# Text of the template paragraph replaced by the species table
+TABLE_PLACEHOLDER = "{{Tabelle}}"
+
+# Processing instruction marking the table position in the streamed document
+TABLE_MARK = "red-list-table"
+
+
+def build_template(legend_path=LEGEND_CSV):
+    """
+    Build the default template: header, table placeholder and colored legend.
+
+    Parameters:
+    - legend_path: str, the pipe separated legend file.
+
+    Returns the template as .docx bytes.
+    """
+    doc = docx.Document()
+    add_header(doc)
+    doc.add_paragraph(TABLE_PLACEHOLDER)
+    table = add_legend(doc, load_legend(legend_path))
+    color_cells(table, 0)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def read_bytes(path):
+    """
+    Return the content of a file as bytes.
+
+    Parameters:
+    - path: str, the file to be read.
+    """
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def load_template(path=None):
+    """
+    Return the cached template as .docx bytes.
+
+    Parameters:
+    - path: str, a custom .docx template, None for the default template built
+      from legend.csv. The default template is rebuilt when legend.csv changes.
+    """
+    if path is None:
+        return cached(LEGEND_CSV, build_template, "template")
+    return cached(path, read_bytes, "template")
+
+
+def open_template(path=None):
+    """
+    Open a new document from the cached template.
+
+    Parameters:
+    - path: str, a custom .docx template, None for the default template.
+    """
+    return docx.Document(io.BytesIO(load_template(path)))
+
+
+def placeholder(doc):
+    """
+    Return the body paragraph element holding TABLE_PLACEHOLDER, None if missing.
+
+    Parameters:
+    - doc: docx.Document, the document opened from a template.
+    """
+    for p in doc.element.body.iterchildren(qn("w:p")):
+        text = "".join(t.text or "" for t in p.iter(qn("w:t")))
+        if text.strip() == TABLE_PLACEHOLDER:
+            return p
+    return None
+
+
+def split_document(doc):
+    """
+    Serialize the document part of a template around the species table.
+
+    Parameters:
+    - doc: docx.Document, the document opened from a template, it is modified.
+
+    Returns the document XML before and after the table as bytes, and the
+    index of the table among the body tables.
+    """
+    mark = etree.ProcessingInstruction(TABLE_MARK)
+    anchor = placeholder(doc)
+    if anchor is None:
+        doc.element.body._insert_tbl(mark)
+    else:
+        anchor.addprevious(mark)
+        anchor.getparent().remove(anchor)
+    index = len(list(mark.itersiblings(qn("w:tbl"), preceding=True)))
+    head, tail = serialize_part_xml(doc.element).split(etree.tostring(mark))
+    return head, tail, index
+
+
+def write_document(path, header, chunks, widths, template_path=None, **kwargs):
+    """
+    Write the document with the species table streamed row by row.
+
+    The template parts are written as Document.save writes them, the
+    table markup goes straight into the zip entry of the document part
+    instead of being built as element tree. The output matches a document
+    built by add_table, at a memory use independent of the number of rows.
+
+    Parameters:
+    - path: str, the .docx file to be written.
+    - header, chunks, widths, kwargs: see ooxml.iter_body_xml.
+    - template_path: str, a custom .docx template, None for the default template.
+
+    Returns the index of the (first) species table among the body tables.
+    """
+    doc = open_template(template_path)
+    head, tail, index = split_document(doc)
+    package = doc.part.package
+    parts = list(package.iter_parts())
+    for part in parts:
+        part.before_marshal()
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(
+            CONTENT_TYPES_URI.membername, _ContentTypesItem.from_parts(parts).blob
+        )
+        zf.writestr(PACKAGE_URI.rels_uri.membername, package.rels.xml)
+        for part in parts:
+            if part is doc.part:
+                with zf.open(part.partname.membername, "w") as f:
+                    f.write(head)
+                    for xml in iter_body_xml(
+                        header, chunks, widths, standalone=False, **kwargs
+                    ):
+                        f.write(xml.encode("utf-8"))
+                    f.write(tail)
+            else:
+                zf.writestr(part.partname.membername, part.blob)
+            if len(part.rels):
+                zf.writestr(part.partname.rels_uri.membername, part.rels.xml)
+    return index
+
+
+def add_header(doc):
+    """
+    Add header to the document.
+
+    Parameters:
+    - doc: docx.Document, the target document.
+    """
+    header = doc.sections[0].header
+    header.paragraphs[0].text = "Rote-Liste Fauna im Untersuchungsgebiet\n"
+    header.paragraphs[0].paragraph_format.alignment = WD_TABLE_ALIGNMENT.CENTER
+
+    style = doc.styles["Heading 1"]
+    font = style.font
+    font.size = Pt(16)
+
+    header.paragraphs[0].style = doc.styles["Heading 1"]
+
+
+def add_legend(doc, legend):
+    """
+    Add legend to the document.
+
+    Parameters:
+    - doc: docx.Document, the target document.
+    - legend: pandas.DataFrame, the legend as read from legend.csv.
+
+    Returns the docx.table.Table of the legend.
+    """
+
+    doc.add_page_break()
+
+    doc.add_paragraph("")
+    legend = legend.fillna("")
+    t = doc.add_table(legend.shape[0] + 1, legend.shape[1], style="Table Grid")
+
+    # Transfer DataFra,e content to docx table
+    for j in range(legend.shape[-1]):
+        t.cell(0, j).text = legend.columns[j]
+
+    for i in range(legend.shape[0]):
+        for j in range(legend.shape[-1]):
+            if "-" not in str(legend.values[i, j]):
+                t.cell(i + 1, j).text = str(legend.values[i, j])
+
+    # Center table
+    t.alignment = WD_TABLE_ALIGNMENT.CENTER
+
+    t.autofit = False
+    t.allow_autofit = False
+    for col in t.columns:
+        col.width = Cm(1.75)
+
+    for i, row in enumerate(t.rows):
+        if i == 0:
+            # Merge cells and set legend labels
+            row.cells[0].merge(row.cells[1])
+            row.cells[0].text = "Rote Liste Status"
+            row.cells[2].merge(row.cells[3])
+            row.cells[3].text = "Aktuelle Bestandssituation"
+            row.cells[4].merge(row.cells[5])
+            row.cells[5].text = "Bestandstrend langfristig"
+            row.cells[6].merge(row.cells[7])
+            row.cells[7].text = "Bestandstrend kurzfristig"
+        # Format legend text
+        for cell in row.cells:
+            if "-" in cell.text:
+                cell.text = ""
+            paragraphs = cell.paragraphs
+            for paragraph in paragraphs:
+                for run in paragraph.runs:
+                    font = run.font
+                    if row.cells[0].text == "Rote Liste Status":
+                        font.bold = True
+                    font.size = Pt(6)
+                paragraph.paragraph_format.alignment = WD_TABLE_ALIGNMENT.CENTER
+
+    return t
+
+
+def color_cells(table, cols):
+    """
+    Apply color to cells based on values in the table.
+
+    Parameters:
+    - table: docx.table.Table, the table to be colored.
+    - cols: int or list of int, the grid column(s) to be colored.
+    """
+    cols = {cols} if isinstance(cols, int) else set(cols)
+    for tr in table._tbl.tr_lst:
+        col = 0
+        for tc in tr.tc_lst:
+            if col in cols:
+                text = "".join(t.text or "" for t in tc.iter(qn("w:t")))
+                shd = SHADING.get(text)
+                if shd is not None:
+                    tc.get_or_add_tcPr().append(copy.deepcopy(shd))
+            col += tc.grid_span
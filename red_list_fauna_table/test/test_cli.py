@@ -0,0 +1,74 @@
+# coding=utf-8
+"""Command line input test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = "till.frankenbach@gmail.com"
+__date__ = "2023-12-15"
+__copyright__ = "Copyright 2023, Till Frankenbach"
+
+import os
+import tempfile
+import unittest
+
+from ..cli import batch_names, read_names
+
+DUMMY_DATA = os.path.join(
+    os.path.dirname(__file__), os.pardir, os.pardir, "dummy_data.gpkg"
+)
+
+
+class ReadNamesTest(unittest.TestCase):
+    """Test species names are read without QGIS."""
+
+    def test_gpkg(self):
+        """Test distinct names are read from the dummy GeoPackage."""
+        names = read_names(DUMMY_DATA, "name")
+        self.assertIn("Raubwürger", names)
+        self.assertEqual(len(names), len(set(names)))
+
+    def test_gpkg_unknown_field(self):
+        """Test unknown fields are not read as string literals."""
+        with self.assertRaises(ValueError):
+            read_names(DUMMY_DATA, "unknown")
+
+    def test_csv(self):
+        """Test distinct names are read from a CSV column."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "fauna.csv")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("id;art\n1;Kiebitz\n2;Feldlerche\n3;Kiebitz\n")
+            names = read_names(path, "art", delimiter=";")
+        self.assertEqual(names, {"Kiebitz", "Feldlerche"})
+
+    def test_csv_fields(self):
+        """Test several columns are read in one pass, missing ones skipped."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "fauna.csv")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("id;art;art2\n1;Kiebitz;Feldlerche\n2;Kiebitz;\n")
+            names = read_names(path, ["art", "art2", "other"], delimiter=";")
+            with self.assertRaises(ValueError):
+                read_names(path, ["other"], delimiter=";")
+        self.assertEqual(names, {"Kiebitz", "Feldlerche"})
+
+    def test_batch_names(self):
+        """Test inputs of the same name get documents of their own."""
+        paths = [
+            os.path.join("2023", "fauna.gpkg"),
+            os.path.join("2024", "Fauna.csv"),
+            os.path.join("2024", "fauna.gpkg"),
+            "voegel.gpkg",
+        ]
+        self.assertEqual(
+            batch_names(paths), ["2023_fauna", "2024_Fauna", "2024_fauna_2", "voegel"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
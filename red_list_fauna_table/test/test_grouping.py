@@ -0,0 +1,103 @@
+# coding=utf-8
+"""Grouping and sorting test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = "till.frankenbach@gmail.com"
+__date__ = "2023-12-15"
+__copyright__ = "Copyright 2023, Till Frankenbach"
+
+import unittest
+
+import docx
+from docx.oxml.ns import qn
+
+from ..tablemaker import redListFauna
+from .utilities import GROUPED_LUT_CSV, LutTestCase
+
+NAMES = ["Kiebitz", "Feldlerche", "Erdkröte", "Aal", "Unbekannt"]
+
+
+class GroupingTest(LutTestCase):
+    """Test the species table is sorted and grouped."""
+
+    lut_csv = GROUPED_LUT_CSV
+
+    def setUp(self):
+        """Runs before each test."""
+        super().setUp()
+        self.outpath = self.path("fauna.docx")
+
+    def generate(self, **kwargs):
+        report = redListFauna(
+            None, None, self.outpath, names=NAMES, lut_path=self.lut, **kwargs
+        )
+        report.generate()
+        return report
+
+    def rows(self):
+        """Return the rows of the species table, group rows as their title."""
+        table = docx.Document(self.outpath).tables[0]
+        rows = []
+        for tr in table._tbl.tr_lst[1:]:
+            tcs = tr.tc_lst
+            if tcs[0].find(qn("w:tcPr") + "/" + qn("w:gridSpan")) is not None:
+                rows.append(("group", "".join(tcs[0].xpath(".//w:t/text()"))))
+            else:
+                rows.append("".join(tcs[1].xpath(".//w:t/text()")))
+        return rows
+
+    def test_sort_german(self):
+        """Test sorting by German name, missing names last."""
+        self.generate(sort_by="german")
+        self.assertEqual(
+            self.rows(), ["Aal", "Erdkröte", "Feldlerche", "Kiebitz", "Unbekannt"]
+        )
+
+    def test_sort_category(self):
+        """Test sorting by category follows the legend order."""
+        self.generate(sort_by="category", streaming=True)
+        self.assertEqual(
+            self.rows(), ["Aal", "Kiebitz", "Feldlerche", "Erdkröte", "Unbekannt"]
+        )
+
+    def test_group(self):
+        """Test each group gets a header row, species without group come last."""
+        report = self.generate(sort_by="german", group_by="Gruppe")
+        self.assertEqual(
+            self.rows(),
+            [
+                ("group", "Amphibien"),
+                "Erdkröte",
+                ("group", "Fische"),
+                "Aal",
+                ("group", "Vögel"),
+                "Feldlerche",
+                "Kiebitz",
+                ("group", "Sonstige"),
+                "Unbekannt",
+            ],
+        )
+        self.assertEqual(report.stats["group_rows"], 4)
+
+    def test_group_streamed(self):
+        """Test streaming writes the same grouped table."""
+        self.generate(sort_by="german", group_by="Gruppe")
+        rows = self.rows()
+        self.generate(sort_by="german", group_by="Gruppe", streaming=True)
+        self.assertEqual(self.rows(), rows)
+
+    def test_no_group_column(self):
+        """Test the table is not grouped if the red list lacks the column."""
+        self.generate(sort_by="german", group_by="Ordnung")
+        self.assertNotIn(("group", "Vögel"), self.rows())
+        self.assertEqual(len(self.rows()), len(NAMES))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+# coding=utf-8
+"""Look-up table cache test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = "till.frankenbach@gmail.com"
+__date__ = "2023-12-15"
+__copyright__ = "Copyright 2023, Till Frankenbach"
+
+import os
+import unittest
+
+from ..lut import REPORT_COLUMNS, load_groups, load_lut
+from .utilities import LUT_CSV, LutTestCase
+
+
+class LookupTableTest(LutTestCase):
+    """Test the look-up table is loaded once and reloaded on change."""
+
+    lut_csv = LUT_CSV + "2|Alauda arvensis dup|Feldlerche|h|vv|<<|V\n"
+
+    def test_cached(self):
+        """Test repeated loads return the same parsed table."""
+        self.assertIs(load_lut(self.lut), load_lut(self.lut))
+
+    def test_index(self):
+        """Test the table is indexed by German and scientific name."""
+        lut = load_lut(self.lut)
+        self.assertEqual(lut.species["Kiebitz"][0], "Vanellus vanellus")
+        self.assertEqual(lut.scientific["Alauda arvensis"][5], "3")
+
+    def test_lookup(self):
+        """Test names resolve to the report columns, first entry wins."""
+        rows = load_lut(self.lut).lookup(["Feldlerche", "Unbekannt"])
+        self.assertEqual(
+            rows[0], ("Alauda arvensis", "Feldlerche", "h", "vv", "<<", "3")
+        )
+        self.assertEqual(rows[1], (None,) * 6)
+
+    def test_dtypes(self):
+        """Test only the report columns are read, status codes as categoricals."""
+        self.write_lut(
+            "|Name|Deutscher Name|aktuelle Bestandssituation"
+            "|kurzfristiger Bestandstrend|langfristiger Bestandstrend"
+            "|RL Kat.|Sonstiges\n"
+            "0|Vanellus vanellus|Kiebitz|mh|vvv|<<|2|x\n"
+            "1|Alauda arvensis|Feldlerche|h||<<|3|y\n"
+        )
+        lut = load_lut(self.lut)
+        self.assertEqual(list(lut.df.columns), REPORT_COLUMNS)
+        self.assertEqual(lut.df["RL Kat."].dtype, "category")
+        self.assertEqual(
+            lut.lookup(["Feldlerche"])[0],
+            ("Alauda arvensis", "Feldlerche", "h", None, "<<", "3"),
+        )
+
+    def test_sort_ranks(self):
+        """Test the precomputed ranks order the rows by category severity."""
+        lut = load_lut(self.lut)
+        ranks = lut.sort_ranks("category")
+        rows = sorted(lut.scientific.values(), key=ranks.get)
+        self.assertEqual([row[5] for row in rows], ["2", "3", "V"])
+        self.assertIs(lut.sort_ranks("category"), ranks)
+
+    def test_groups(self):
+        """Test groups are read from the group column, if there is one."""
+        self.assertEqual(load_groups(self.lut), {})
+        self.write_lut(
+            self.lut_csv.replace("RL Kat.\n", "RL Kat.|Ordnung\n").replace(
+                "2\n", "2|Charadriiformes\n"
+            )
+        )
+        self.assertEqual(
+            load_groups(self.lut, "Ordnung"), {"Vanellus vanellus": "Charadriiformes"}
+        )
+
+    def test_reload_on_change(self):
+        """Test a modified file is parsed again."""
+        first = load_lut(self.lut)
+        stat = os.stat(self.lut)
+        os.utime(self.lut, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertIsNot(load_lut(self.lut), first)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+# coding=utf-8
+"""Incremental update test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = "till.frankenbach@gmail.com"
+__date__ = "2023-12-15"
+__copyright__ = "Copyright 2023, Till Frankenbach"
+
+import json
+import os
+import unittest
+
+import docx
+
+from ..manifest import manifest_path, read_manifest
+from ..ooxml import row_texts
+from ..tablemaker import redListFauna
+from .utilities import LUT_CSV, LutTestCase
+
+
+class IncrementalTest(LutTestCase):
+    """Test documents are updated instead of rebuilt."""
+
+    lut_csv = LUT_CSV + "2|Gallinago gallinago|Bekassine|s|vvv|<<<|1\n"
+
+    def setUp(self):
+        """Runs before each test."""
+        super().setUp()
+        self.outpath = self.path("out.docx")
+
+    def generate(
+        self, names, incremental=True, outpath=None, streaming=False, **kwargs
+    ):
+        report = redListFauna(
+            None,
+            None,
+            outpath or self.outpath,
+            names=names,
+            lut_path=self.lut,
+            incremental=incremental,
+            streaming=streaming,
+            **kwargs
+        )
+        report.generate()
+        return report
+
+    def rows(self, path):
+        doc = docx.Document(path)
+        return [row_texts(tr) for tr in doc.tables[0]._tbl.tr_lst]
+
+    def test_manifest_written(self):
+        """Test the manifest lists the species of the document."""
+        self.generate(["Kiebitz", "Feldlerche"])
+        self.assertTrue(os.path.exists(manifest_path(self.outpath)))
+        self.assertEqual(
+            read_manifest(self.outpath)["names"], ["Feldlerche", "Kiebitz"]
+        )
+
+    def test_unchanged(self):
+        """Test the document is not written again without changes."""
+        self.generate(["Kiebitz", "Feldlerche"])
+        mtime = os.stat(self.outpath).st_mtime_ns
+        report = self.generate(["Feldlerche", "Kiebitz", ""])
+        self.assertTrue(report.stats["unchanged"])
+        self.assertEqual(os.stat(self.outpath).st_mtime_ns, mtime)
+
+    def test_update_matches_rebuild(self):
+        """Test an updated table equals a rebuilt one."""
+        self.generate(["Kiebitz", "Unbekannt"])
+        report = self.generate(["Bekassine", "Feldlerche", "Kiebitz"])
+        self.assertEqual(report.stats["added_names"], 2)
+        self.assertEqual(report.stats["removed_names"], 1)
+        rebuilt = self.path("rebuilt.docx")
+        self.generate(["Bekassine", "Feldlerche", "Kiebitz"], False, rebuilt)
+        self.assertEqual(self.rows(self.outpath), self.rows(rebuilt))
+
+    def test_streamed_then_updated(self):
+        """Test a streamed document is updated like a built one."""
+        self.generate(["Kiebitz", "Unbekannt"], streaming=True)
+        self.assertEqual(read_manifest(self.outpath)["table"], 0)
+        self.generate(["Bekassine", "Feldlerche", "Kiebitz"], streaming=True)
+        rebuilt = self.path("rebuilt.docx")
+        self.generate(["Bekassine", "Feldlerche", "Kiebitz"], False, rebuilt)
+        self.assertEqual(self.rows(self.outpath), self.rows(rebuilt))
+
+    def test_spelling_variant(self):
+        """Test a spelling variant of a listed species adds no row."""
+        self.generate(["Kiebitz"])
+        report = self.generate(["Kiebitz", "kiebitz "])
+        self.assertEqual(report.stats["added_names"], 1)
+        self.assertEqual(len(self.rows(self.outpath)), 2)
+
+    def test_layout_change_rebuilds(self):
+        """Test a document of another table layout is not updated."""
+        self.generate(["Kiebitz"])
+        with open(manifest_path(self.outpath), encoding="utf-8") as f:
+            manifest = json.load(f)
+        manifest["layout"]["occurrences"] = {"date_field": None, "site_field": None}
+        with open(manifest_path(self.outpath), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        report = self.generate(["Kiebitz", "Feldlerche"])
+        self.assertNotIn("added_names", report.stats)
+
+    def test_grouped_then_updated(self):
+        """Test a grouped document is rebuilt, not updated, by a plain run."""
+        self.write_lut(
+            self.lut_csv.replace("RL Kat.\n", "RL Kat.|Gruppe\n")
+            .replace("|2\n", "|2|Vögel\n")
+            .replace("|3\n", "|3|Vögel\n")
+        )
+        self.generate(["Kiebitz", "Unbekannt"], group_by="Gruppe")
+        self.assertFalse(os.path.exists(manifest_path(self.outpath)))
+        report = self.generate(["Bekassine", "Feldlerche", "Kiebitz"])
+        self.assertNotIn("added_names", report.stats)
+        rebuilt = self.path("rebuilt.docx")
+        self.generate(["Bekassine", "Feldlerche", "Kiebitz"], False, rebuilt)
+        self.assertEqual(self.rows(self.outpath), self.rows(rebuilt))
+
+    def test_sorted_then_updated(self):
+        """Test a document in another order is rebuilt, not updated, by a plain run."""
+        self.generate(["Kiebitz", "Unbekannt"])
+        self.generate(["Kiebitz", "Unbekannt"], sort_by="category")
+        report = self.generate(["Bekassine", "Feldlerche", "Kiebitz"])
+        self.assertNotIn("added_names", report.stats)
+        rebuilt = self.path("rebuilt.docx")
+        self.generate(["Bekassine", "Feldlerche", "Kiebitz"], False, rebuilt)
+        self.assertEqual(self.rows(self.outpath), self.rows(rebuilt))
+
+    def test_split_then_updated(self):
+        """Test a table split into parts is rebuilt as one table by a plain run."""
+        self.generate(["Kiebitz", "Unbekannt"], split="rows", chunk_rows=1)
+        self.assertFalse(os.path.exists(manifest_path(self.outpath)))
+        report = self.generate(["Bekassine", "Feldlerche", "Kiebitz"])
+        self.assertNotIn("added_names", report.stats)
+        self.assertEqual(len(docx.Document(self.outpath).tables), 2)  # And legend
+        rebuilt = self.path("rebuilt.docx")
+        self.generate(["Bekassine", "Feldlerche", "Kiebitz"], False, rebuilt)
+        self.assertEqual(self.rows(self.outpath), self.rows(rebuilt))
+
+    def test_lut_change_rebuilds(self):
+        """Test a modified red list rebuilds the document."""
+        self.generate(["Kiebitz"])
+        self.write_lut(self.lut_csv + "3|Tringa totanus|Rotschenkel|s|vv|<<|2\n")
+        report = self.generate(["Kiebitz"])
+        self.assertNotIn("unchanged", report.stats)
+        self.assertNotIn("added_names", report.stats)
+
+
+if __name__ == "__main__":
+    unittest.main()
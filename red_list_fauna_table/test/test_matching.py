@@ -0,0 +1,99 @@
+# coding=utf-8
+"""Species name matching test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = "till.frankenbach@gmail.com"
+__date__ = "2023-12-15"
+__copyright__ = "Copyright 2023, Till Frankenbach"
+
+import unittest
+
+from ..matching import (
+    EXACT,
+    FUZZY,
+    NORMALIZED,
+    SCIENTIFIC,
+    NameMatcher,
+    TrigramIndex,
+    collation_key,
+    edit_distance,
+    normalize,
+)
+
+KIEBITZ = ("Vanellus vanellus", "Kiebitz", "mh", "vvv", "<<", "2")
+SEEQUAPPE = ("Ciliata mustela", "Fünfbärtelige Seequappe", "s", "=", "?", "D")
+
+
+class MatchingTest(unittest.TestCase):
+    """Test spelling variants resolve to the red list rows."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.matcher = NameMatcher(
+            {"Kiebitz": KIEBITZ, "Fünfbärtelige Seequappe": SEEQUAPPE},
+            {"Vanellus vanellus": KIEBITZ, "Ciliata mustela": SEEQUAPPE},
+        )
+
+    def test_normalize(self):
+        """Test case, whitespace, umlauts and remarks are normalized away."""
+        self.assertEqual(normalize(" Kiebitz  (Vanellus vanellus)"), "kiebitz")
+        self.assertEqual(
+            normalize("Fuenfbaertelige Seequappe"),
+            normalize("Fünfbärtelige  Seequappe"),
+        )
+        self.assertEqual(normalize("Straßen-Taube"), "strassen taube")
+
+    def test_collation_key(self):
+        """Test German names sort as in a dictionary, umlauts as base letters."""
+        names = ["Zander", "Äsche", "Aal", "aalmutter", "Barsch", "Öko"]
+        self.assertEqual(
+            sorted(names, key=collation_key),
+            ["Aal", "aalmutter", "Äsche", "Barsch", "Öko", "Zander"],
+        )
+
+    def test_edit_distance(self):
+        """Test the distance is exact up to the limit."""
+        self.assertEqual(edit_distance("kiebitz", "kiebiz", 2), 1)
+        self.assertEqual(edit_distance("kiebitz", "kibiz", 2), 2)
+        self.assertEqual(edit_distance("kiebitz", "feldlerche", 2), 3)
+
+    def test_trigram_index(self):
+        """Test the closest name within the tolerance is found."""
+        index = TrigramIndex(["kiebitz", "feldlerche", "heidelerche"])
+        self.assertEqual(index.search("feldlärche"), "feldlerche")
+        self.assertIsNone(index.search("star"))
+        self.assertIsNone(index.search("rotmilan"))
+
+    def test_lazy_indexes(self):
+        """Test exact names are resolved without building the indexes."""
+        self.assertEqual(self.matcher.resolve("Kiebitz"), (KIEBITZ, EXACT))
+        self.assertIsNone(self.matcher._indexes)
+        self.assertEqual(self.matcher.resolve("Kiebiz"), (KIEBITZ, FUZZY))
+        self.assertIsNotNone(self.matcher._indexes)
+
+    def test_resolve(self):
+        """Test each way a name can be resolved."""
+        resolve = self.matcher.resolve
+        self.assertEqual(resolve("Kiebitz"), (KIEBITZ, EXACT))
+        self.assertEqual(resolve("Fuenfbaertelige Seequappe "), (SEEQUAPPE, NORMALIZED))
+        self.assertEqual(resolve("vanellus  vanellus"), (KIEBITZ, SCIENTIFIC))
+        self.assertEqual(resolve("Vogel (Vanellus vanellus)"), (KIEBITZ, SCIENTIFIC))
+        self.assertEqual(resolve("Kiebiz"), (KIEBITZ, FUZZY))
+        self.assertEqual(resolve("Unbekannt"), (None, None))
+
+    def test_options(self):
+        """Test scientific and fuzzy matching can be turned off."""
+        self.assertEqual(
+            self.matcher.resolve("Vanellus vanellus", scientific=False), (None, None)
+        )
+        self.assertEqual(self.matcher.resolve("Kiebiz", fuzzy=False), (None, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+# coding=utf-8
+"""Occurrence statistics test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = "till.frankenbach@gmail.com"
+__date__ = "2023-12-15"
+__copyright__ = "Copyright 2023, Till Frankenbach"
+
+import datetime
+import unittest
+
+import numpy as np
+
+from ..occurrences import (
+    OccurrenceExtract,
+    occurrence_frame,
+    parse_dates,
+    summarize,
+)
+from ..tablemaker import redListFauna
+from .utilities import LutTestCase
+
+
+class OccurrencesTest(LutTestCase):
+    """Test records are aggregated per species."""
+
+    def setUp(self):
+        """Runs before each test."""
+        super().setUp()
+        self.extract = OccurrenceExtract()
+        self.extract.add("Kiebitz", "31.12.2020", "A")
+        self.extract.add("Kibitz", datetime.date(2021, 5, 1), "B")
+        self.extract.add("Kiebitz", None, "A")
+        self.extract.add("Feldlerche", "2019-03-04", None)
+        self.extract.add(None, "01.01.2020", "C")
+
+    def test_extract(self):
+        """Test records are stored as codes, records without name are ignored."""
+        self.assertEqual(len(self.extract), 4)
+        self.assertEqual(self.extract.names(), {"Kiebitz", "Kibitz", "Feldlerche"})
+        self.assertEqual(self.extract.column("name").tolist(), [0, 1, 0, 2])
+
+    def test_parse_dates(self):
+        """Test German, ISO and date values are parsed, others give NaT."""
+        dates = parse_dates(
+            [
+                "31.12.2020",
+                "2019-03-04",
+                "2019-03-04 10:00",
+                datetime.date(2021, 5, 1),
+                "x",
+            ]
+        )
+        self.assertEqual(
+            dates[:4].astype("datetime64[D]").astype(str).tolist(),
+            ["2020-12-31", "2019-03-04", "2019-03-04", "2021-05-01"],
+        )
+        self.assertTrue(np.isnat(dates[4]))
+
+    def test_summarize(self):
+        """Test spelling variants are counted together in their row."""
+        summary = summarize(self.extract, {"Kiebitz": 0, "Kibitz": 0, "Feldlerche": 2})
+        frame = occurrence_frame(summary, 3, dates=True, sites=True)
+        self.assertEqual(
+            frame.values.tolist(),
+            [
+                ["3", "31.12.2020", "01.05.2021", "2"],
+                ["-", "-", "-", "-"],
+                ["1", "04.03.2019", "04.03.2019", "0"],
+            ],
+        )
+
+    def test_table(self):
+        """Test the occurrence columns are added to the table."""
+        report = redListFauna(
+            None,
+            None,
+            self.path("fauna.docx"),
+            lut_path=self.lut,
+            occurrences=True,
+            date_field="datum",
+            extract=self.extract,
+        )
+        report.build()
+        self.assertEqual(
+            list(report.df.columns[-3:]),
+            ["Nachweise", "Erster Nachweis", "Letzter Nachweis"],
+        )
+        rows = {row[1]: row[6:] for row in report.df.values.tolist()}
+        self.assertEqual(rows["Kiebitz"], ["3", "31.12.2020", "01.05.2021"])
+        self.assertEqual(rows["Feldlerche"], ["1", "04.03.2019", "04.03.2019"])
+        self.assertEqual(report.stats["records"], 4)
+
+    def test_numeric_names(self):
+        """Test values of numeric species fields are matched as text."""
+        self.extract.add(42, None, "D")
+        outpath = self.path("fauna.docx")
+        report = redListFauna(
+            None, None, outpath, lut_path=self.lut, names=[42, 3.5, None, "Kiebitz"]
+        )
+        report.build()
+        self.assertEqual(report.list, ["3.5", "42", "Kiebitz"])
+        self.assertEqual(report.stats["unmatched"], ["3.5", "42"])
+        report = redListFauna(
+            None,
+            None,
+            outpath,
+            lut_path=self.lut,
+            occurrences=True,
+            extract=self.extract,
+        )
+        report.build()
+        rows = {row[1]: row[6] for row in report.df.values.tolist()}
+        self.assertEqual(rows["42"], "1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+# coding=utf-8
+"""OOXML table builder test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = "till.frankenbach@gmail.com"
+__date__ = "2023-12-15"
+__copyright__ = "Copyright 2023, Till Frankenbach"
+
+import unittest
+
+import docx
+from docx.shared import Cm, Pt
+
+from ..ooxml import add_table, insert_rows, remove_rows, row_texts
+
+
+class OoxmlTableTest(unittest.TestCase):
+    """Test tables are built in one pass."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.doc = docx.Document()
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.doc = None
+
+    def test_table_content(self):
+        """Test header, body text and escaping end up in the table."""
+        table = add_table(
+            self.doc,
+            ["Name", "Deutscher Name"],
+            [["Vanellus vanellus", "Kiebitz <&>"]],
+            [Cm(4), Cm(2.5)],
+        )
+        self.assertEqual(len(table.rows), 2)
+        self.assertEqual(table.cell(0, 1).text, "Deutscher Name")
+        self.assertEqual(table.cell(1, 1).text, "Kiebitz <&>")
+        self.assertEqual(table.cell(1, 0).width.twips, Cm(4).twips)
+
+    def test_header_format(self):
+        """Test the header is formatted while building the table."""
+        table = add_table(
+            self.doc,
+            ["Name"],
+            [["Vanellus vanellus"]],
+            [Cm(4)],
+            header_bold=True,
+            header_size=Pt(12),
+        )
+        header_run = table.cell(0, 0).paragraphs[0].runs[0]
+        body_run = table.cell(1, 0).paragraphs[0].runs[0]
+        self.assertTrue(header_run.font.bold)
+        self.assertEqual(header_run.font.size, Pt(12))
+        self.assertIsNone(body_run.font.bold)
+
+    def test_table_fills(self):
+        """Test cells are shaded according to the fill map."""
+        table = add_table(
+            self.doc,
+            ["Deutscher Name", "Rl Kat."],
+            [["Kiebitz", "2"], ["Feldlerche", "3"]],
+            [Cm(4), Cm(2.5)],
+            fills={1: {"2": "#c9b202"}},
+        )
+        self.assertIn('w:fill="#c9b202"', table.cell(1, 1)._tc.xml)
+        self.assertNotIn("w:shd", table.cell(2, 1)._tc.xml)
+
+    def test_insert_remove_rows(self):
+        """Test rows are inserted in sort order and removed by content."""
+        table = add_table(
+            self.doc,
+            ["Deutscher Name", "Rl Kat."],
+            [["Feldlerche", "3"], ["Kiebitz", "2"]],
+            [Cm(4), Cm(2.5)],
+        )
+        insert_rows(
+            table,
+            [["Zwergtaucher", "V"], ["Bekassine", "1"]],
+            key=lambda row: row[0],
+            fills={1: {"1": "#80c902"}},
+        )
+        self.assertEqual(remove_rows(table, [["Kiebitz", "2"], ["Star", "3"]]), 1)
+        rows = [row_texts(tr) for tr in table._tbl.tr_lst]
+        self.assertEqual(
+            rows,
+            [
+                ["Deutscher Name", "Rl Kat."],
+                ["Bekassine", "1"],
+                ["Feldlerche", "3"],
+                ["Zwergtaucher", "V"],
+            ],
+        )
+        self.assertIn('w:fill="#80c902"', table.cell(1, 1)._tc.xml)
+        self.assertEqual(table.cell(3, 0).width.twips, Cm(4).twips)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+# coding=utf-8
+"""Render pool test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = "till.frankenbach@gmail.com"
+__date__ = "2023-12-15"
+__copyright__ = "Copyright 2023, Till Frankenbach"
+
+import os
+import pickle
+import unittest
+
+import docx
+
+from .. import lut
+from ..occurrences import OccurrenceExtract
+from ..render_pool import RenderJob, init_worker, render_documents
+from ..result_cache import ResultCache
+from .utilities import LUT_CSV, LutTestCase
+
+
+class RenderPoolTest(LutTestCase):
+    """Test documents are rendered in worker processes."""
+
+    def test_jobs_picklable(self):
+        """Test jobs are plain data, also with occurrence records."""
+        extract = OccurrenceExtract()
+        extract.add("Kiebitz", "31.12.2020", "A")
+        job = RenderJob(self.path("a.docx"), None, extract)
+        copy = pickle.loads(pickle.dumps(job))
+        self.assertEqual(copy.extract.names(), {"Kiebitz"})
+
+    def test_init_worker(self):
+        """Test the taxonomic groups are cached before the first document."""
+        self.write_lut(LUT_CSV.replace("RL Kat.\n", "RL Kat.|Gruppe\n"))
+        init_worker({"lut_path": self.lut, "group_by": "Gruppe"})
+        key = (("groups", "Gruppe"), os.path.realpath(self.lut))
+        self.assertIn(key, lut._cache)
+
+    def test_render(self):
+        """Test every job gets its document, failures are returned in order."""
+        jobs = [
+            RenderJob(self.path("a.docx"), ["Kiebitz"]),
+            RenderJob(self.path("missing/b.docx"), ["Feldlerche"]),
+            RenderJob(self.path("c.docx"), ["Feldlerche", "Unbekannt"]),
+        ]
+        results = render_documents(jobs, workers=2, lut_path=self.lut)
+        self.assertEqual(results[0]["outputs"], [self.path("a.docx")])
+        self.assertIsInstance(results[1], OSError)
+        self.assertEqual(results[2]["unmatched"], ["Unbekannt"])
+        table = docx.Document(self.path("c.docx")).tables[0]
+        self.assertEqual(
+            [row.cells[1].text for row in table.rows],
+            ["Deutscher Name", "Unbekannt", "Feldlerche"],  # Sorted by Name
+        )
+
+    def test_cache(self):
+        """Test workers restore unchanged documents from the result cache."""
+        cache = ResultCache(self.path("cache"))
+        job = RenderJob(self.path("a.docx"), ["Kiebitz"], fingerprint={"input": "a"})
+        (first,) = render_documents([job], workers=1, lut_path=self.lut, cache=cache)
+        (second,) = render_documents([job], workers=1, lut_path=self.lut, cache=cache)
+        self.assertFalse(first.get("cached"))
+        self.assertTrue(second.get("cached"))
+
+
+if __name__ == "__main__":
+    unittest.main()
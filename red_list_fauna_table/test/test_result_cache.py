@@ -0,0 +1,76 @@
+# coding=utf-8
+"""Result cache test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = "till.frankenbach@gmail.com"
+__date__ = "2023-12-15"
+__copyright__ = "Copyright 2023, Till Frankenbach"
+
+import os
+import tempfile
+import unittest
+
+from ..result_cache import ResultCache
+
+
+class ResultCacheTest(unittest.TestCase):
+    """Test documents are restored and evicted least recently used first."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cache = ResultCache(os.path.join(self.tmpdir.name, "cache"), 250)
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.tmpdir.cleanup()
+
+    def document(self, name, size=100):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "wb") as f:
+            f.write(name.encode("ascii").ljust(size, b"."))
+        return path
+
+    def read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_key(self):
+        """Test keys depend on all parts, not on dict order."""
+        key = ResultCache.key({"field": "art", "features": 3}, "lut")
+        self.assertEqual(key, ResultCache.key({"features": 3, "field": "art"}, "lut"))
+        self.assertNotEqual(
+            key, ResultCache.key({"field": "art", "features": 4}, "lut")
+        )
+
+    def test_restore(self):
+        """Test a stored document is copied to the new path."""
+        out = os.path.join(self.tmpdir.name, "out.docx")
+        self.assertFalse(self.cache.restore("a", out))
+        self.assertFalse(os.path.exists(out))
+        self.cache.store("a", self.document("a.docx"))
+        self.assertTrue(self.cache.restore("a", out))
+        self.assertEqual(self.read(out), self.read(self.document("a.docx")))
+
+    def test_evict_least_recently_used(self):
+        """Test the least recently used entry is evicted when the store is full."""
+        out = os.path.join(self.tmpdir.name, "out.docx")
+        self.cache.store("a", self.document("a.docx"))
+        self.cache.store("b", self.document("b.docx"))
+        # Make "a" the most recently used entry
+        os.utime(self.cache.entry("b"), ns=(0, 0))
+        self.assertTrue(self.cache.restore("a", out))
+        self.cache.store("c", self.document("c.docx"))
+        self.assertTrue(self.cache.restore("a", out))
+        self.assertFalse(self.cache.restore("b", out))
+        self.assertTrue(self.cache.restore("c", out))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+# coding=utf-8
+"""Split table test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = "till.frankenbach@gmail.com"
+__date__ = "2023-12-15"
+__copyright__ = "Copyright 2023, Till Frankenbach"
+
+import os
+import unittest
+
+import docx
+from docx.oxml.ns import qn
+
+from ..tablemaker import redListFauna
+from .utilities import GROUPED_LUT_CSV, LutTestCase
+
+NAMES = ["Kiebitz", "Feldlerche", "Erdkröte", "Unbekannt"]
+
+
+class Feedback:
+    """Records the reported progress."""
+
+    def __init__(self):
+        self.progress = []
+
+    def setProgress(self, progress):
+        self.progress.append(progress)
+
+    def isCanceled(self):
+        return False
+
+
+class SplitTest(LutTestCase):
+    """Test the species table is split into parts."""
+
+    lut_csv = GROUPED_LUT_CSV
+
+    def setUp(self):
+        """Runs before each test."""
+        super().setUp()
+        self.outpath = self.path("fauna.docx")
+
+    def generate(self, split, **kwargs):
+        report = redListFauna(
+            None,
+            None,
+            self.outpath,
+            names=NAMES,
+            lut_path=self.lut,
+            split=split,
+            **kwargs
+        )
+        report.generate()
+        return report
+
+    def parts(self, path):
+        """Return the headings and the German names of each table of a document."""
+        doc = docx.Document(path)
+        headings = [p.text for p in doc.paragraphs if p.style.name == "Heading 2"]
+        tables = [[row.cells[1].text for row in t.rows[1:]] for t in doc.tables]
+        return headings, tables[:-1]  # Without the legend
+
+    def test_rows(self):
+        """Test parts of a number of rows repeat their header row."""
+        report = self.generate("rows", chunk_rows=3)
+        headings, tables = self.parts(self.outpath)
+        self.assertEqual(headings, ["Teil 1 von 2", "Teil 2 von 2"])
+        self.assertEqual([len(rows) for rows in tables], [3, 1])
+        self.assertEqual(report.stats["table_parts"], 2)
+        header = docx.Document(self.outpath).tables[0].rows[0]._tr
+        self.assertIsNotNone(header.find(qn("w:trPr") + "/" + qn("w:tblHeader")))
+
+    def test_group(self):
+        """Test parts per group, species without group come last."""
+        headings, tables = self.parts(self.generate("group").outpath)
+        self.assertEqual(headings, ["Amphibien", "Vögel", "Sonstige"])
+        self.assertEqual(
+            tables, [["Erdkröte"], ["Feldlerche", "Kiebitz"], ["Unbekannt"]]
+        )
+
+    def test_category(self):
+        """Test parts per category follow the legend order."""
+        headings, _ = self.parts(self.generate("category", streaming=True).outpath)
+        self.assertEqual(headings, ["RL Kat. 2", "RL Kat. 3", "RL Kat. *", "RL Kat. -"])
+
+    def test_separate(self):
+        """Test each part is written to a document of its own."""
+        report = self.generate("group", separate=True)
+        self.assertEqual(
+            [os.path.basename(path) for path in report.output_paths()],
+            [
+                "fauna_01_Amphibien.docx",
+                "fauna_02_Vögel.docx",
+                "fauna_03_Sonstige.docx",
+            ],
+        )
+        self.assertFalse(os.path.exists(self.outpath))
+        self.assertEqual(
+            self.parts(report.output_paths()[1]),
+            (["Vögel"], [["Feldlerche", "Kiebitz"]]),
+        )
+
+    def test_separate_categories(self):
+        """Test categories without word characters get file names of their own."""
+        report = self.generate("category", separate=True)
+        self.assertEqual(
+            [os.path.basename(path) for path in report.output_paths()],
+            [
+                "fauna_01_RL_Kat_2.docx",
+                "fauna_02_RL_Kat_3.docx",
+                "fauna_03_RL_Kat_ungefaehrdet.docx",
+                "fauna_04_RL_Kat_nicht_gelistet.docx",
+            ],
+        )
+        self.assertEqual(
+            self.parts(report.output_paths()[3]), (["RL Kat. -"], [["Unbekannt"]])
+        )
+
+    def test_progress(self):
+        """Test progress reaches 100 % with the stages left out for separate parts."""
+        feedback = Feedback()
+        report = redListFauna(
+            None,
+            None,
+            self.outpath,
+            names=NAMES,
+            lut_path=self.lut,
+            split="group",
+            separate=True,
+        )
+        report.generate(feedback)
+        self.assertEqual(feedback.progress, sorted(feedback.progress))
+        self.assertAlmostEqual(feedback.progress[-1], 100)
+
+    def test_no_groups(self):
+        """Test splitting by group needs the group column."""
+        self.write_lut(
+            self.lut_csv.replace("|Gruppe", "")
+            .replace("|Vögel", "")
+            .replace("|Amphibien", "")
+            .replace("|Fische", "")
+        )
+        with self.assertRaises(ValueError):
+            self.generate("group")
+
+
+if __name__ == "__main__":
+    unittest.main()
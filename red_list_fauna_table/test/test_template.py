@@ -0,0 +1,115 @@
+# coding=utf-8
+"""Document template test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = "till.frankenbach@gmail.com"
+__date__ = "2023-12-15"
+__copyright__ = "Copyright 2023, Till Frankenbach"
+
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+
+import docx
+from docx.oxml.ns import qn
+from docx.shared import Cm, Pt
+
+from ..ooxml import add_table
+from ..template import (
+    COLORS,
+    TABLE_PLACEHOLDER,
+    load_template,
+    open_template,
+    placeholder,
+    write_document,
+)
+
+
+class TemplateTest(unittest.TestCase):
+    """Test documents are opened from the cached template."""
+
+    def setUp(self):
+        """Runs before each test."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "template.docx")
+        doc = docx.Document()
+        doc.add_paragraph("Vorher")
+        doc.add_paragraph(TABLE_PLACEHOLDER)
+        doc.add_paragraph("Nachher")
+        doc.save(self.path)
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.tmpdir.cleanup()
+
+    def test_cached(self):
+        """Test the template is read once."""
+        self.assertIs(load_template(self.path), load_template(self.path))
+        self.assertIs(load_template(), load_template())
+
+    def test_default_legend(self):
+        """Test the default template holds the header and the colored legend."""
+        doc = open_template()
+        self.assertEqual(
+            doc.sections[0].header.paragraphs[0].text,
+            "Rote-Liste Fauna im Untersuchungsgebiet\n",
+        )
+        self.assertEqual(len(doc.tables), 1)
+        self.assertTrue(list(doc.tables[0]._tbl.iter(qn("w:shd"))))
+        self.assertIsNotNone(placeholder(doc))
+
+    def test_placeholder_replaced(self):
+        """Test the table takes the place of the placeholder paragraph."""
+        doc = open_template(self.path)
+        add_table(doc, ["Name"], [["Kiebitz"]], [Cm(4)], anchor=placeholder(doc))
+        body = [child.tag for child in doc.element.body]
+        self.assertEqual(body[:4], [qn("w:p"), qn("w:tbl"), qn("w:p"), qn("w:sectPr")])
+        self.assertEqual([p.text for p in doc.paragraphs], ["Vorher", "Nachher"])
+        self.assertIsNone(placeholder(doc))
+
+    def test_streamed(self):
+        """Test the streamed document has the parts of a saved one, byte by byte."""
+        header = ["Name", "RL Kat."]
+        rows = [["Vanellus vanellus", "2"], ["A & B", ""], ["Zeile\nzwei", "-"]]
+        options = {"fills": {1: COLORS}, "header_bold": True, "header_size": Pt(12)}
+        for template_path in (None, self.path):
+            doc = open_template(template_path)
+            add_table(
+                doc, header, rows, [Cm(4)] * 2, anchor=placeholder(doc), **options
+            )
+            buffer = io.BytesIO()
+            doc.save(buffer)
+            path = os.path.join(self.tmpdir.name, "streamed.docx")
+            index = write_document(
+                path, header, [(None, rows)], [Cm(4)] * 2, template_path, **options
+            )
+            self.assertEqual(index, 0)
+            with zipfile.ZipFile(buffer) as saved, zipfile.ZipFile(path) as streamed:
+                self.assertEqual(saved.namelist(), streamed.namelist())
+                for name in saved.namelist():
+                    self.assertEqual(saved.read(name), streamed.read(name), name)
+
+    def test_streamed_appended(self):
+        """Test the streamed table is appended to templates without placeholder."""
+        doc = docx.Document()
+        doc.add_table(1, 1)
+        doc.save(self.path)
+        path = os.path.join(self.tmpdir.name, "streamed.docx")
+        index = write_document(
+            path, ["Name"], [(None, [["Kiebitz"]])], [Cm(4)], self.path
+        )
+        self.assertEqual(index, 1)
+        tables = docx.Document(path).tables
+        self.assertEqual(tables[1].cell(1, 0).text, "Kiebitz")
+
+
+if __name__ == "__main__":
+    unittest.main()
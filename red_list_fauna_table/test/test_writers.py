@@ -0,0 +1,142 @@
+# coding=utf-8
+"""Output format test.
+
+.. note:: This program is free software; you can redistribute it and/or modify
+     it under the terms of the GNU General Public License as published by
+     the Free Software Foundation; either version 2 of the License, or
+     (at your option) any later version.
+
+"""
+
+__author__ = "till.frankenbach@gmail.com"
+__date__ = "2023-12-15"
+__copyright__ = "Copyright 2023, Till Frankenbach"
+
+import contextlib
+import csv
+import io
+import os
+import unittest
+import zipfile
+from xml.etree import ElementTree
+
+from docx.shared import Cm
+
+from ..cli import main
+from ..tablemaker import redListFauna
+from ..template import COLORS
+from ..writers import column_letter, write_table
+from .utilities import LutTestCase
+
+HEADER = ["Name", "Deutscher Name", "RL Kat."]
+ROWS = [["Vanellus vanellus", "Kiebitz", "2"], ["-", "Feld & Flur", "-"]]
+FILLS = {2: COLORS}
+WIDTHS = [Cm(4), Cm(4), Cm(2.5)]
+
+XLSX = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+TABLE = "{urn:oasis:names:tc:opendocument:xmlns:table:1.0}"
+
+
+class WritersTest(LutTestCase):
+    """Test the table is written in every output format."""
+
+    def write(self, fmt):
+        """Write the test table in a format, returns its path."""
+        path = self.path("table." + fmt)
+        write_table(fmt, path, HEADER, ROWS, FILLS, WIDTHS)
+        return path
+
+    def test_column_letter(self):
+        """Test spreadsheet column letters."""
+        self.assertEqual(
+            [column_letter(j) for j in (0, 25, 26, 701, 702)],
+            ["A", "Z", "AA", "ZZ", "AAA"],
+        )
+
+    def test_csv(self):
+        """Test the CSV holds the header and rows."""
+        with open(self.write("csv"), newline="", encoding="utf-8-sig") as f:
+            self.assertEqual(list(csv.reader(f)), [HEADER] + ROWS)
+
+    def test_html(self):
+        """Test the HTML escapes text and colors the category cells."""
+        with open(self.write("html"), encoding="utf-8") as f:
+            page = f.read()
+        self.assertIn("Feld &amp; Flur", page)
+        self.assertIn('<td style="background-color: #C9B202">2</td>', page)
+
+    def test_xlsx(self):
+        """Test the workbook sheet holds the rows with a filled category cell."""
+        with zipfile.ZipFile(self.write("xlsx")) as zf:
+            sheet = ElementTree.fromstring(zf.read("xl/worksheets/sheet1.xml"))
+            styles = ElementTree.fromstring(zf.read("xl/styles.xml"))
+        rows = sheet.iter(XLSX + "row")
+        texts = [[t.text for t in row.iter(XLSX + "t")] for row in rows]
+        self.assertEqual(texts, [HEADER] + ROWS)
+        self.assertEqual(sheet.find(XLSX + "autoFilter").get("ref"), "A1:C3")
+        cell = sheet.find(".//{0}c[@r='C2']".format(XLSX))
+        xf = styles.find(XLSX + "cellXfs")[int(cell.get("s"))]
+        fill = styles.find(XLSX + "fills")[int(xf.get("fillId"))]
+        self.assertEqual(fill.find(".//" + XLSX + "fgColor").get("rgb"), "FFC9B202")
+
+    def test_odt(self):
+        """Test the text document starts with its mimetype and holds the rows."""
+        with zipfile.ZipFile(self.write("odt")) as zf:
+            self.assertEqual(zf.namelist()[0], "mimetype")
+            self.assertEqual(zf.getinfo("mimetype").compress_type, zipfile.ZIP_STORED)
+            content = ElementTree.fromstring(zf.read("content.xml"))
+        texts = [
+            ["".join(cell.itertext()) for cell in row.iter(TABLE + "table-cell")]
+            for row in content.iter(TABLE + "table-row")
+        ]
+        self.assertEqual(texts, [HEADER] + ROWS)
+
+    def test_formats(self):
+        """Test several formats are written from one run."""
+        outpath = self.path("fauna.xlsx")
+        report = redListFauna(
+            None,
+            None,
+            outpath,
+            names=["Kiebitz"],
+            lut_path=self.lut,
+            formats=["csv", "docx"],
+        )
+        report.generate()
+        self.assertEqual(report.formats, ["xlsx", "csv", "docx"])
+        for fmt in report.formats:
+            self.assertTrue(os.path.exists(report.output_path(fmt)))
+        self.assertEqual(report.output_path("xlsx"), outpath)
+
+    def test_cli_docx_format(self):
+        """Test the Word document can be an extra format of the command line."""
+        names = self.path("names.csv")
+        with open(names, "w", encoding="utf-8") as f:
+            f.write("art\nKiebitz\n")
+        outpath = self.path("fauna.xlsx")
+        with contextlib.redirect_stdout(io.StringIO()):
+            main(
+                [
+                    names,
+                    "-f",
+                    "art",
+                    "-o",
+                    outpath,
+                    "--lut",
+                    self.lut,
+                    "--format",
+                    "docx",
+                ]
+            )
+        self.assertTrue(os.path.exists(self.path("fauna.docx")))
+
+    def test_unknown_format(self):
+        """Test unknown formats are rejected."""
+        with self.assertRaises(ValueError):
+            redListFauna(
+                None, None, "fauna.docx", names=[], lut_path=self.lut, formats=["pdf"]
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
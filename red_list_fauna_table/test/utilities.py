@@ -1,9 +1,11 @@
 # coding=utf-8
 """Common functionality used by regression tests."""
 
-import sys
 import logging
-
+import os
+import sys
+import tempfile
+import unittest
 
 LOGGER = logging.getLogger("QGIS")
 QGIS_APP = None  # Static variable used to hold hand to running QGIS app
@@ -11,6 +13,24 @@ CANVAS = None
 PARENT = None
 IFACE = None
 
+# Red list of the tests, in the format of fauna.csv
+LUT_CSV = (
+    "|Name|Deutscher Name|aktuelle Bestandssituation|kurzfristiger Bestandstrend"
+    "|langfristiger Bestandstrend|RL Kat.\n"
+    "0|Vanellus vanellus|Kiebitz|mh|vvv|<<|2\n"
+    "1|Alauda arvensis|Feldlerche|h|vv|<<|3\n"
+)
+
+# Red list with the taxonomic group column Gruppe
+GROUPED_LUT_CSV = (
+    "|Name|Deutscher Name|aktuelle Bestandssituation|kurzfristiger Bestandstrend"
+    "|langfristiger Bestandstrend|RL Kat.|Gruppe\n"
+    "0|Vanellus vanellus|Kiebitz|mh|vvv|<<|2|Vögel\n"
+    "1|Alauda arvensis|Feldlerche|h|vv|<<|3|Vögel\n"
+    "2|Bufo bufo|Erdkröte|sh|=|=|*|Amphibien\n"
+    "3|Anguilla anguilla|Aal|s|vv|<<|2|Fische\n"
+)
+
 
 def get_qgis_app():
     """Start one QGIS application to test against.
@@ -59,3 +79,29 @@ def get_qgis_app():
         IFACE = QgisInterface(CANVAS)
 
     return QGIS_APP, CANVAS, IFACE, PARENT
+
+
+class LutTestCase(unittest.TestCase):
+    """Test case with a temporary directory holding a red list."""
+
+    # Content of the red list written to self.lut
+    lut_csv = LUT_CSV
+
+    def setUp(self):
+        """Runs before each test."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.lut = self.path("fauna.csv")
+        self.write_lut(self.lut_csv)
+
+    def tearDown(self):
+        """Runs after each test."""
+        self.tmpdir.cleanup()
+
+    def path(self, name):
+        """Return the path of a file in the temporary directory."""
+        return os.path.join(self.tmpdir.name, name)
+
+    def write_lut(self, text):
+        """Replace the red list of the test."""
+        with open(self.lut, "w", encoding="utf-8") as f:
+            f.write(text)
@@ -0,0 +1,414 @@
+import csv
+import html
+import zipfile
+from xml.sax.saxutils import escape
+
+# Width of a character of the default spreadsheet font in cm, converts column widths
+XLSX_CHAR_CM = 0.19
+
+
+def hex_color(fill):
+    """
+    Return a fill color as six hex digits without "#".
+
+    Parameters:
+    - fill: str, the color as in COLORS, with or without "#".
+    """
+    return fill.lstrip("#").upper()
+
+
+def fill_of(fills, j, text):
+    """
+    Return the fill color of a cell, None for no fill.
+
+    Parameters:
+    - fills: dict, maps a column index to a dict of cell value -> fill color (optional).
+    - j: int, the column index.
+    - text: str, the cell text.
+    """
+    if not fills or j not in fills:
+        return None
+    fill = fills[j].get(text)
+    return hex_color(fill) if fill is not None else None
+
+
+def report_progress(progress, i, count):
+    """
+    Call progress every 100 rows with the share of rows written.
+
+    Parameters:
+    - progress: callable, see write_table (optional).
+    - i: int, index of the row about to be written.
+    - count: int, number of rows.
+    """
+    if progress is not None and i % 100 == 0:
+        progress(i / count)
+
+
+def write_csv(path, header, rows, fills=None, widths=None, progress=None):
+    """
+    Write the table as UTF-8 CSV, readable by spreadsheet programs.
+
+    Parameters: see write_table, fills and widths are not used.
+    """
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for i, row in enumerate(rows):
+            report_progress(progress, i, len(rows))
+            writer.writerow(row)
+
+
+def write_html(path, header, rows, fills=None, widths=None, progress=None):
+    """
+    Write the table as standalone HTML page, colored cells as inline styles.
+
+    Parameters: see write_table.
+    """
+
+    def cell(tag, text, style=""):
+        text = html.escape(text).replace("\n", "<br>")
+        return "<{0}{1}>{2}</{0}>".format(tag, style, text)
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(
+            '<!DOCTYPE html>\n<html lang="de">\n<head>\n<meta charset="utf-8">\n'
+            "<title>Rote Liste Fauna</title>\n<style>\n"
+            "table { border-collapse: collapse; }\n"
+            "th, td { border: 1px solid #000; padding: 2px 4px; text-align: center; }\n"
+            "</style>\n</head>\n<body>\n<table>\n"
+        )
+        if widths:
+            f.write(
+                "<colgroup>{}</colgroup>\n".format(
+                    "".join(
+                        '<col style="width: {:.2f}cm">'.format(w.cm) for w in widths
+                    )
+                )
+            )
+        f.write(
+            "<thead><tr>{}</tr></thead>\n<tbody>\n".format(
+                "".join(cell("th", text) for text in header)
+            )
+        )
+        for i, row in enumerate(rows):
+            report_progress(progress, i, len(rows))
+            cells = []
+            for j, text in enumerate(row):
+                fill = fill_of(fills, j, text)
+                style = ' style="background-color: #{}"'.format(fill) if fill else ""
+                cells.append(cell("td", text, style))
+            f.write("<tr>{}</tr>\n".format("".join(cells)))
+        f.write("</tbody>\n</table>\n</body>\n</html>\n")
+
+
+def column_letter(j):
+    """
+    Return the spreadsheet column letters of a column index, 0 -> "A".
+
+    Parameters:
+    - j: int, the column index.
+    """
+    letters = ""
+    j += 1
+    while j:
+        j, rest = divmod(j - 1, 26)
+        letters = chr(ord("A") + rest) + letters
+    return letters
+
+
+def xlsx_styles(colors):
+    """
+    Build the styles part of a workbook: a bold header and one style per fill color.
+
+    Parameters:
+    - colors: list of str, the fill colors, style 2 + i uses colors[i].
+    """
+    fills = "".join(
+        '<fill><patternFill patternType="solid"><fgColor rgb="FF{}"/>'
+        '<bgColor indexed="64"/></patternFill></fill>'.format(color)
+        for color in colors
+    )
+    xfs = "".join(
+        '<xf numFmtId="0" fontId="0" fillId="{}" borderId="0" applyFill="1" '
+        'applyAlignment="1"><alignment horizontal="center" wrapText="1"/></xf>'.format(
+            i + 2
+        )
+        for i in range(len(colors))
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="{}"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill>{}</fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border>'
+        "</borders>"
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/>'
+        "</cellStyleXfs>"
+        '<cellXfs count="{}"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" '
+        'applyAlignment="1"><alignment horizontal="center" wrapText="1"/></xf>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" applyFont="1" '
+        'applyAlignment="1"><alignment horizontal="center" wrapText="1"/></xf>{}'
+        "</cellXfs>"
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/>'
+        "</cellStyles></styleSheet>"
+    ).format(len(colors) + 2, fills, len(colors) + 2, xfs)
+
+
+XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" '
+        'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/'
+        'vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+        'relationships"><Relationship Id="rId1" Type="http://schemas.openxmlformats'
+        '.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/></Relationships>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/'
+        'relationships"><Relationship Id="rId1" Type="http://schemas.openxmlformats'
+        '.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/><Relationship Id="rId2" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        'styles" Target="styles.xml"/></Relationships>'
+    ),
+}
+
+
+def write_xlsx(path, header, rows, fills=None, widths=None, progress=None):
+    """
+    Write the table as Excel workbook, streaming the rows into the sheet.
+
+    The header row is frozen and has a filter, category cells are filled
+    with their color.
+
+    Parameters: see write_table.
+    """
+    colors = sorted(
+        {hex_color(c) for column in (fills or {}).values() for c in column.values()}
+    )
+    style = {color: i + 2 for i, color in enumerate(colors)}
+    last = "{}{}".format(column_letter(len(header) - 1), len(rows) + 1)
+
+    def row_xml(r, texts, styles):
+        cells = "".join(
+            '<c r="{}{}" t="inlineStr" s="{}"><is><t xml:space="preserve">{}</t>'
+            "</is></c>".format(column_letter(j), r, s, escape(text))
+            for j, (text, s) in enumerate(zip(texts, styles))
+        )
+        return '<row r="{}">{}</row>'.format(r, cells)
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, xml in XLSX_PARTS.items():
+            zf.writestr(name, xml)
+        zf.writestr(
+            "xl/workbook.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/'
+            'main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/'
+            'relationships"><sheets><sheet name="Rote Liste" sheetId="1" r:id="rId1"/>'
+            '</sheets><definedNames><definedName name="_xlnm._FilterDatabase" '
+            'localSheetId="0" hidden="1">\'Rote Liste\'!$A$1:${}</definedName>'
+            "</definedNames></workbook>".format(
+                "$".join([column_letter(len(header) - 1), str(len(rows) + 1)])
+            ),
+        )
+        zf.writestr("xl/styles.xml", xlsx_styles(colors))
+        with zf.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            parts = [
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/'
+                '2006/main"><sheetViews><sheetView workbookViewId="0">'
+                '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" '
+                'state="frozen"/></sheetView></sheetViews>'
+            ]
+            if widths:
+                parts.append(
+                    "<cols>{}</cols>".format(
+                        "".join(
+                            '<col min="{0}" max="{0}" width="{1:.1f}" '
+                            'customWidth="1"/>'.format(j + 1, w.cm / XLSX_CHAR_CM)
+                            for j, w in enumerate(widths)
+                        )
+                    )
+                )
+            parts.append("<sheetData>")
+            parts.append(row_xml(1, header, [1] * len(header)))
+            sheet.write("".join(parts).encode("utf-8"))
+            for i, row in enumerate(rows):
+                report_progress(progress, i, len(rows))
+                styles = [
+                    style.get(fill_of(fills, j, text), 0) for j, text in enumerate(row)
+                ]
+                sheet.write(row_xml(i + 2, row, styles).encode("utf-8"))
+            sheet.write(
+                '</sheetData><autoFilter ref="A1:{}"/></worksheet>'.format(last).encode(
+                    "utf-8"
+                )
+            )
+
+
+ODT_MIMETYPE = "application/vnd.oasis.opendocument.text"
+
+ODT_MANIFEST = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<manifest:manifest xmlns:manifest="urn:oasis:names:tc:opendocument:xmlns:'
+    'manifest:1.0" manifest:version="1.2">'
+    '<manifest:file-entry manifest:full-path="/" manifest:version="1.2" '
+    'manifest:media-type="{}"/>'
+    '<manifest:file-entry manifest:full-path="content.xml" '
+    'manifest:media-type="text/xml"/></manifest:manifest>'
+).format(ODT_MIMETYPE)
+
+
+def write_odt(path, header, rows, fills=None, widths=None, progress=None):
+    """
+    Write the table as OpenDocument text, streaming the rows into the content.
+
+    Parameters: see write_table.
+    """
+    colors = sorted(
+        {hex_color(c) for column in (fills or {}).values() for c in column.values()}
+    )
+    style = {color: "C{}".format(i) for i, color in enumerate(colors)}
+
+    def paragraph(text, para_style):
+        lines = [escape(line) for line in text.split("\n")]
+        return '<text:p text:style-name="{}">{}</text:p>'.format(
+            para_style, "<text:line-break/>".join(lines)
+        )
+
+    def row_xml(texts, cell_styles, para_style):
+        return "<table:table-row>{}</table:table-row>".format(
+            "".join(
+                '<table:table-cell table:style-name="{}" office:value-type="string">'
+                "{}</table:table-cell>".format(s, paragraph(text, para_style))
+                for text, s in zip(texts, cell_styles)
+            )
+        )
+
+    automatic = [
+        '<style:style style:name="Tabelle" style:family="table">'
+        '<style:table-properties table:align="center"/></style:style>',
+        '<style:style style:name="P" style:family="paragraph">'
+        '<style:paragraph-properties fo:text-align="center"/></style:style>',
+        '<style:style style:name="H" style:family="paragraph">'
+        '<style:paragraph-properties fo:text-align="center"/>'
+        '<style:text-properties fo:font-weight="bold" fo:font-size="12pt"/>'
+        "</style:style>",
+        '<style:style style:name="C" style:family="table-cell">'
+        '<style:table-cell-properties fo:border="0.5pt solid #000000"/></style:style>',
+    ]
+    automatic += [
+        '<style:style style:name="{}" style:family="table-cell">'
+        '<style:table-cell-properties fo:border="0.5pt solid #000000" '
+        'fo:background-color="#{}"/></style:style>'.format(name, color)
+        for color, name in style.items()
+    ]
+    automatic += [
+        '<style:style style:name="W{}" style:family="table-column">'
+        '<style:table-column-properties style:column-width="{:.2f}cm"/>'
+        "</style:style>".format(j, w.cm)
+        for j, w in enumerate(widths or [])
+    ]
+    columns = (
+        "".join(
+            '<table:table-column table:style-name="W{}"/>'.format(j)
+            for j in range(len(widths))
+        )
+        if widths
+        else '<table:table-column table:number-columns-repeated="{}"/>'.format(
+            len(header)
+        )
+    )
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        # The mimetype comes first and uncompressed, as readers expect
+        zf.writestr(zipfile.ZipInfo("mimetype"), ODT_MIMETYPE, zipfile.ZIP_STORED)
+        zf.writestr("META-INF/manifest.xml", ODT_MANIFEST)
+        with zf.open("content.xml", "w") as content:
+            content.write(
+                (
+                    '<?xml version="1.0" encoding="UTF-8"?>\n'
+                    "<office:document-content "
+                    'xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0" '
+                    'xmlns:style="urn:oasis:names:tc:opendocument:xmlns:style:1.0" '
+                    'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0" '
+                    'xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0" '
+                    'xmlns:fo="urn:oasis:names:tc:opendocument:xmlns:'
+                    'xsl-fo-compatible:1.0" office:version="1.2">'
+                    "<office:automatic-styles>{}</office:automatic-styles>"
+                    "<office:body><office:text>"
+                    '<table:table table:name="Rote Liste" table:style-name="Tabelle">'
+                    "{}<table:table-header-rows>{}</table:table-header-rows>"
+                )
+                .format(
+                    "".join(automatic),
+                    columns,
+                    row_xml(header, ["C"] * len(header), "H"),
+                )
+                .encode("utf-8")
+            )
+            for i, row in enumerate(rows):
+                report_progress(progress, i, len(rows))
+                cell_styles = [
+                    style.get(fill_of(fills, j, text), "C")
+                    for j, text in enumerate(row)
+                ]
+                content.write(row_xml(row, cell_styles, "P").encode("utf-8"))
+            content.write(
+                b"</table:table></office:text></office:body></office:document-content>"
+            )
+
+
+# Output formats besides .docx, which is written from the document template
+WRITERS = {
+    "xlsx": write_xlsx,
+    "csv": write_csv,
+    "html": write_html,
+    "odt": write_odt,
+}
+
+# All output formats, by file extension
+FORMATS = ["docx"] + list(WRITERS)
+
+# File dialog filters of the output formats, in the order of FORMATS
+FILE_FILTERS = [
+    "Word document (*.docx)",
+    "Excel workbook (*.xlsx)",
+    "CSV file (*.csv)",
+    "Web page (*.html)",
+    "OpenDocument text (*.odt)",
+]
+
+
+def write_table(fmt, path, header, rows, fills=None, widths=None, progress=None):
+    """
+    Write the species table in one of the formats of WRITERS.
+
+    Parameters:
+    - fmt: str, the format, a key of WRITERS.
+    - path: str, the file to be written.
+    - header: list of str, the column headers.
+    - rows: list of lists of str, the body rows.
+    - fills: dict, maps a column index to a dict of cell value -> fill color (optional).
+    - widths: list of docx.shared.Length, the column widths (optional).
+    - progress: callable, called with the share of rows written so far (optional).
+    """
+    WRITERS[fmt](path, header, rows, fills, widths, progress)